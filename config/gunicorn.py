@@ -0,0 +1,7 @@
+# gunicorn --config config/gunicorn.py, see ee_status/mastr_data/metrics.py
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # the metrics of a worker that is gone must not count as a live process (gauges)
+    multiprocess.mark_process_dead(worker.pid)
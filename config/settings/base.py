@@ -60,6 +60,11 @@ DATABASES = {
     }
 }
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# The imported MaStR data is published into its own schema, see ee_status/mastr_data/etl.py
+MASTR_DATA_SCHEMA = "mastr"
+DATABASES["default"]["OPTIONS"] = {
+    "options": f"-c search_path=public,{MASTR_DATA_SCHEMA}"
+}
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -144,6 +149,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "ee_status.mastr_data.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -293,3 +299,32 @@ SOCIALACCOUNT_FORMS = {"signup": "ee_status.users.forms.UserSocialSignupForm"}
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Seconds a worker relies on the data version it knows before asking the database again
+MASTR_DATA_VERSION_CHECK_INTERVAL = env.int(
+    "MASTR_DATA_VERSION_CHECK_INTERVAL", default=60
+)
+# Serve rankings from the in-memory ranking engine instead of querying PostgreSQL
+MASTR_DATA_IN_MEMORY_RANKINGS = env.bool("MASTR_DATA_IN_MEMORY_RANKINGS", default=True)
+# Seconds the responses of the mastr_data views stay cached. Entries of older data versions are never read again.
+MASTR_DATA_CACHE_TIMEOUT = env.int("MASTR_DATA_CACHE_TIMEOUT", default=60 * 60 * 24 * 7)
+# Maximum number of results of the search on the start page
+MASTR_DATA_SEARCH_LIMIT = env.int("MASTR_DATA_SEARCH_LIMIT", default=25)
+# Serve the search from the in-memory search index instead of querying PostgreSQL
+MASTR_DATA_IN_MEMORY_SEARCH = env.bool("MASTR_DATA_IN_MEMORY_SEARCH", default=True)
+# SQLite file of open-MaStR the units are imported from (python manage.py import_mastr)
+MASTR_DATA_SQLITE_PATH = env(
+    "MASTR_DATA_SQLITE_PATH",
+    default=str(Path.home() / ".open-MaStR" / "data" / "sqlite" / "open-mastr.db"),
+)
+# Directory the CSV and Parquet exports are written to, one subdirectory per data version
+MASTR_DATA_EXPORT_DIR = env(
+    "MASTR_DATA_EXPORT_DIR", default=str(APPS_DIR / "media" / "exports")
+)
+# Report the time spent in SQL, aggregation and rendering of the mastr_data views in Server-Timing headers and logs
+MASTR_DATA_SERVER_TIMING = env.bool("MASTR_DATA_SERVER_TIMING", default=True)
+# Collect Prometheus metrics of the mastr_data views (served on /metrics)
+MASTR_DATA_METRICS = env.bool("MASTR_DATA_METRICS", default=True)
+# Addresses allowed to read /metrics
+MASTR_DATA_METRICS_ALLOWED_IPS = env.list(
+    "MASTR_DATA_METRICS_ALLOWED_IPS", default=["127.0.0.1", "::1"]
+)
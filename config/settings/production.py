@@ -20,6 +20,9 @@ ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["ee-status.de"])
 DATABASES["default"] = env.db("DATABASE_URL")  # noqa F405
 DATABASES["default"]["ATOMIC_REQUESTS"] = True  # noqa F405
 DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)  # noqa F405
+DATABASES["default"]["OPTIONS"] = {  # noqa F405
+    "options": f"-c search_path=public,{MASTR_DATA_SCHEMA}"  # noqa F405
+}
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -5,6 +5,8 @@ from django.urls import include, path
 from django.views import defaults as default_views
 from django.views.generic import TemplateView
 
+from ee_status.mastr_data.metrics import metrics_view
+
 urlpatterns = [
     # path("", TemplateView.as_view(template_name="mastr_data/search.html"), name="search"),
     path(
@@ -26,6 +28,7 @@ urlpatterns = [
     path("users/", include("ee_status.users.urls", namespace="users")),
     path("accounts/", include("allauth.urls")),
     # Your stuff: custom urls includes go here
+    path("metrics", metrics_view, name="metrics"),
     path("", include("ee_status.mastr_data.urls")),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
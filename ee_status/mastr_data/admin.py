@@ -1,6 +1,18 @@
 from django.contrib import admin
 
-from ee_status.mastr_data.models import CurrentTotal, MonthlyTimeline
+from ee_status.mastr_data.models import CurrentTotal, EtlRun, EtlStep, MonthlyTimeline
 
 admin.site.register(MonthlyTimeline)
 admin.site.register(CurrentTotal)
+
+
+class EtlStepInline(admin.TabularInline):
+    model = EtlStep
+    extra = 0
+
+
+@admin.register(EtlRun)
+class EtlRunAdmin(admin.ModelAdmin):
+    list_display = ["started_at", "mode", "status", "finished_at"]
+    list_filter = ["mode", "status"]
+    inlines = [EtlStepInline]
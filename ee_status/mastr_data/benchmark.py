@@ -0,0 +1,141 @@
+"""
+Latency, query count and peak memory of the mastr_data views
+(python manage.py benchmark_mastr), compared with a saved baseline.
+"""
+import json
+import math
+import random
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import CurrentTotal
+
+# views measured at every realm level, by URL name
+REALM_VIEWS = ["totals", "totals-api", "timeline", "rankings", "rankings-api"]
+REALM_LEVELS = ["country", "state", "county", "municipality"]
+# a case is reported as a regression if its p95 latency grows by this factor or it needs more queries
+REGRESSION_FACTOR = 1.5
+# caches of cold runs, every request does the work of a first request after an import
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def percentile(values, share):
+    """Nearest-rank percentile, share between 0 and 1"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+def summarize(latencies, queries, peak_memory):
+    return {
+        "p50": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95": round(percentile(latencies, 0.95) * 1000, 2),
+        "queries": queries,
+        "peak_memory": peak_memory,
+    }
+
+
+def realm_params(level, rng, samples):
+    """Query parameters of samples realms of a level, picked from current_totals"""
+    if level == "country":
+        return [{}]
+    # links of the site name the whole hierarchy above a realm
+    fields = {
+        "state": ["state"],
+        "county": ["county", "state"],
+        "municipality": ["municipality_key", "municipality", "county", "state"],
+    }[level]
+    realms = sorted(set(CurrentTotal.objects.values_list(*fields)))
+    return [
+        dict(zip(fields, realm))
+        for realm in rng.sample(realms, min(samples, len(realms)))
+    ]
+
+
+def search_params(rng, samples):
+    """Search terms: beginnings of municipality names"""
+    names = sorted(set(CurrentTotal.objects.values_list("municipality", flat=True)))
+    return [
+        {"search": name[: rng.randint(3, 6)]}
+        for name in rng.sample(names, min(samples, len(names)))
+    ]
+
+
+def cases(samples, seed=0):
+    """(case name, url, list of query parameters) of every measured case"""
+    rng = random.Random(seed)
+    for level in REALM_LEVELS:
+        params = realm_params(level, rng, samples)
+        for view in REALM_VIEWS:
+            yield f"{view}:{level}", reverse(f"mastr_data:{view}"), params
+    yield "search", reverse("mastr_data:search-municipality"), search_params(
+        rng, samples
+    )
+
+
+def measure(client, url, params, repeat):
+    """Latencies of repeat rounds over params, then queries and peak memory of one more round"""
+    # the first round loads what the process keeps in memory (ranking engine, search index)
+    for query in params:
+        client.get(url, query)
+
+    latencies = []
+    for _ in range(repeat):
+        for query in params:
+            start = time.perf_counter()
+            response = client.get(url, query)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise ValueError(f"{url} {query} returned {response.status_code}")
+
+    queries = peak_memory = 0
+    for query in params:
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as captured:
+            client.get(url, query)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        queries = max(queries, len(captured.captured_queries))
+    return summarize(latencies, queries, peak_memory)
+
+
+def run(samples=5, repeat=10, seed=0, host="localhost", cached=False):
+    """Measure every case, with the responses cached per data version switched off unless cached."""
+    client = Client(SERVER_NAME=host)
+    with override_settings(**({} if cached else {"CACHES": NO_CACHE})):
+        return {
+            name: measure(client, url, params, repeat)
+            for name, url, params in cases(samples, seed)
+        }
+
+
+def regressions(results, baseline, factor=REGRESSION_FACTOR):
+    """Messages about the cases that got slower or need more queries than in baseline"""
+    messages = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["p95"] > before["p95"] * factor:
+            messages.append(
+                f"{name}: p95 {result['p95']} ms, baseline {before['p95']} ms"
+            )
+        if result["queries"] > before["queries"]:
+            messages.append(
+                f"{name}: {result['queries']} queries, baseline {before['queries']}"
+            )
+    return messages
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
@@ -0,0 +1,131 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse, QueryDict
+from django.utils.http import urlencode
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+from .data_version import get_data_version
+from .metrics import observe_cache
+from .timing import timed
+
+# request parameters the output of the mastr_data views depends on
+CACHE_PARAMETERS = [
+    "search",
+    "municipality_key",
+    "municipality",
+    "county",
+    "state",
+    "numerator",
+    "denominator",
+    "scope",
+    "zoom",
+    "date",
+]
+
+
+def keyed_parameters(params):
+    """
+    QueryDict of the CACHE_PARAMETERS of params with a value, one value each
+    as the views read them (params.get), the rest is left out.
+    """
+    return QueryDict(
+        urlencode(
+            [(name, params.get(name)) for name in CACHE_PARAMETERS if params.get(name)]
+        )
+    )
+
+
+def cache_key(prefix, params):
+    """
+    Build a cache key from the filter parameters, the active language and
+    the current data version.
+
+    Only the keyed_parameters are part of the key, cache_per_data_version
+    hands the views nothing else.
+    A new import changes the data version and with it every key, so stale
+    entries are never read again and simply expire.
+    """
+    digest = hashlib.md5(keyed_parameters(params).urlencode().encode()).hexdigest()
+    version = get_data_version()
+    version_id = version.pk if version else 0
+    return f"mastr_data:{prefix}:{version_id}:{get_language()}:{digest}"
+
+
+def is_cacheable(request):
+    # pages of logged-in users or with pending messages are not the same for everyone
+    return not request.user.is_authenticated and not len(get_messages(request))
+
+
+def cache_per_data_version(view_func):
+    """
+    Cache the full response of a view until the next import.
+
+    The view only gets the keyed_parameters of the request, so a response
+    (e.g. the links and forms of a page) cannot depend on parameters the
+    cache key leaves out.
+    """
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not is_cacheable(request):
+            return view_func(request, *args, **kwargs)
+        request.GET = keyed_parameters(request.GET)
+
+        # URL arguments (e.g. the coordinates of a tile) are part of the key as well
+        prefix = ":".join(
+            [
+                "response",
+                view_func.__name__,
+                *(str(kwargs[name]) for name in sorted(kwargs)),
+            ]
+        )
+        key = cache_key(prefix, request.GET)
+        with timed("cache"):
+            cached = cache.get(key)
+        observe_cache(view_func.__name__, hit=cached is not None)
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            with timed("cache"):
+                cache.set(
+                    key,
+                    (response.content, dict(response.items())),
+                    timeout=settings.MASTR_DATA_CACHE_TIMEOUT,
+                )
+        return response
+
+    return _wrapped_view
+
+
+def data_version_etag(request, *args, **kwargs):
+    """
+    The response of a view reading only imported data changes with the data
+    version (and the language, e.g. the name of Germany), the URL is part of
+    the ETag's scope anyway.
+    """
+    version = get_data_version()
+    if version is None:
+        return None
+    return f"{version.pk}-{get_language()}"
+
+
+def data_version_last_modified(request, *args, **kwargs):
+    version = get_data_version()
+    return version.imported_at if version else None
+
+
+# answers If-None-Match and If-Modified-Since with 304 Not Modified until the next import
+conditional_per_data_version = condition(
+    etag_func=data_version_etag, last_modified_func=data_version_last_modified
+)
@@ -0,0 +1,137 @@
+"""
+Choropleth of the municipalities of a county on the rankings page.
+
+The polygons do not depend on the metric, so the FeatureCollection of a
+county is serialized and gzip-compressed once per data version and zoom
+range and served as it is. The metrics of the municipalities of a county are
+kept as small arrays, the scores of a numerator/denominator pair are divided
+out of them per request.
+"""
+import gzip
+import re
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.db.models import Extent
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.core.cache import cache
+
+from .cache import cache_key, data_version_etag
+from .models import CurrentTotal, SimplifiedGeometry
+from .timing import timed
+
+# the columns the rankings page ranks by (filters.RankingsFilter.VALUES)
+METRICS = [
+    "total_net_nominal_capacity",
+    "storage_net_nominal_capacity",
+    "population",
+    "area",
+]
+# decimals of the coordinates, about 1 m
+PRECISION = 5
+
+re_accepts_gzip = re.compile(r"\bgzip\b")
+
+
+def accepts_gzip(request):
+    return bool(re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")))
+
+
+def geometry_etag(request, *args, **kwargs):
+    """The gzip-compressed and the plain geometry are different representations"""
+    etag = data_version_etag(request)
+    if etag and accepts_gzip(request):
+        return f"{etag}-gzip"
+    return etag
+
+
+def cached(key, build):
+    """Value of key in the cache, built and stored on a miss; None is not stored"""
+    with timed("cache"):
+        value = cache.get(key)
+    if value is None:
+        value = build()
+        if value is not None:
+            with timed("cache"):
+                cache.set(key, value, timeout=settings.MASTR_DATA_CACHE_TIMEOUT)
+    return value
+
+
+def feature_collection(rows):
+    """GeoJSON FeatureCollection of (pk, geometry as GeoJSON) rows, the geometries are spliced in as they are"""
+    features = ", ".join(
+        f'{{"type": "Feature", "properties": {{"pk": {pk}}}, "geometry": {geometry}}}'
+        for pk, geometry in rows
+    )
+    return f'{{"type": "FeatureCollection", "features": [{features}]}}'.encode()
+
+
+def build_county_geometry(county, level):
+    rows = list(
+        SimplifiedGeometry.objects.filter(
+            current_total__county__exact=county, level=level
+        )
+        .annotate(json=AsGeoJSON("geom", precision=PRECISION))
+        .order_by("current_total_id")
+        .values_list("current_total_id", "json")
+    )
+    if not rows:
+        return None
+    return gzip.compress(feature_collection(rows))
+
+
+def get_county_geometry(county, level):
+    """Gzip-compressed FeatureCollection of the municipalities of county, None if there are none"""
+    return cached(
+        cache_key(f"choropleth_geometry:{level}", {"county": county}),
+        lambda: build_county_geometry(county, level),
+    )
+
+
+def build_county_metrics(county):
+    rows = list(
+        CurrentTotal.objects.filter(county__exact=county)
+        .order_by("pk")
+        .values_list("pk", "municipality", *METRICS)
+    )
+    extent = SimplifiedGeometry.objects.filter(
+        current_total__county__exact=county
+    ).aggregate(extent=Extent("geom"))["extent"]
+    if not rows or extent is None:
+        return None
+
+    pks, names, *columns = zip(*rows)
+    return {
+        "locations": list(pks),
+        "names": list(names),
+        # missing values become NaN
+        "metrics": {
+            metric: np.array(column, dtype=float)
+            for metric, column in zip(METRICS, columns)
+        },
+        "center": {
+            "lat": (extent[1] + extent[3]) / 2,
+            "lon": (extent[0] + extent[2]) / 2,
+        },
+    }
+
+
+def get_county_metrics(county):
+    """Municipalities of county with their METRICS as arrays and the center of the county"""
+    return cached(
+        cache_key("choropleth_metrics", {"county": county}),
+        lambda: build_county_metrics(county),
+    )
+
+
+def scores(metrics, numerator, denominator=None):
+    """Score of every municipality rounded to two decimals, None where it is not defined"""
+    values = metrics[numerator]
+    if denominator:
+        divisor = metrics[denominator]
+        values = np.divide(
+            values, divisor, out=np.full_like(values, np.nan), where=divisor != 0
+        )
+    return [
+        None if np.isnan(value) else value for value in np.round(values, 2).tolist()
+    ]
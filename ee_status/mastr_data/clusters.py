@@ -0,0 +1,104 @@
+from django.db import connection
+
+# below this zoom level the units of a tile are aggregated to clusters, from it on every unit is sent
+POINTS_MIN_ZOOM = 14
+# a tile is divided into CLUSTER_GRID x CLUSTER_GRID cells, each cell holding at most one cluster
+CLUSTER_GRID = 16
+# width of the whole world in EPSG:3857 (Web Mercator) meters
+WORLD_WIDTH = 40075016.68557849
+
+# technologies in the order of the capacity columns of CLUSTERS_SQL and POINTS_SQL
+TECHNOLOGIES = ["pv", "wind", "biomass", "hydro", "storage"]
+
+# Units within the tile, the && on geolocation is served by the GiST index of sql_scripts/03_unite_tables.sql.
+# Clusters are the units snapped to the cells of a grid over the tile, placed at the mean position of their units.
+CLUSTERS_SQL = """
+WITH bounds AS (SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS envelope)
+SELECT count(*),
+       avg(ST_Y(u.geolocation)),
+       avg(ST_X(u.geolocation)),
+       count(u.pv_net_nominal_capacity),
+       sum(u.pv_net_nominal_capacity),
+       count(u.wind_net_nominal_capacity),
+       sum(u.wind_net_nominal_capacity),
+       count(u.biomass_net_nominal_capacity),
+       sum(u.biomass_net_nominal_capacity),
+       count(u.hydro_net_nominal_capacity),
+       sum(u.hydro_net_nominal_capacity),
+       count(u.storage_net_nominal_capacity),
+       sum(u.storage_net_nominal_capacity)
+FROM energy_units u,
+     bounds
+WHERE u.geolocation && ST_Transform(bounds.envelope, 4326)
+GROUP BY ST_SnapToGrid(ST_Transform(u.geolocation, 3857), ST_XMin(bounds.envelope), ST_YMin(bounds.envelope),
+                       %(cell_size)s, %(cell_size)s)
+"""
+
+POINTS_SQL = """
+WITH bounds AS (SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS envelope)
+SELECT u.unit_nr,
+       ST_Y(u.geolocation),
+       ST_X(u.geolocation),
+       u.pv_net_nominal_capacity,
+       u.wind_net_nominal_capacity,
+       u.biomass_net_nominal_capacity,
+       u.hydro_net_nominal_capacity,
+       u.storage_net_nominal_capacity
+FROM energy_units u,
+     bounds
+WHERE u.geolocation && ST_Transform(bounds.envelope, 4326)
+"""
+
+
+def cell_size(z):
+    """Edge length of a cluster cell of a tile at zoom level z in EPSG:3857 meters"""
+    return WORLD_WIDTH / 2**z / CLUSTER_GRID
+
+
+def cluster_from_row(row):
+    count, latitude, longitude, *values = row
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "count": count,
+        "technologies": {
+            technology: {"count": units, "capacity": float(capacity)}
+            for technology, units, capacity in zip(
+                TECHNOLOGIES, values[::2], values[1::2]
+            )
+            if units
+        },
+    }
+
+
+def point_from_row(row):
+    unit_nr, latitude, longitude, *capacities = row
+    technology, capacity = next(
+        (
+            (technology, capacity)
+            for technology, capacity in zip(TECHNOLOGIES, capacities)
+            if capacity is not None
+        ),
+        (None, None),
+    )
+    return {
+        "unit_nr": unit_nr,
+        "latitude": latitude,
+        "longitude": longitude,
+        "technology": technology,
+        "capacity": None if capacity is None else float(capacity),
+    }
+
+
+def get_units(z, x, y):
+    """
+    Return the energy units within tile z/x/y, as clusters of a grid over
+    the tile or, from POINTS_MIN_ZOOM on, one by one.
+    """
+    params = {"z": z, "x": x, "y": y, "cell_size": cell_size(z)}
+    with connection.cursor() as cursor:
+        if z >= POINTS_MIN_ZOOM:
+            cursor.execute(POINTS_SQL, params)
+            return {"points": [point_from_row(row) for row in cursor.fetchall()]}
+        cursor.execute(CLUSTERS_SQL, params)
+        return {"clusters": [cluster_from_row(row) for row in cursor.fetchall()]}
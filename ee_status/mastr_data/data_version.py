@@ -0,0 +1,53 @@
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+
+from .models import DataVersion
+
+_latest = {"version": None, "checked_at": None}
+
+
+def get_data_version(refresh=False):
+    """
+    Return the latest DataVersion or None if no import has been stamped yet.
+
+    Every process asks the database at most once per
+    MASTR_DATA_VERSION_CHECK_INTERVAL seconds, unless refresh is set (e.g.
+    by a command that just published new data).
+    """
+    now = time.monotonic()
+    checked_at = _latest["checked_at"]
+    if (
+        refresh
+        or checked_at is None
+        or now - checked_at >= settings.MASTR_DATA_VERSION_CHECK_INTERVAL
+    ):
+        _latest["version"] = DataVersion.objects.order_by("-id").first()
+        _latest["checked_at"] = now
+    return _latest["version"]
+
+
+def per_data_version(loader):
+    """
+    Keep the result of loader in this process until the data version changes.
+
+    Used for in-memory structures built from the imported data, e.g. the
+    ranking engine or the search index.
+    """
+    lock = threading.Lock()
+    loaded = {"version": None, "value": None}
+
+    @wraps(loader)
+    def _wrapped_loader():
+        version = get_data_version()
+        version_id = version.pk if version else None
+        if loaded["value"] is None or loaded["version"] != version_id:
+            with lock:
+                if loaded["value"] is None or loaded["version"] != version_id:
+                    loaded["value"] = loader()
+                    loaded["version"] = version_id
+        return loaded["value"]
+
+    return _wrapped_loader
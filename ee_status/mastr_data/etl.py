@@ -0,0 +1,640 @@
+"""
+Building a new generation of the MaStR data tables and publishing it.
+
+Every import is built in a staging schema, checked and then published by
+renaming schemas in one short transaction: the staging schema becomes the
+live schema (settings.MASTR_DATA_SCHEMA, which is on the search_path of the
+Django connection), the former live schema is kept as the previous
+generation for a rollback. Readers never see half-built tables and are
+never blocked by the import.
+
+The import is a graph of steps (see Step), independent steps run
+concurrently, each on its own database connection. The wall time, rows and
+size growth of every step are recorded per run (models.EtlRun, EtlStep,
+python manage.py etl_report).
+"""
+import re
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+import sqlparse
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .loader import TECHNOLOGIES, load_step_name, load_technology
+
+SQL_SCRIPTS_DIR = settings.ROOT_DIR / "sql_scripts"
+
+# full rebuild from the units loaded from the open-MaStR SQLite file (loader.py)
+FULL_IMPORT_SCRIPT = "03_unite_tables.sql"
+# applies only the units that changed since the last import to a copy of the live generation
+INCREMENTAL_IMPORT_SCRIPT = "03_update_tables.sql"
+# tables derived from current_totals, monthly_timeline and energy_units, run in this order after the import
+DERIVED_TABLE_SCRIPTS = [
+    "04_current_rankings.sql",
+    "05_cumulative_timeline.sql",
+    "06_search_indexes.sql",
+    "07_map_geometries.sql",
+    "08_realm_totals.sql",
+]
+# derived tables an incremental import updates in a copy of the live generation instead of rebuilding them,
+# {script building the table: (table, script updating the copy)}
+INCREMENTAL_DERIVED_TABLES = {
+    "05_cumulative_timeline.sql": (
+        "cumulative_timeline",
+        "05_update_cumulative_timeline.sql",
+    ),
+    "07_map_geometries.sql": ("simplified_geometries", "07_update_map_geometries.sql"),
+}
+# stamps a new data version once a generation is published
+DATA_VERSION_SCRIPT = "data_version.sql"
+
+# tables built by the import scripts, the derived tables are rebuilt from them
+IMPORTED_TABLES = [
+    "energy_units",
+    "monthly_timeline",
+    "current_totals",
+    "unit_snapshot",
+]
+# the incremental import only diffs against unit_snapshot, it reads the live one instead of a copy
+INCREMENTAL_IMPORT_READS = ["unit_snapshot"]
+# the incremental import only stages the changed rows of energy_units, the new generation takes the live table over
+# when it is published (hand_over_energy_units)
+INCREMENTAL_IMPORT_HANDS_OVER = ["energy_units"]
+DERIVED_TABLES = [
+    "current_rankings",
+    "cumulative_timeline",
+    "simplified_geometries",
+    "realm_totals",
+]
+
+# columns of current_totals the import does not know, they are carried over from the live generation
+CARRIED_OVER_COLUMNS = ["population", "area", "geom"]
+# the same columns per municipality key for municipalities the live generation lacks, e.g. of synthetic data
+# (synthetic.seed_municipalities), kept in public outside of the generations
+SEED_TABLE = "municipality_seed"
+
+# a new generation must not lose more than this share of the rows of the live one
+MAX_ROW_LOSS = 0.1
+# a step taking this many times its median duration of previous runs is reported as a regression
+REGRESSION_FACTOR = 1.5
+
+
+# "-- step: name after: other, another" comments split a script into steps
+STEP_MARKER = re.compile(
+    r"^-- step: (?P<name>\w+)(?: after:(?P<after>[\w, ]*))?$", re.MULTILINE
+)
+CREATE_INDEX = re.compile(r"^CREATE INDEX (\w+)", re.MULTILINE)
+
+
+class Step:
+    """
+    A unit of the import: an SQL statement (or several) or a function taking
+    a cursor, to be run once all steps named in after are done.
+    """
+
+    def __init__(self, name, sql=None, function=None, after=()):
+        self.name = name
+        self.sql = sql
+        self.function = function
+        self.after = set(after)
+
+    def __repr__(self):
+        return f"<Step {self.name}>"
+
+    def run(self, cursor):
+        """Run the step and return the number of rows it affected (None if unknown)."""
+        if self.function is not None:
+            return self.function(cursor)
+
+        rows = None
+        for statement in sql_statements(self.sql):
+            cursor.execute(statement)
+            if cursor.rowcount >= 0:
+                rows = (rows or 0) + cursor.rowcount
+        return rows
+
+
+def sql_statements(sql):
+    """Split SQL into its statements, leaving out comments between them."""
+    return [
+        statement
+        for statement in sqlparse.split(sql)
+        if sqlparse.format(statement, strip_comments=True).strip()
+    ]
+
+
+def script_steps(script, sql, after=()):
+    """
+    Split the SQL of a script into steps by its "-- step:" comments.
+
+    Steps without "after:" follow the step before, the first one follows
+    the steps in after. A script without such comments is one step named after the script.
+    """
+    # [text before the first step, name, after, sql, name, after, sql, ...]
+    parts = STEP_MARKER.split(sql)
+    if len(parts) == 1:
+        return [Step(script.split(".")[0], sql=sql, after=after)]
+
+    steps = []
+    previous = set(after)
+    for i in range(1, len(parts), 3):
+        name, step_after, step_sql = parts[i : i + 3]  # noqa: E203
+        if step_after is None:
+            step_after = previous
+        else:
+            step_after = {
+                other.strip() for other in step_after.split(",") if other.strip()
+            }
+        steps.append(Step(name, sql=step_sql, after=step_after))
+        previous = {name}
+    return steps
+
+
+def final_steps(steps):
+    """Names of the steps no other step waits for"""
+    names = {step.name for step in steps}
+    return names - set().union(*(step.after for step in steps))
+
+
+def schema_sizes(cursor, schema):
+    """Return the bytes taken by the tables and by the indexes of schema."""
+    cursor.execute(
+        "SELECT coalesce(sum(pg_table_size(c.oid)), 0), coalesce(sum(pg_indexes_size(c.oid)), 0) "
+        "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = %s AND c.relkind IN ('r', 'm', 'p')",
+        [schema],
+    )
+    return cursor.fetchone()
+
+
+def run_step_in_staging_schema(step):
+    """
+    Run a step on a connection of its own with the staging schema on the
+    search_path and return its measurements (the fields of an EtlStep).
+    """
+    try:
+        with connection.cursor() as cursor:
+            use_staging_schema(cursor)
+            table_size, index_size = schema_sizes(cursor, staging_schema())
+            started_at, start = timezone.now(), time.monotonic()
+            rows = step.run(cursor)
+            duration = time.monotonic() - start
+            new_table_size, new_index_size = schema_sizes(cursor, staging_schema())
+    finally:
+        # each worker thread has its own connection
+        connection.close()
+    return {
+        "name": step.name,
+        "started_at": started_at,
+        "duration": duration,
+        "rows": rows,
+        "table_size_delta": new_table_size - table_size,
+        "index_size_delta": new_index_size - index_size,
+    }
+
+
+def run_steps(
+    steps, workers, run_step=run_step_in_staging_schema, log=None, record=None
+):
+    """
+    Run every step once all its after steps are done, up to workers steps at
+    a time. record is called with the result of run_step of every step.
+    """
+    pending = {step.name: step for step in steps}
+    done = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while pending or running:
+            for step in list(pending.values()):
+                if step.after <= done:
+                    del pending[step.name]
+                    running[executor.submit(run_step, step)] = (step, time.monotonic())
+            if not running:
+                raise ValueError(
+                    f"Steps waiting for unknown or circular steps: {list(pending.values())}"
+                )
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step, started_at = running.pop(future)
+                result = future.result()
+                done.add(step.name)
+                if record:
+                    record(result)
+                if log:
+                    log(f"{step.name} done in {time.monotonic() - started_at:.1f}s")
+
+
+def live_schema():
+    return settings.MASTR_DATA_SCHEMA
+
+
+def staging_schema():
+    return f"{settings.MASTR_DATA_SCHEMA}_staging"
+
+
+def previous_schema():
+    return f"{settings.MASTR_DATA_SCHEMA}_previous"
+
+
+def read_script(name):
+    return (SQL_SCRIPTS_DIR / name).read_text()
+
+
+def schema_exists(cursor, schema):
+    cursor.execute(
+        "SELECT EXISTS(SELECT FROM pg_namespace WHERE nspname = %s)", [schema]
+    )
+    return cursor.fetchone()[0]
+
+
+def table_exists(cursor, schema, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [f"{schema}.{table}"])
+    return cursor.fetchone()[0]
+
+
+def create_staging_schema(cursor):
+    """Start a new generation in an empty staging schema and build everything in there."""
+    ensure_live_schema(cursor)
+    cursor.execute(f"DROP SCHEMA IF EXISTS {staging_schema()} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {staging_schema()}")
+    use_staging_schema(cursor)
+
+
+def use_staging_schema(cursor):
+    # public stays on the path for PostGIS, pg_trgm and the *_extended tables of pgloader
+    cursor.execute(f"SET search_path TO {staging_schema()}, public")
+
+
+def reset_search_path(cursor):
+    cursor.execute("RESET search_path")
+
+
+def script_indexes(scripts):
+    """Names of the indexes the scripts create"""
+    return {
+        name for script in scripts for name in CREATE_INDEX.findall(read_script(script))
+    }
+
+
+def copy_live_table(cursor, table, skip_indexes=()):
+    """
+    Copy a table of the live generation into the staging schema, with its
+    partitions (e.g. energy_units), indexes and own id sequence. Indexes in
+    skip_indexes are left out, e.g. those a later script creates anyway.
+    """
+    live, staging = live_schema(), staging_schema()
+    cursor.execute("SELECT pg_get_partkeydef(%s::regclass)", [f"{live}.{table}"])
+    (partition_key,) = cursor.fetchone()
+    partition_by = f" PARTITION BY {partition_key}" if partition_key else ""
+    cursor.execute(
+        f"CREATE TABLE {staging}.{table} (LIKE {live}.{table} INCLUDING CONSTRAINTS){partition_by}"
+    )
+    if partition_key:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+            [f"{live}.{table}"],
+        )
+        for partition, bound in cursor.fetchall():
+            cursor.execute(
+                f"CREATE TABLE {staging}.{partition} PARTITION OF {staging}.{table} {bound}"
+            )
+    cursor.execute(f"INSERT INTO {staging}.{table} SELECT * FROM {live}.{table}")
+    rows = cursor.rowcount
+
+    # same index names as in the live schema, so scripts dropping and recreating an index find it
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = %s AND tablename = %s",
+        [live, table],
+    )
+    for index, indexdef in cursor.fetchall():
+        if index in skip_indexes:
+            continue
+        # indexes of partitioned tables are defined ON ONLY the parent, created ON it they cover all partitions
+        indexdef = re.sub(
+            rf" ON (ONLY )?{live}\.{table} ", f" ON {staging}.{table} ", indexdef, 1
+        )
+        cursor.execute(indexdef)
+
+    cursor.execute(
+        "SELECT EXISTS(SELECT FROM information_schema.columns "
+        "WHERE table_schema = %s AND table_name = %s AND column_name = 'id')",
+        [staging, table],
+    )
+    if cursor.fetchone()[0]:
+        # the sequence of the live table is dropped together with the previous generation
+        cursor.execute(
+            f"CREATE SEQUENCE {staging}.{table}_id_seq OWNED BY {staging}.{table}.id"
+        )
+        cursor.execute(
+            f"SELECT setval('{staging}.{table}_id_seq', coalesce(max(id), 0) + 1, false) FROM {staging}.{table}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {staging}.{table} ALTER COLUMN id SET DEFAULT nextval('{staging}.{table}_id_seq')"
+        )
+    return rows
+
+
+def link_live_table(cursor, table):
+    """Make a table of the live generation readable as live_<table> in the staging schema, without copying it"""
+    cursor.execute(
+        f"CREATE VIEW {staging_schema()}.live_{table} AS SELECT * FROM {live_schema()}.{table}"
+    )
+
+
+def carry_over_columns(cursor):
+    """
+    Fill the columns of current_totals the import does not know from the
+    live generation, what is still missing from the seed table.
+    """
+    sources = [
+        f"{schema}.{table}"
+        for schema, table in [
+            (live_schema(), "current_totals"),
+            ("public", SEED_TABLE),
+        ]
+        if table_exists(cursor, schema, table)
+    ]
+    assignments = ", ".join(
+        f"{column} = coalesce(staged.{column}, source.{column})"
+        for column in CARRIED_OVER_COLUMNS
+    )
+    rows = 0
+    for source in sources:
+        cursor.execute(
+            f"UPDATE {staging_schema()}.current_totals staged SET {assignments} "
+            f"FROM {source} source "
+            "WHERE staged.municipality_key = source.municipality_key"
+        )
+        rows += cursor.rowcount
+    return rows
+
+
+def load_steps(table, sqlite_path=None):
+    """Steps loading every technology from the open-MaStR SQLite file into table, once the step creating it is done"""
+    return [
+        Step(
+            load_step_name(technology),
+            function=partial(
+                load_technology,
+                technology=technology,
+                table=table,
+                sqlite_path=sqlite_path,
+            ),
+            after={table},
+        )
+        for technology in TECHNOLOGIES
+    ]
+
+
+def import_steps(incremental=False, derived_only=False, sqlite_path=None):
+    """
+    Return the steps building a new generation in the staging schema.
+
+    An incremental import only copies the small live tables it changes
+    (monthly_timeline, current_totals): it reads the live unit_snapshot
+    without copying it, stages only the changed rows of energy_units (the
+    live table is handed over when publishing) and updates copies of the
+    derived tables of INCREMENTAL_DERIVED_TABLES instead of rebuilding them.
+    """
+    # (live table copied first or None, script) per derived table
+    derived = [
+        INCREMENTAL_DERIVED_TABLES.get(script, (None, script))
+        if incremental
+        else (None, script)
+        for script in DERIVED_TABLE_SCRIPTS
+    ]
+    # indexes the scripts of this import create anyway are not copied
+    copy_table = partial(
+        copy_live_table, skip_indexes=script_indexes(script for _, script in derived)
+    )
+
+    steps = []
+    if incremental:
+        steps += [
+            Step(f"link_{table}", function=partial(link_live_table, table=table))
+            for table in INCREMENTAL_IMPORT_READS
+        ]
+    if incremental or derived_only:
+        steps += [
+            Step(f"copy_{table}", function=partial(copy_table, table=table))
+            for table in IMPORTED_TABLES
+            if not incremental
+            or table not in INCREMENTAL_IMPORT_READS + INCREMENTAL_IMPORT_HANDS_OVER
+        ]
+
+    if incremental:
+        steps += script_steps(
+            INCREMENTAL_IMPORT_SCRIPT,
+            read_script(INCREMENTAL_IMPORT_SCRIPT),
+            after=final_steps(steps),
+        )
+        steps += load_steps("incoming_units", sqlite_path)
+    elif not derived_only:
+        steps += script_steps(FULL_IMPORT_SCRIPT, read_script(FULL_IMPORT_SCRIPT))
+        steps += load_steps("unit_snapshot", sqlite_path)
+        steps.append(
+            Step(
+                "carry_over_columns",
+                function=carry_over_columns,
+                after=final_steps(steps),
+            )
+        )
+
+    # the derived tables do not depend on each other
+    imported = final_steps(steps)
+    for table, script in derived:
+        after = imported
+        if table:
+            # the copy does not depend on the import and starts right away
+            steps.append(
+                Step(f"copy_{table}", function=partial(copy_table, table=table))
+            )
+            after = imported | {f"copy_{table}"}
+        steps += script_steps(script, read_script(script), after=after)
+    return steps
+
+
+def staged_rows(cursor, table):
+    """
+    Rows of a table of the staged generation, None if it is missing. For
+    energy_units staged by an incremental import, the rows the live table
+    will have once it is handed over.
+    """
+    staging, live = staging_schema(), live_schema()
+    if table_exists(cursor, staging, table):
+        cursor.execute(f"SELECT count(*) FROM {staging}.{table}")
+    elif table == "energy_units" and table_exists(
+        cursor, staging, "energy_units_incoming"
+    ):
+        cursor.execute(
+            f"SELECT (SELECT count(*) FROM {live}.energy_units) "
+            f"- (SELECT count(*) FROM {live}.energy_units "
+            f"WHERE unit_nr IN (SELECT unit_nr FROM {staging}.energy_units_changes)) "
+            f"+ (SELECT count(*) FROM {staging}.energy_units_incoming)"
+        )
+    else:
+        return None
+    return cursor.fetchone()[0]
+
+
+def sanity_check_failures(cursor):
+    """Return what is wrong with the staged generation, an empty list if it can be published."""
+    staging, live = staging_schema(), live_schema()
+    failures = []
+    for table in IMPORTED_TABLES + DERIVED_TABLES:
+        rows = staged_rows(cursor, table)
+        if rows is None:
+            failures.append(f"{table} is missing")
+            continue
+        if not rows:
+            failures.append(f"{table} is empty")
+        elif table_exists(cursor, live, table):
+            cursor.execute(f"SELECT count(*) FROM {live}.{table}")
+            (live_rows,) = cursor.fetchone()
+            if rows < live_rows * (1 - MAX_ROW_LOSS):
+                failures.append(
+                    f"{table} has {rows} rows, the live generation {live_rows}"
+                )
+
+    if table_exists(cursor, staging, "current_totals"):
+        cursor.execute(
+            f"SELECT count(*) FROM {staging}.current_totals WHERE total_net_nominal_capacity IS NULL"
+        )
+        (missing_totals,) = cursor.fetchone()
+        if missing_totals:
+            failures.append(f"{missing_totals} rows of current_totals have no total")
+    return failures
+
+
+def ensure_live_schema(cursor):
+    """
+    Create the live schema. Before it existed the tables were created in
+    public, where they would hide the live schema and where the import
+    scripts would drop them, so they are moved into it.
+    """
+    if schema_exists(cursor, live_schema()):
+        return
+    cursor.execute(f"CREATE SCHEMA {live_schema()}")
+    for table in IMPORTED_TABLES + DERIVED_TABLES:
+        if table_exists(cursor, "public", table):
+            cursor.execute(f"ALTER TABLE public.{table} SET SCHEMA {live_schema()}")
+
+
+def table_columns(cursor, schema, table):
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position",
+        [schema, table],
+    )
+    return [column for (column,) in cursor.fetchall()]
+
+
+def move_table(cursor, table, schema, new_schema):
+    """Move a table with its partitions, indexes and own sequences into another schema, no rows are copied."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass",
+        [f"{schema}.{table}"],
+    )
+    for (partition,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {schema}.{partition} SET SCHEMA {new_schema}")
+    cursor.execute(f"ALTER TABLE {schema}.{table} SET SCHEMA {new_schema}")
+
+
+def hand_over_energy_units(cursor, lender, borrower):
+    """
+    Apply the changes of energy_units an incremental import staged in the
+    borrower generation (03_update_tables.sql) to the energy_units of the
+    lender generation and move the table into the borrower. The replaced rows
+    are kept in the borrower (energy_units_replaced) to hand it back.
+    """
+    changed = f"SELECT unit_nr FROM {borrower}.energy_units_changes"
+    # only the generation holding a borrowed energy_units has replaced rows
+    cursor.execute(f"DROP TABLE IF EXISTS {lender}.energy_units_replaced")
+    cursor.execute(f"DROP TABLE IF EXISTS {borrower}.energy_units_replaced")
+    cursor.execute(
+        f"CREATE TABLE {borrower}.energy_units_replaced AS "
+        f"SELECT * FROM {lender}.energy_units WHERE unit_nr IN ({changed})"
+    )
+    cursor.execute(f"DELETE FROM {lender}.energy_units WHERE unit_nr IN ({changed})")
+    columns = ", ".join(table_columns(cursor, borrower, "energy_units_incoming"))
+    cursor.execute(
+        f"INSERT INTO {lender}.energy_units ({columns}) "
+        f"SELECT {columns} FROM {borrower}.energy_units_incoming"
+    )
+    move_table(cursor, "energy_units", lender, borrower)
+
+
+def hand_back_energy_units(cursor, borrower, lender):
+    """Undo hand_over_energy_units: restore the replaced rows and move energy_units back into the lender."""
+    cursor.execute(
+        f"DELETE FROM {borrower}.energy_units "
+        f"WHERE unit_nr IN (SELECT unit_nr FROM {borrower}.energy_units_changes)"
+    )
+    cursor.execute(
+        f"INSERT INTO {borrower}.energy_units SELECT * FROM {borrower}.energy_units_replaced"
+    )
+    cursor.execute(f"DROP TABLE {borrower}.energy_units_replaced")
+    move_table(cursor, "energy_units", borrower, lender)
+
+
+def publish_staging_schema(cursor):
+    """
+    Make the staged generation the live one and keep the live one as the
+    previous generation. A generation staged by an incremental import takes
+    over the live energy_units.
+    """
+    live, staging, previous = live_schema(), staging_schema(), previous_schema()
+    reset_search_path(cursor)
+    # renaming schemas needs no locks on the tables, give up instead of queueing behind a long DDL statement
+    cursor.execute("SET LOCAL lock_timeout = '5s'")
+    cursor.execute(f"DROP SCHEMA IF EXISTS {previous} CASCADE")
+    if not table_exists(cursor, staging, "energy_units"):
+        # moving energy_units locks it, but only for the few changed rows and the renames
+        hand_over_energy_units(cursor, live, staging)
+    cursor.execute(f"ALTER SCHEMA {live} RENAME TO {previous}")
+    cursor.execute(f"ALTER SCHEMA {staging} RENAME TO {live}")
+    cursor.execute(read_script(DATA_VERSION_SCRIPT))
+
+
+def restore_previous_schema(cursor):
+    """
+    Swap the live and the previous generation. If one of them was published
+    by an incremental import, energy_units goes back to the other one.
+    """
+    live, previous = live_schema(), previous_schema()
+    swapped = f"{live}_swapped"
+    cursor.execute("SET LOCAL lock_timeout = '5s'")
+    if not table_exists(cursor, previous, "energy_units"):
+        if table_exists(cursor, live, "energy_units_replaced"):
+            hand_back_energy_units(cursor, live, previous)
+        else:
+            # the rollback of an incremental import is undone
+            hand_over_energy_units(cursor, live, previous)
+    cursor.execute(f"ALTER SCHEMA {live} RENAME TO {swapped}")
+    cursor.execute(f"ALTER SCHEMA {previous} RENAME TO {live}")
+    cursor.execute(f"ALTER SCHEMA {swapped} RENAME TO {previous}")
+    cursor.execute(read_script(DATA_VERSION_SCRIPT))
+
+
+def duration_regressions(durations, previous_durations, factor=REGRESSION_FACTOR):
+    """
+    Compare the duration of every step with its median over previous runs.
+
+    durations: {step name: seconds} of a run, previous_durations: {step name:
+    [seconds, ...]} of earlier runs. Return (name, seconds, median) of the
+    steps taking more than factor times their median, biggest slowdown first.
+    """
+    regressions = []
+    for name, duration in durations.items():
+        if previous_durations.get(name):
+            median = statistics.median(previous_durations[name])
+            if duration > median * factor:
+                regressions.append((name, duration, median))
+    return sorted(regressions, key=lambda regression: regression[2] - regression[1])
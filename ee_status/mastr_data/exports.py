@@ -0,0 +1,294 @@
+"""
+CSV and Parquet exports of current_totals, monthly_timeline and energy_units.
+
+The unfiltered exports are written once per data version into
+settings.MASTR_DATA_EXPORT_DIR by import_mastr (or export_mastr) and served
+from there until the next import. Exports filtered by state, county or
+municipality are streamed straight from the database and not kept. Either
+way the rows are read through a server-side cursor (QuerySet.iterator), so
+even the export of all energy units never sits in memory as a whole.
+"""
+import csv
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import FloatField, Func
+
+from .data_version import get_data_version
+from .models import CurrentTotal, EnergyUnit, MonthlyTimeline
+
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+# request parameters an export can be filtered by, all exported tables have these columns
+FILTER_PARAMETERS = ["state", "county", "municipality", "municipality_key"]
+# rows fetched from the server-side cursor and written to a Parquet row group at a time
+CHUNK_SIZE = 50000
+
+CAPACITY_COLUMNS = [
+    ("pv_net_nominal_capacity", "float"),
+    ("wind_net_nominal_capacity", "float"),
+    ("biomass_net_nominal_capacity", "float"),
+    ("hydro_net_nominal_capacity", "float"),
+    ("storage_net_nominal_capacity", "float"),
+]
+REALM_COLUMNS = [
+    ("municipality_key", "string"),
+    ("municipality", "string"),
+    ("county", "string"),
+    ("state", "string"),
+]
+
+# exported tables: model and (column, type) of every exported column
+EXPORTS = {
+    "current_totals": (
+        CurrentTotal,
+        REALM_COLUMNS
+        + [("zip_code", "string")]
+        + CAPACITY_COLUMNS
+        + [
+            ("total_net_nominal_capacity", "float"),
+            ("population", "integer"),
+            ("area", "float"),
+            ("energy_units", "integer"),
+        ],
+    ),
+    "monthly_timeline": (
+        MonthlyTimeline,
+        [("date", "date")] + REALM_COLUMNS + CAPACITY_COLUMNS,
+    ),
+    "energy_units": (
+        EnergyUnit,
+        [("unit_nr", "string")]
+        + REALM_COLUMNS
+        + [("zip_code", "string"), ("start_up_date", "date"), ("date", "date")]
+        + CAPACITY_COLUMNS
+        + [("latitude", "float"), ("longitude", "float")],
+    ),
+}
+
+
+def to_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def to_float(value):
+    return None if value is None else float(value)
+
+
+def to_integer(value):
+    return None if value is None else int(value)
+
+
+# how the values of a column type are written, NUMERIC columns arrive as Decimal
+CONVERTERS = {"float": to_float, "integer": to_integer, "date": to_date}
+
+
+def export_filters(params):
+    """The filter parameters of a request (or command line) that are set"""
+    return {
+        name: params[name].strip()
+        for name in FILTER_PARAMETERS
+        if (params.get(name) or "").strip()
+    }
+
+
+def export_rows(name, filters):
+    """Rows of an export, fetched CHUNK_SIZE at a time from a server-side cursor"""
+    model, columns = EXPORTS[name]
+    queryset = model.objects.filter(**filters).order_by("pk")
+    if model is EnergyUnit:
+        queryset = queryset.annotate(
+            latitude=Func("geolocation", function="ST_Y", output_field=FloatField()),
+            longitude=Func("geolocation", function="ST_X", output_field=FloatField()),
+        )
+    converters = [CONVERTERS.get(column_type) for _, column_type in columns]
+    for row in queryset.values_list(*(column for column, _ in columns)).iterator(
+        chunk_size=CHUNK_SIZE
+    ):
+        yield tuple(
+            value if value is None or convert is None else convert(value)
+            for value, convert in zip(row, converters)
+        )
+
+
+def chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_parts(rows, columns, file):
+    """Write the rows as CSV to file, yielding after the header and every CHUNK_SIZE rows"""
+    text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow([column for column, _ in columns])
+    text.flush()
+    yield
+    for chunk in chunks(rows):
+        writer.writerows(chunk)
+        text.flush()
+        yield
+    text.detach()
+
+
+def parquet_parts(rows, columns, file):
+    """Write the rows as Parquet to file with a row group per CHUNK_SIZE rows, yielding after every row group"""
+    # only needed for Parquet exports
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "string": pa.string(),
+        "float": pa.float64(),
+        "integer": pa.int64(),
+        "date": pa.date32(),
+    }
+    schema = pa.schema(
+        [(column, types[column_type]) for column, column_type in columns]
+    )
+    with pq.ParquetWriter(file, schema) as writer:
+        empty = True
+        for chunk in chunks(rows):
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*chunk), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            empty = False
+            yield
+        if empty:
+            # a file without rows still has the columns
+            writer.write_table(schema.empty_table())
+
+
+WRITERS = {"csv": csv_parts, "parquet": parquet_parts}
+
+
+def write_csv(rows, columns, file):
+    for _ in csv_parts(rows, columns, file):
+        pass
+
+
+def write_parquet(rows, columns, file):
+    for _ in parquet_parts(rows, columns, file):
+        pass
+
+
+def write_export(name, file_format, filters, file):
+    for _ in WRITERS[file_format](export_rows(name, filters), EXPORTS[name][1], file):
+        pass
+
+
+class StreamBuffer(io.RawIOBase):
+    """Write-only file handing out what was written to it since the last take()"""
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def stream_export(name, file_format, filters):
+    """Bytes of an export as they are written, e.g. for a StreamingHttpResponse"""
+    buffer = StreamBuffer()
+    parts = WRITERS[file_format](export_rows(name, filters), EXPORTS[name][1], buffer)
+    for _ in parts:
+        yield buffer.take()
+    yield buffer.take()
+
+
+def has_rows(name, filters):
+    model, _ = EXPORTS[name]
+    return model.objects.filter(**filters).exists()
+
+
+def export_directory():
+    """Directory of the exports of the current data version"""
+    version = get_data_version()
+    return Path(settings.MASTR_DATA_EXPORT_DIR) / str(version.pk if version else 0)
+
+
+def export_path(name, file_format):
+    """
+    Path of the unfiltered export of the current data version, None if there
+    is none. The exports of a data version are written after it is published,
+    until they are there the newest export of a previous version is served.
+    """
+    root = Path(settings.MASTR_DATA_EXPORT_DIR)
+    if not root.is_dir():
+        return None
+    current = export_directory()
+    directories = sorted(
+        (directory for directory in root.iterdir() if directory.name.isdigit()),
+        key=lambda directory: (directory == current, int(directory.name)),
+        reverse=True,
+    )
+    for directory in directories:
+        path = directory / f"{name}.{file_format}"
+        if path.is_file():
+            return path
+    return None
+
+
+def remove_old_exports(directory):
+    """Remove the exports of all other data versions and what interrupted writers left behind."""
+    for other in directory.parent.iterdir():
+        if other.is_dir() and other != directory:
+            shutil.rmtree(other, ignore_errors=True)
+    for part in directory.glob("*.part"):
+        part.unlink(missing_ok=True)
+
+
+def write_exports(names=None, file_formats=None):
+    """
+    Write the unfiltered exports of the current data version and return their
+    paths, each one is written next to its final path and renamed, so a
+    half-written export is never served.
+    """
+    directory = export_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name in names or EXPORTS:
+        for file_format in file_formats or FORMATS:
+            path = directory / f"{name}.{file_format}"
+            with tempfile.NamedTemporaryFile(
+                dir=directory, suffix=".part", delete=False
+            ) as file:
+                try:
+                    write_export(name, file_format, {}, file)
+                except BaseException:
+                    os.unlink(file.name)
+                    raise
+            os.replace(file.name, path)
+            paths.append(path)
+    # export_path falls back to the old exports until the new ones are there
+    remove_old_exports(directory)
+    return paths
@@ -0,0 +1,153 @@
+"""
+Capacities of every municipality as of a past month, for the totals and
+rankings pages with a date parameter.
+
+The running totals of cumulative_timeline (sql_scripts/05_cumulative_timeline.sql)
+are kept as flat NumPy arrays sorted by series (a municipality) and month, the
+capacities of all municipalities as of a month are one np.searchsorted. They
+are handed to a copy of the ranking engine, which computes ratios, ranks and
+rankings from them like from today's numbers. Population and area are only
+known for today and are used for every month.
+"""
+import re
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+from django.db.models import F
+from django.utils.timezone import localtime
+
+from .data_version import per_data_version
+from .models import CumulativeTimeline
+from .ranking_engine import NUMERIC_FIELDS, get_ranking_engine
+
+# capacities the history is kept of, the ones the totals and rankings pages rank by
+HISTORY_FIELDS = ["total_net_nominal_capacity", "storage_net_nominal_capacity"]
+# fields of the ranking engine that do not change over time
+TIMELESS_FIELDS = ["population", "area"]
+# month numbers stay below this, series * SERIES_SPAN + month orders by series and month
+SERIES_SPAN = 12 * 10000
+# snapshots of past months kept per process
+SNAPSHOTS = 24
+
+re_month = re.compile(r"^(\d{4})-(\d{2})(?:-\d{2})?$")
+
+
+def month_number(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_date(number):
+    return date(number // 12, number % 12 + 1, 1)
+
+
+def parse_month(value):
+    """Month number of "YYYY-MM" or "YYYY-MM-DD", ValueError if it is neither"""
+    match = re_month.match(value.strip())
+    if not match:
+        raise ValueError(f"{value!r} is not a month")
+    return month_number(date(int(match[1]), int(match[2]), 1))
+
+
+class History:
+    """Running totals of every municipality of a ranking engine"""
+
+    def __init__(self, engine, rows):
+        """
+        rows: (state, county, municipality, municipality_key, date, *HISTORY_FIELDS)
+
+        Municipalities sharing a name within a county have a series per
+        municipality key, their series are added up. Municipalities that are
+        no longer in current_totals are left out.
+        """
+        self.engine = engine
+        index = engine.index["municipality"]
+        series = {}
+        series_codes, keys, columns = [], [], [[] for _ in HISTORY_FIELDS]
+        for state, county, municipality, municipality_key, day, *values in rows:
+            code = index.get((state, county, municipality))
+            if code is None:
+                continue
+            position = series.setdefault(
+                (state, county, municipality, municipality_key), len(series)
+            )
+            if position == len(series_codes):
+                series_codes.append(code)
+            keys.append(position * SERIES_SPAN + month_number(day))
+            for column, value in zip(columns, values):
+                column.append(value)
+
+        order = np.argsort(np.array(keys, dtype=np.int64), kind="stable")
+        self.keys = np.array(keys, dtype=np.int64)[order]
+        self.values = {
+            field: np.array(column, dtype=float)[order]
+            for field, column in zip(HISTORY_FIELDS, columns)
+        }
+        self.series_codes = np.array(series_codes, dtype=np.intp)
+        # values of a municipality go to its first row in the engine, sums per realm stay the same
+        _, self.first_rows = np.unique(engine.codes["municipality"], return_index=True)
+        self.engine_as_of = lru_cache(maxsize=SNAPSHOTS)(self._engine_as_of)
+
+    @classmethod
+    def from_database(cls, engine):
+        rows = (
+            CumulativeTimeline.objects.filter(level="municipality")
+            .annotate(
+                total=F("pv_net_nominal_capacity")
+                + F("wind_net_nominal_capacity")
+                + F("biomass_net_nominal_capacity")
+                + F("hydro_net_nominal_capacity")
+            )
+            .values_list(
+                "state",
+                "county",
+                "municipality",
+                "municipality_key",
+                "date",
+                "total",
+                "storage_net_nominal_capacity",
+            )
+            .iterator()
+        )
+        # months are those of the local time zone, like on the chart of the totals page
+        return cls(
+            engine,
+            (
+                (state, county, municipality, key, localtime(day), *values)
+                for state, county, municipality, key, day, *values in rows
+            ),
+        )
+
+    def values_as_of(self, month):
+        """HISTORY_FIELDS of every row of the engine as of month, 0 before the first unit"""
+        series = np.arange(len(self.series_codes))
+        positions = (
+            np.searchsorted(self.keys, series * SERIES_SPAN + month, "right") - 1
+        )
+        found = positions >= 0
+        found[found] = self.keys[positions[found]] // SERIES_SPAN == series[found]
+
+        values = {}
+        for field, column in self.values.items():
+            per_series = np.where(found, column[positions.clip(0)], 0.0)
+            per_municipality = np.bincount(
+                self.series_codes, weights=per_series, minlength=len(self.first_rows)
+            )
+            values[field] = np.zeros(self.engine.size)
+            values[field][self.first_rows] = per_municipality
+        return values
+
+    def _engine_as_of(self, month):
+        # what is neither kept in the history nor timeless is unknown for past months
+        unknown = {
+            field: np.full(self.engine.size, np.nan)
+            for field in NUMERIC_FIELDS
+            if field not in HISTORY_FIELDS + TIMELESS_FIELDS
+        }
+        return self.engine.with_values({**unknown, **self.values_as_of(month)})
+
+
+@per_data_version
+def get_history():
+    """Return the history of this process, reloaded whenever the data version changes"""
+    return History.from_database(get_ranking_engine())
@@ -0,0 +1,99 @@
+import csv
+import io
+import sqlite3
+
+from django.conf import settings
+
+TECHNOLOGIES = ["solar", "wind", "biomass", "hydro", "storage"]
+
+# columns of the {technology}_extended tables of open-MaStR and the unit_snapshot columns they are loaded into
+SOURCE_COLUMNS = {
+    "EinheitMastrNummer": "unit_nr",
+    "NetzbetreiberpruefungStatus": "grid_operator_status",
+    "Gemeindeschluessel": "municipality_key",
+    "Gemeinde": "municipality",
+    "Landkreis": "county",
+    "Bundesland": "state",
+    "Postleitzahl": "zip_code",
+    "Inbetriebnahmedatum": "start_up_date",
+    "DatumEndgueltigeStilllegung": "close_down_date",
+    "Nettonennleistung": "net_nominal_capacity",
+    "Breitengrad": "latitude",
+    "Laengengrad": "longitude",
+}
+# lengths of the VARCHAR columns of unit_snapshot, longer values are cut like a cast to VARCHAR(n) would
+COLUMN_LENGTHS = {
+    "grid_operator_status": 3,
+    "municipality_key": 8,
+    "municipality": 200,
+    "county": 200,
+    "state": 200,
+    "zip_code": 6,
+}
+
+BATCH_SIZE = 10000
+
+
+def load_step_name(technology):
+    return f"load_{technology}"
+
+
+class CsvStream:
+    """
+    Read-only file object serving the rows of a SQLite cursor as CSV, as
+    copy_expert wants it. Rows are fetched batch_size at a time, so only one
+    batch is in memory.
+    """
+
+    def __init__(self, rows, technology, batch_size=BATCH_SIZE):
+        self.rows = rows
+        self.technology = technology
+        self.batch_size = batch_size
+        self.lengths = [
+            COLUMN_LENGTHS.get(column) for column in SOURCE_COLUMNS.values()
+        ]
+        self.chunk = ""
+        self.position = 0
+
+    def next_chunk(self):
+        batch = self.rows.fetchmany(self.batch_size)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for row in batch:
+            unit_nr, *values = (
+                value[:length] if length and isinstance(value, str) else value
+                for value, length in zip(row, self.lengths)
+            )
+            writer.writerow([unit_nr, self.technology, *values])
+        return buffer.getvalue()
+
+    def read(self, size=-1):
+        if self.position >= len(self.chunk):
+            self.chunk = self.next_chunk()
+            self.position = 0
+        end = len(self.chunk) if size is None or size < 0 else self.position + size
+        data = self.chunk[self.position : end]  # noqa: E203
+        self.position += len(data)
+        return data
+
+
+def load_technology(cursor, technology, table, sqlite_path=None, batch_size=BATCH_SIZE):
+    """
+    Stream the units of a technology from the open-MaStR SQLite file into
+    table (unit_snapshot or incoming_units) with COPY, reading only the
+    columns the import needs.
+    """
+    sqlite_path = sqlite_path or settings.MASTR_DATA_SQLITE_PATH
+    source = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    try:
+        rows = source.execute(
+            f"SELECT {', '.join(SOURCE_COLUMNS)} FROM {technology}_extended"
+        )
+        columns = ["unit_nr", "technology", *list(SOURCE_COLUMNS.values())[1:]]
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            CsvStream(rows, technology, batch_size),
+        )
+        return cursor.rowcount
+    finally:
+        source.close()
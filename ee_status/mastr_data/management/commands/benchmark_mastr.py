@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ee_status.mastr_data import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure p50/p95 latency, queries and peak memory of the mastr_data views at every realm level "
+        "(e.g. on the data of generate_synthetic_mastr) and compare them with a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--samples",
+            type=int,
+            default=5,
+            help="Realms measured per realm level (default: 5)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="Requests per realm (default: 10)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--cached",
+            action="store_true",
+            help="Keep the responses cached per data version (default: every request is a cache miss)",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="JSON file of a previous run, regressions against it make the command fail",
+        )
+        parser.add_argument(
+            "--save-baseline", help="Write the results to this JSON file"
+        )
+
+    def handle(self, *args, **options):
+        results = benchmark.run(
+            samples=options["samples"],
+            repeat=options["repeat"],
+            seed=options["seed"],
+            cached=options["cached"],
+        )
+
+        self.stdout.write(
+            f"{'case':<28} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KiB':>9}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<28} {result['p50']:>9.2f} {result['p95']:>9.2f} "
+                f"{result['queries']:>8} {result['peak_memory'] / 1024:>9.0f}"
+            )
+
+        if options["save_baseline"]:
+            benchmark.save_baseline(options["save_baseline"], results)
+            self.stdout.write(f"Saved the baseline to {options['save_baseline']}")
+
+        if options["baseline"]:
+            messages = benchmark.regressions(
+                results, benchmark.load_baseline(options["baseline"])
+            )
+            if messages:
+                raise CommandError("Regressions:\n" + "\n".join(messages))
+            self.stdout.write(self.style.SUCCESS("No regressions"))
@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import filesizeformat
+
+from ee_status.mastr_data import etl
+from ee_status.mastr_data.models import EtlRun, EtlStep
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the duration, rows and size growth of every step of an import and "
+        "the steps that got slower than in previous runs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--run", type=int, help="id of the run to show (default: the latest run)"
+        )
+        parser.add_argument(
+            "--previous",
+            type=int,
+            default=5,
+            help="Number of previous published runs of the same mode to compare with (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        runs = EtlRun.objects.all()
+        if options["run"]:
+            runs = runs.filter(pk=options["run"])
+        etl_run = runs.first()
+        if etl_run is None:
+            raise CommandError("There is no such import run")
+
+        self.stdout.write(str(etl_run))
+        if etl_run.message:
+            self.stdout.write(etl_run.message)
+        steps = list(etl_run.steps.all())
+        for step in steps:
+            rows = "" if step.rows is None else f"{step.rows} rows"
+            self.stdout.write(
+                f"{step.name:<30} {step.duration:>8.1f}s {rows:>16} "
+                f"tables {self.size(step.table_size_delta):>10} "
+                f"indexes {self.size(step.index_size_delta):>10}"
+            )
+        if etl_run.finished_at:
+            total = etl_run.finished_at - etl_run.started_at
+            self.stdout.write(f"{'total':<30} {total.total_seconds():>8.1f}s")
+
+        previous_runs = EtlRun.objects.filter(
+            mode=etl_run.mode,
+            status=EtlRun.PUBLISHED,
+            started_at__lt=etl_run.started_at,
+        )[: options["previous"]]
+        previous_durations = defaultdict(list)
+        for name, duration in EtlStep.objects.filter(
+            run__in=list(previous_runs)
+        ).values_list("name", "duration"):
+            previous_durations[name].append(duration)
+
+        regressions = etl.duration_regressions(
+            {step.name: step.duration for step in steps}, previous_durations
+        )
+        for name, duration, median in regressions:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{name} took {duration:.1f}s, the median of previous runs is {median:.1f}s"
+                )
+            )
+        if previous_durations and not regressions:
+            self.stdout.write(self.style.SUCCESS("No step got slower"))
+
+    @staticmethod
+    def size(delta):
+        sign = "-" if delta < 0 else "+"
+        return f"{sign}{filesizeformat(abs(delta))}"
@@ -0,0 +1,67 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ee_status.mastr_data.data_version import get_data_version
+from ee_status.mastr_data.exports import (
+    EXPORTS,
+    FILTER_PARAMETERS,
+    FORMATS,
+    export_filters,
+    write_export,
+    write_exports,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Export tables of the MaStR data as CSV or Parquet. Without --output the unfiltered exports are written "
+        "to settings.MASTR_DATA_EXPORT_DIR, where the export views serve them from (import_mastr does that)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "tables",
+            nargs="*",
+            choices=list(EXPORTS),
+            help="Tables to export (default: all)",
+        )
+        parser.add_argument(
+            "--format",
+            dest="formats",
+            action="append",
+            choices=list(FORMATS),
+            help="Format to export, can be given more than once (default: all)",
+        )
+        for name in FILTER_PARAMETERS:
+            parser.add_argument(
+                f"--{name.replace('_', '-')}",
+                dest=name,
+                help=f"Only rows of this {name} (needs --output)",
+            )
+        parser.add_argument(
+            "--output",
+            help="Write the export to this file, - for stdout (only for a single table and format)",
+        )
+
+    def handle(self, *args, **options):
+        tables = options["tables"] or list(EXPORTS)
+        formats = options["formats"] or list(FORMATS)
+        filters = export_filters(options)
+
+        if options["output"]:
+            if len(tables) != 1 or len(formats) != 1:
+                raise CommandError("--output needs exactly one table and one --format")
+            if options["output"] == "-":
+                write_export(tables[0], formats[0], filters, sys.stdout.buffer)
+            else:
+                with open(options["output"], "wb") as file:
+                    write_export(tables[0], formats[0], filters, file)
+            return
+
+        if filters:
+            raise CommandError("Filtered exports are not kept, pass --output")
+        # the data version may just have been published by this process
+        get_data_version(refresh=True)
+        for path in write_exports(tables, formats):
+            self.stdout.write(str(path))
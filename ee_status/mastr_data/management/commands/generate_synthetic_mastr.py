@@ -0,0 +1,66 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ee_status.mastr_data import etl, synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic Germany-scale MaStR dataset for benchmarks: writes an open-MaStR like "
+        "SQLite file and imports it with import_mastr. Replaces the published data!"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--units",
+            type=int,
+            default=3_000_000,
+            help="Number of energy units (default: 3000000)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the random numbers"
+        )
+        parser.add_argument(
+            "--sqlite-path",
+            default="synthetic-mastr.db",
+            help="SQLite file to write (default: synthetic-mastr.db)",
+        )
+        parser.add_argument("--workers", type=int, default=5)
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Replace the published data, even if it was not generated",
+        )
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            etl.ensure_live_schema(cursor)
+            if (
+                etl.table_exists(cursor, etl.live_schema(), "energy_units")
+                and not options["force"]
+            ):
+                raise CommandError(
+                    "There is published data already, pass --force to replace it"
+                )
+
+        municipalities = synthetic.read_municipalities(seed=options["seed"])
+        self.stdout.write(
+            f"Writing {options['units']} units in {len(municipalities)} municipalities to {options['sqlite_path']}"
+        )
+        synthetic.write_sqlite(
+            options["sqlite_path"],
+            municipalities,
+            options["units"],
+            seed=options["seed"],
+        )
+
+        with connection.cursor() as cursor:
+            synthetic.seed_municipalities(cursor, municipalities)
+        call_command(
+            "import_mastr",
+            sqlite_path=options["sqlite_path"],
+            workers=options["workers"],
+            stdout=self.stdout,
+            stderr=self.stderr,
+        )
@@ -0,0 +1,127 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ee_status.mastr_data import etl
+from ee_status.mastr_data.models import EtlRun, EtlStep
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a new generation of the MaStR data tables (imported and derived tables) in a staging schema, "
+        "check it and publish it"
+    )
+
+    def add_arguments(self, parser):
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only apply the units that changed since the last import to the live data",
+        )
+        mode.add_argument(
+            "--derived-only",
+            action="store_true",
+            help="Keep the imported tables and only rebuild the derived tables (rankings, timelines, ...)",
+        )
+        parser.add_argument(
+            "--sqlite-path",
+            help="open-MaStR SQLite file to import (default: settings.MASTR_DATA_SQLITE_PATH)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=5,
+            help="Number of steps running at the same time, each on its own database connection (default: 5)",
+        )
+        parser.add_argument(
+            "--no-exports",
+            action="store_true",
+            help="Do not write the unfiltered CSV and Parquet exports after publishing (python manage.py export_mastr)",
+        )
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            etl.ensure_live_schema(cursor)
+            if options["incremental"] or options["derived_only"]:
+                tables = list(etl.IMPORTED_TABLES)
+                if options["incremental"]:
+                    # the incremental import updates copies of these
+                    tables += [
+                        table for table, _ in etl.INCREMENTAL_DERIVED_TABLES.values()
+                    ]
+                for table in tables:
+                    if not etl.table_exists(cursor, etl.live_schema(), table):
+                        raise CommandError(
+                            f"{table} is missing, run a full import first"
+                        )
+            etl.create_staging_schema(cursor)
+            etl.reset_search_path(cursor)
+
+        if options["incremental"]:
+            mode = "incremental"
+        elif options["derived_only"]:
+            mode = "derived_only"
+        else:
+            mode = "full"
+        etl_run = EtlRun.objects.create(mode=mode)
+        try:
+            self.build(etl_run, options)
+        except CommandError as error:
+            self.finish(etl_run, EtlRun.REJECTED, str(error))
+            raise
+        except BaseException as error:
+            self.finish(etl_run, EtlRun.FAILED, repr(error))
+            raise
+        self.finish(etl_run, EtlRun.PUBLISHED)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Published the new data, the previous data is kept in schema {etl.previous_schema()}"
+            )
+        )
+        self.stdout.write(f"Timings: python manage.py etl_report --run {etl_run.pk}")
+        if not options["no_exports"]:
+            write_exports(self.stdout, self.stderr)
+
+    def build(self, etl_run, options):
+        self.stdout.write(f"Building in schema {etl.staging_schema()}")
+        steps = etl.import_steps(
+            incremental=options["incremental"],
+            derived_only=options["derived_only"],
+            sqlite_path=options["sqlite_path"],
+        )
+        etl.run_steps(
+            steps,
+            options["workers"],
+            log=self.stdout.write,
+            record=lambda result: EtlStep.objects.create(run=etl_run, **result),
+        )
+
+        with connection.cursor() as cursor:
+            failures = etl.sanity_check_failures(cursor)
+        if failures:
+            raise CommandError(
+                f"The new data was not published, it is kept in schema {etl.staging_schema()}: "
+                + "; ".join(failures)
+            )
+
+        # one short transaction, readers see either the old or the new generation
+        with transaction.atomic(), connection.cursor() as cursor:
+            etl.publish_staging_schema(cursor)
+
+    def finish(self, etl_run, status, message=""):
+        etl_run.status = status
+        etl_run.message = message
+        etl_run.finished_at = timezone.now()
+        etl_run.save()
+
+
+def write_exports(stdout, stderr):
+    """Write the exports of newly published data, the data stays published if that fails"""
+    try:
+        call_command("export_mastr", stdout=stdout, stderr=stderr)
+    except Exception as error:
+        stderr.write(
+            f"Writing the exports failed ({error!r}), retry with python manage.py export_mastr"
+        )
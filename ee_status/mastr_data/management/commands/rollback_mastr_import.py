@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ee_status.mastr_data import etl
+from ee_status.mastr_data.management.commands.import_mastr import write_exports
+
+
+class Command(BaseCommand):
+    help = "Publish the previous generation of the MaStR data tables again (running it twice undoes the rollback)"
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not etl.schema_exists(cursor, etl.previous_schema()):
+                raise CommandError(
+                    f"There is no previous data (schema {etl.previous_schema()})"
+                )
+            etl.restore_previous_schema(cursor)
+        self.stdout.write(self.style.SUCCESS("Published the previous data"))
+        # exports belong to a data version, the rollback stamped a new one
+        write_exports(self.stdout, self.stderr)
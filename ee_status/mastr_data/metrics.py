@@ -0,0 +1,91 @@
+"""
+Prometheus metrics of the mastr_data views, served on /metrics.
+
+Under gunicorn every worker has its own metrics, with the environment
+variable PROMETHEUS_MULTIPROC_DIR set they are written to files in that
+directory and /metrics adds up the files of all workers (see
+config/gunicorn.py and utility/caprover.sh).
+"""
+import os
+import time
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from .models import DataVersion
+
+REQUEST_DURATION = Histogram(
+    "mastr_data_request_duration_seconds",
+    "Duration of the requests of the mastr_data views",
+    ["view"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    "mastr_data_request_queries",
+    "SQL queries per request of the mastr_data views",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+CACHE_REQUESTS = Counter(
+    "mastr_data_cache_requests_total",
+    "Lookups of responses cached per data version",
+    ["view", "result"],
+)
+
+
+def observe_request(view, duration, queries):
+    REQUEST_DURATION.labels(view).observe(duration)
+    REQUEST_QUERIES.labels(view).observe(queries)
+
+
+def observe_cache(view, hit):
+    CACHE_REQUESTS.labels(view, "hit" if hit else "miss").inc()
+
+
+class ImportCollector:
+    """Time and age of the last published import, read from the database on every scrape"""
+
+    def collect(self):
+        version = DataVersion.objects.order_by("-id").first()
+        if version is None:
+            return
+        imported_at = version.imported_at.timestamp()
+        yield GaugeMetricFamily(
+            "mastr_data_last_import_timestamp_seconds",
+            "Time the current data was published",
+            value=imported_at,
+        )
+        yield GaugeMetricFamily(
+            "mastr_data_last_import_age_seconds",
+            "Seconds since the current data was published",
+            value=time.time() - imported_at,
+        )
+
+
+def metrics_view(request):
+    """Metrics in the Prometheus text format, only for the scrapers in MASTR_DATA_METRICS_ALLOWED_IPS"""
+    if request.META.get("REMOTE_ADDR") not in settings.MASTR_DATA_METRICS_ALLOWED_IPS:
+        raise Http404
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    import_registry = CollectorRegistry()
+    import_registry.register(ImportCollector())
+
+    return HttpResponse(
+        generate_latest(registry) + generate_latest(import_registry),
+        content_type=CONTENT_TYPE_LATEST,
+    )
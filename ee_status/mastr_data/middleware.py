@@ -0,0 +1,58 @@
+import json
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import observe_request
+from .timing import end_request, start_request
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentationMiddleware:
+    """
+    Measure the SQL queries and the phases (see timing.timed) of every
+    request of the mastr_data views. They are reported in a Server-Timing
+    header and a JSON log line (MASTR_DATA_SERVER_TIMING) and as Prometheus
+    metrics (MASTR_DATA_METRICS).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (settings.MASTR_DATA_SERVER_TIMING or settings.MASTR_DATA_METRICS):
+            return self.get_response(request)
+
+        timings = start_request()
+        try:
+            with connection.execute_wrapper(timings.execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            end_request()
+
+        match = request.resolver_match
+        if match is None or match.app_name != "mastr_data":
+            return response
+
+        total = timings.total()
+        if settings.MASTR_DATA_METRICS:
+            observe_request(match.view_name, total, timings.queries)
+        if settings.MASTR_DATA_SERVER_TIMING:
+            response["Server-Timing"] = timings.server_timing(total)
+            logger.info(
+                json.dumps(
+                    {
+                        "view": match.view_name,
+                        "status": response.status_code,
+                        "total_ms": round(total * 1000, 1),
+                        "queries": timings.queries,
+                        **{
+                            f"{phase}_ms": round(seconds * 1000, 1)
+                            for phase, seconds in timings.durations.items()
+                        },
+                    }
+                )
+            )
+        return response
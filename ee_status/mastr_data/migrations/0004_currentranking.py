@@ -0,0 +1,35 @@
+# Generated by Django 3.2.13 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastr_data', '0003_energyunit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('realm_type', models.CharField(max_length=20)),
+                ('municipality', models.CharField(max_length=200, null=True)),
+                ('county', models.CharField(max_length=200, null=True)),
+                ('state', models.CharField(max_length=200, null=True)),
+                ('numerator', models.CharField(max_length=50)),
+                ('denominator', models.CharField(max_length=50)),
+                ('scope', models.CharField(max_length=20)),
+                ('scope_order', models.SmallIntegerField()),
+                ('score', models.FloatField()),
+                ('rank', models.IntegerField(null=True)),
+                ('total_ranks', models.IntegerField(null=True)),
+                ('max_score', models.FloatField(null=True)),
+            ],
+            options={
+                'db_table': 'current_rankings',
+                'managed': False,
+            },
+        ),
+    ]
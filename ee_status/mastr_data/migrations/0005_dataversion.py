@@ -0,0 +1,24 @@
+# Generated by Django 3.2.13 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastr_data', '0004_currentranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imported_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'data_version',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.13 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastr_data', '0005_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CumulativeTimeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(max_length=20)),
+                ('date', models.DateTimeField(default=None)),
+                ('municipality_key', models.CharField(max_length=200, null=True)),
+                ('municipality', models.CharField(max_length=200, null=True)),
+                ('county', models.CharField(max_length=200, null=True)),
+                ('state', models.CharField(max_length=200, null=True)),
+                ('pv_net_nominal_capacity', models.FloatField()),
+                ('wind_net_nominal_capacity', models.FloatField()),
+                ('biomass_net_nominal_capacity', models.FloatField()),
+                ('hydro_net_nominal_capacity', models.FloatField()),
+                ('storage_net_nominal_capacity', models.FloatField()),
+            ],
+            options={
+                'db_table': 'cumulative_timeline',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.13 on 2026-10-18 13:12
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastr_data', '0006_cumulativetimeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimplifiedGeometry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.SmallIntegerField()),
+                ('tolerance', models.FloatField()),
+                ('geom', django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+                ('current_total', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='simplified_geometries', to='mastr_data.currenttotal')),
+            ],
+            options={
+                'db_table': 'simplified_geometries',
+                'managed': False,
+            },
+        ),
+    ]
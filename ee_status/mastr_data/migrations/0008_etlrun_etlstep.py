@@ -0,0 +1,46 @@
+# Generated by Django 3.2.13 on 2026-10-18 15:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastr_data', '0007_simplifiedgeometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EtlRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(max_length=20)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('status', models.CharField(default='running', max_length=20)),
+                ('message', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'etl_runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EtlStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('started_at', models.DateTimeField()),
+                ('duration', models.FloatField(help_text='seconds')),
+                ('rows', models.BigIntegerField(null=True)),
+                ('table_size_delta', models.BigIntegerField(help_text='bytes')),
+                ('index_size_delta', models.BigIntegerField(help_text='bytes')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='mastr_data.etlrun')),
+            ],
+            options={
+                'db_table': 'etl_steps',
+                'ordering': ['started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.13 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastr_data', '0008_etlrun_etlstep'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RealmTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('realm_type', models.CharField(max_length=20)),
+                ('county', models.CharField(max_length=200, null=True)),
+                ('state', models.CharField(max_length=200, null=True)),
+                ('pv_net_nominal_capacity', models.FloatField()),
+                ('wind_net_nominal_capacity', models.FloatField()),
+                ('biomass_net_nominal_capacity', models.FloatField()),
+                ('hydro_net_nominal_capacity', models.FloatField()),
+                ('storage_net_nominal_capacity', models.FloatField()),
+                ('total_net_nominal_capacity', models.FloatField()),
+                ('population', models.BigIntegerField()),
+                ('area', models.FloatField()),
+                ('energy_units', models.BigIntegerField()),
+                ('municipalities', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'realm_totals',
+                'managed': False,
+            },
+        ),
+    ]
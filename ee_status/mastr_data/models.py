@@ -1,6 +1,5 @@
-from operator import itemgetter
-
 from django.contrib.gis.db import models
+from django.db import connection
 from django.db.models import Sum
 from django.utils.translation import gettext_lazy as _
 
@@ -15,12 +14,38 @@ class MonthlyTimeline(models.Model):
     wind_net_nominal_capacity = models.FloatField()
     biomass_net_nominal_capacity = models.FloatField()
     hydro_net_nominal_capacity = models.FloatField()
+    storage_net_nominal_capacity = models.FloatField()
 
     class Meta:
         managed = False
         db_table = "monthly_timeline"
 
 
+class CumulativeTimeline(models.Model):
+    """
+    Running totals of monthly_timeline per admin level and realm.
+
+    The table is built by sql_scripts/05_cumulative_timeline.sql. Columns
+    below the level of a row (e.g. county of a state row) are NULL.
+    """
+
+    level = models.CharField(max_length=20)
+    date = models.DateTimeField(default=None)
+    municipality_key = models.CharField(max_length=200, null=True)
+    municipality = models.CharField(max_length=200, null=True)
+    county = models.CharField(max_length=200, null=True)
+    state = models.CharField(max_length=200, null=True)
+    pv_net_nominal_capacity = models.FloatField()
+    wind_net_nominal_capacity = models.FloatField()
+    biomass_net_nominal_capacity = models.FloatField()
+    hydro_net_nominal_capacity = models.FloatField()
+    storage_net_nominal_capacity = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "cumulative_timeline"
+
+
 class CurrentTotal(models.Model):
     municipality_key = models.CharField(
         verbose_name=_("Municipality Key"), max_length=200
@@ -74,12 +99,11 @@ class CurrentTotal(models.Model):
         else:
             realm_type_for_values = realm_type
 
-        ranking = (
+        scores = (
             CurrentTotal.objects.filter(**scope_dict.get(scope))
             .filter(**denominator_filter_kwargs)
-            .values_list(realm_type_for_values)
+            .values(realm_type_for_values)
             .annotate(score=Sum(numerator) / Sum(denominator))
-            .order_by("-score")
         )
         self_dict = {
             "municipality": self.municipality,
@@ -87,18 +111,41 @@ class CurrentTotal(models.Model):
             "state": self.state,
         }
 
-        if realm_type == scope:
+        # Rank in the database and only fetch our own row. total_ranks and max_score
+        # are the same on every row, so any row will do if we are not ranked.
+        scores_sql, params = scores.query.sql_with_params()
+        realm_column = connection.ops.quote_name(
+            CurrentTotal._meta.get_field(realm_type_for_values).column
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT is_self, rank, total_ranks, max_score
+                FROM (SELECT {realm_column} IS NOT DISTINCT FROM %s AS is_self,
+                             RANK() OVER (ORDER BY score DESC NULLS LAST) AS rank,
+                             COUNT(*) OVER () AS total_ranks,
+                             MAX(score) OVER () AS max_score
+                      FROM ({scores_sql}) AS scores) AS ranked
+                ORDER BY is_self DESC
+                LIMIT 1
+                """,
+                (self_dict.get(realm_type), *params),
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            return "n.a", 0, None
+
+        is_self, rank, total_ranks, max_score = row
+        if realm_type == scope or not is_self:
             rank = "n.a"
         else:
-            rank = str(
-                [i for i, d in enumerate(ranking) if self_dict.get(realm_type) in d][0]
-                + 1
-            )
+            rank = str(rank)
 
-        ranking_without_none = [t for t in ranking if None not in t]
-        max_value = round(max(ranking_without_none, key=itemgetter(1))[1], 1)
+        if max_score is not None:
+            max_score = round(max_score, 1)
 
-        return rank, len(ranking), max_value
+        return rank, total_ranks, max_score
 
     def scope_average(self, numerator, denominator, scope):
         scope_dict = {
@@ -122,7 +169,44 @@ class CurrentTotal(models.Model):
         }
         return self_dict.get(scope)
 
+    def realm_filter(self, realm_type):
+        """Return the lookup kwargs identifying the realm of this object at realm_type level."""
+        order = ["municipality", "county", "state", "country"]
+        return {
+            i: getattr(self, i)
+            for i in order[order.index(realm_type) : -1]  # noqa: E203
+        }
+
     def ratio_and_rank(self, numerator, denominator, realm_type):
+        # Look up the ranks precomputed by sql_scripts/04_current_rankings.sql
+        rankings = CurrentRanking.objects.filter(
+            realm_type=realm_type,
+            numerator=numerator,
+            denominator=denominator,
+            **self.realm_filter(realm_type),
+        ).order_by("scope_order")
+
+        ratio_and_rank = [
+            {
+                "realm_type": ranking.scope,
+                "realm_name": self.get_scope_name(ranking.scope),
+                "score": ranking.score,
+                "unit": "kW",
+                "numerator": numerator,
+                "denominator": denominator,
+                "rank": "n.a" if ranking.rank is None else str(ranking.rank),
+                "total_ranks": ranking.total_ranks,
+                "max_score": ranking.max_score,
+            }
+            for ranking in rankings
+        ]
+
+        # fall back to ranking on the fly for pairs that have not been precomputed
+        return ratio_and_rank or self.compute_ratio_and_rank(
+            numerator, denominator, realm_type
+        )
+
+    def compute_ratio_and_rank(self, numerator, denominator, realm_type):
         # Define order for looping over multiple admin scopes
         order = ["municipality", "county", "state", "country"]
         ratio_and_rank = []
@@ -143,6 +227,82 @@ class CurrentTotal(models.Model):
         return ratio_and_rank
 
 
+class CurrentRanking(models.Model):
+    """
+    Ratio and rank of a realm within one of its scopes.
+
+    The table is built by sql_scripts/04_current_rankings.sql, one row per
+    realm, numerator/denominator pair and scope.
+    """
+
+    realm_type = models.CharField(max_length=20)
+    municipality = models.CharField(max_length=200, null=True)
+    county = models.CharField(max_length=200, null=True)
+    state = models.CharField(max_length=200, null=True)
+    numerator = models.CharField(max_length=50)
+    denominator = models.CharField(max_length=50)
+    scope = models.CharField(max_length=20)
+    scope_order = models.SmallIntegerField()
+    score = models.FloatField()
+    rank = models.IntegerField(null=True)
+    total_ranks = models.IntegerField(null=True)
+    max_score = models.FloatField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = "current_rankings"
+
+
+class SimplifiedGeometry(models.Model):
+    """
+    Municipality polygon of current_totals simplified for one zoom range of the maps.
+
+    The table is built by sql_scripts/07_map_geometries.sql, see
+    tiles.geometry_level for the zoom levels the levels are meant for.
+    """
+
+    current_total = models.ForeignKey(
+        CurrentTotal,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="simplified_geometries",
+    )
+    level = models.SmallIntegerField()
+    tolerance = models.FloatField()
+    geom = models.MultiPolygonField(srid=4326)
+
+    class Meta:
+        managed = False
+        db_table = "simplified_geometries"
+
+
+class RealmTotal(models.Model):
+    """
+    Sums of current_totals per county, state and for the whole country.
+
+    The table is built by sql_scripts/08_realm_totals.sql, one row per realm;
+    county is empty for states, county and state for the country.
+    """
+
+    realm_type = models.CharField(max_length=20)
+    county = models.CharField(max_length=200, null=True)
+    state = models.CharField(max_length=200, null=True)
+    pv_net_nominal_capacity = models.FloatField()
+    wind_net_nominal_capacity = models.FloatField()
+    biomass_net_nominal_capacity = models.FloatField()
+    hydro_net_nominal_capacity = models.FloatField()
+    storage_net_nominal_capacity = models.FloatField()
+    total_net_nominal_capacity = models.FloatField()
+    population = models.BigIntegerField()
+    area = models.FloatField()
+    energy_units = models.BigIntegerField()
+    municipalities = models.IntegerField()
+
+    class Meta:
+        managed = False
+        db_table = "realm_totals"
+
+
 class EnergyUnit(models.Model):
     unit_nr = models.CharField(verbose_name=_("Unit Nr."), max_length=200)
     municipality_key = models.CharField(
@@ -174,3 +334,56 @@ class EnergyUnit(models.Model):
     class Meta:
         managed = False
         db_table = "energy_units"
+
+
+class DataVersion(models.Model):
+    """One row per import, written by sql_scripts/data_version.sql."""
+
+    imported_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "data_version"
+
+
+class EtlRun(models.Model):
+    """One run of python manage.py import_mastr."""
+
+    RUNNING = "running"
+    PUBLISHED = "published"
+    REJECTED = "rejected"
+    FAILED = "failed"
+
+    mode = models.CharField(max_length=20)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+    status = models.CharField(max_length=20, default=RUNNING)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        db_table = "etl_runs"
+        ordering = ["-started_at"]
+
+    def __str__(self):
+        return f"{self.mode} import {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class EtlStep(models.Model):
+    """
+    Wall time, affected rows and growth of the staging schema of one step of an import.
+
+    Size deltas are measured over the whole staging schema, steps running at
+    the same time (import_mastr --workers) show each other's growth.
+    """
+
+    run = models.ForeignKey(EtlRun, on_delete=models.CASCADE, related_name="steps")
+    name = models.CharField(max_length=100)
+    started_at = models.DateTimeField()
+    duration = models.FloatField(help_text="seconds")
+    rows = models.BigIntegerField(null=True)
+    table_size_delta = models.BigIntegerField(help_text="bytes")
+    index_size_delta = models.BigIntegerField(help_text="bytes")
+
+    class Meta:
+        db_table = "etl_steps"
+        ordering = ["started_at"]
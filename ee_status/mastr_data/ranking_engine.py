@@ -0,0 +1,202 @@
+import copy
+
+import numpy as np
+
+from .data_version import per_data_version
+from .models import CurrentTotal
+
+# realm types with the number of names identifying a realm of that type: (state, county, municipality)
+REALM_DEPTHS = {"municipality": 3, "county": 2, "state": 1, "country": 0}
+
+NUMERIC_FIELDS = [
+    "pv_net_nominal_capacity",
+    "wind_net_nominal_capacity",
+    "biomass_net_nominal_capacity",
+    "hydro_net_nominal_capacity",
+    "storage_net_nominal_capacity",
+    "total_net_nominal_capacity",
+    "population",
+    "area",
+    "energy_units",
+]
+
+
+class RankingEngine:
+    """
+    All municipalities of current_totals held in NumPy arrays.
+
+    Every realm type gets an integer code per row, so sums of any
+    numerator/denominator pair per municipality, county or state are a
+    np.bincount instead of a GROUP BY query. NULL values are stored as NaN
+    and, like in SQL, are left out of sums.
+    """
+
+    def __init__(self, rows):
+        """rows: (municipality, county, state, *NUMERIC_FIELDS) per municipality"""
+        rows = list(rows)
+        columns = list(zip(*rows)) or [()] * (3 + len(NUMERIC_FIELDS))
+        municipalities, counties, states = columns[:3]
+        self.size = len(rows)
+        self.values = {
+            field: np.array(column, dtype=float)
+            for field, column in zip(NUMERIC_FIELDS, columns[3:])
+        }
+
+        full_keys = list(zip(states, counties, municipalities))
+        self.names = {}
+        self.keys = {}
+        self.index = {}
+        self.codes = {}
+        for realm_type, depth in REALM_DEPTHS.items():
+            index = {}
+            self.codes[realm_type] = np.fromiter(
+                (index.setdefault(key[:depth], len(index)) for key in full_keys),
+                dtype=np.intp,
+                count=self.size,
+            )
+            self.index[realm_type] = index
+            self.keys[realm_type] = list(index)
+            if depth:
+                self.names[realm_type] = np.array(
+                    [key[depth - 1] for key in full_keys], dtype=object
+                )
+
+    @classmethod
+    def from_database(cls):
+        return cls(
+            CurrentTotal.objects.values_list(
+                "municipality", "county", "state", *NUMERIC_FIELDS
+            )
+        )
+
+    def with_values(self, values):
+        """Engine over the same municipalities with some of the values replaced, e.g. as of a past month"""
+        engine = copy.copy(self)
+        engine.values = {**self.values, **values}
+        return engine
+
+    def realm_sum(self, field, current_total, realm_type):
+        """Sum of field over the realm of current_total, NaN values left out"""
+        mask = self.realm_mask(realm_type, self.realm_key(current_total, realm_type))
+        return float(np.nansum(self.values[field][mask]))
+
+    @staticmethod
+    def realm_key(current_total, realm_type):
+        keys = (current_total.state, current_total.county, current_total.municipality)
+        return keys[: REALM_DEPTHS[realm_type]]
+
+    def scope_mask(self, scope, scope_name):
+        """Rows within the realm called scope_name, like filtering current_totals by name"""
+        if scope == "country":
+            return np.ones(self.size, dtype=bool)
+        return self.names[scope] == scope_name
+
+    def realm_mask(self, realm_type, realm_key):
+        """Rows within exactly the realm identified by realm_key"""
+        return self.codes[realm_type] == self.index[realm_type].get(realm_key, -1)
+
+    def group_sums(self, field, realm_type, mask):
+        """Sum field per realm of realm_type over the rows in mask, NaN where SQL gives NULL."""
+        values = self.values[field][mask]
+        codes = self.codes[realm_type][mask]
+        present = ~np.isnan(values)
+        groups = len(self.keys[realm_type])
+        sums = np.bincount(
+            codes[present], weights=values[present], minlength=groups
+        ).astype(float)
+        sums[np.bincount(codes[present], minlength=groups) == 0] = np.nan
+        return sums
+
+    def scope_average(self, numerator, denominator, mask):
+        numerator_sum = np.nansum(self.values[numerator][mask])
+        denominator_sum = np.nansum(self.values[denominator][mask])
+        if not denominator_sum:
+            return 0
+        return round(float(numerator_sum / denominator_sum), 2)
+
+    def scores(self, numerator, denominator, realm_type, mask):
+        """Return the realm codes present in mask and their ratios"""
+        mask = mask & (self.values[denominator] > 0)
+        groups = np.unique(self.codes[realm_type][mask])
+        numerator_sums = self.group_sums(numerator, realm_type, mask)[groups]
+        denominator_sums = self.group_sums(denominator, realm_type, mask)[groups]
+        return groups, numerator_sums / denominator_sums
+
+    def rank(self, numerator, denominator, realm_type, realm_key, scope, mask):
+        """Return rank, total_ranks and max_score of a realm within the scope in mask"""
+        groups, scores = self.scores(numerator, denominator, realm_type, mask)
+        if not len(groups):
+            return "n.a", 0, None
+
+        # missing scores rank last
+        valid_scores = scores[~np.isnan(scores)]
+        max_score = round(float(valid_scores.max()), 1) if len(valid_scores) else None
+        position = np.flatnonzero(groups == self.index[realm_type].get(realm_key, -1))
+
+        if realm_type == scope or not len(position):
+            rank = "n.a"
+        elif np.isnan(scores[position[0]]):
+            rank = str(len(valid_scores) + 1)
+        else:
+            rank = str(np.count_nonzero(valid_scores > scores[position[0]]) + 1)
+
+        return rank, len(groups), max_score
+
+    def ratio_and_rank(self, current_total, numerator, denominator, realm_type):
+        """Same result as CurrentTotal.ratio_and_rank, computed in memory"""
+        # Germany is ranked by its states
+        values_type = "state" if realm_type == "country" else realm_type
+        realm_key = self.realm_key(current_total, values_type)
+        order = list(REALM_DEPTHS)
+        ratio_and_rank = []
+        for scope in order[order.index(realm_type) :]:  # noqa: E203
+            mask = self.realm_mask(scope, self.realm_key(current_total, scope))
+            rank, total_ranks, max_score = self.rank(
+                numerator, denominator, values_type, realm_key, scope, mask
+            )
+            ratio_and_rank.append(
+                {
+                    "realm_type": scope,
+                    "realm_name": current_total.get_scope_name(scope),
+                    "score": self.scope_average(numerator, denominator, mask),
+                    "unit": "kW",
+                    "numerator": numerator,
+                    "denominator": denominator,
+                    "rank": "n.a" if realm_type == scope else rank,
+                    "total_ranks": total_ranks,
+                    "max_score": max_score,
+                }
+            )
+        return ratio_and_rank
+
+    def ranking(self, numerator, denominator, realm_type, scope, scope_name):
+        """Rows of the rankings table (realm, numerator, denominator, score), best first"""
+        mask = self.scope_mask(scope, scope_name) & (self.values[numerator] > 0)
+        if denominator:
+            mask &= self.values[denominator] > 0
+
+        groups = np.unique(self.codes[realm_type][mask])
+        numerator_sums = self.group_sums(numerator, realm_type, mask)[groups]
+        if denominator:
+            denominator_sums = self.group_sums(denominator, realm_type, mask)[groups]
+            scores = numerator_sums / denominator_sums
+        else:
+            scores = numerator_sums
+
+        ranking = []
+        for i in np.argsort(-scores, kind="stable"):
+            row = {
+                realm_type: self.keys[realm_type][groups[i]][-1],
+                "numerator": float(numerator_sums[i]),
+            }
+            if denominator:
+                row["denominator"] = round(float(denominator_sums[i]))
+                row["score"] = float(scores[i])
+            ranking.append(row)
+        return ranking
+
+
+@per_data_version
+def get_ranking_engine():
+    """Return the engine of this process, reloaded whenever the data version changes"""
+    return RankingEngine.from_database()
@@ -0,0 +1,221 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .data_version import per_data_version
+from .models import CurrentTotal
+
+# One relevance-ranked query over municipalities, counties and states.
+# The ILIKE conditions are served by the trigram indexes of sql_scripts/06_search_indexes.sql,
+# word_similarity ranks names that contain the query as a whole word or prefix first.
+SEARCH_SQL = """
+SELECT kind, municipality, county, state
+FROM (SELECT 'municipality' AS kind,
+             municipality,
+             county,
+             state,
+             max(greatest(word_similarity(%(query)s, municipality),
+                          word_similarity(%(query)s, municipality_key),
+                          word_similarity(%(query)s, zip_code))) AS similarity,
+             length(municipality) AS name_length
+      FROM current_totals
+      WHERE (municipality ILIKE %(pattern)s
+          OR municipality_key ILIKE %(pattern)s
+          OR zip_code ILIKE %(pattern)s)
+        -- municipalities that are their own counties ("kreisfreie Städte") are found as counties
+        AND municipality_key NOT LIKE '%%000'
+      GROUP BY municipality, county, state
+      UNION ALL
+      SELECT 'county', NULL, county, state, word_similarity(%(query)s, county), length(county)
+      FROM current_totals
+      WHERE county ILIKE %(pattern)s
+        -- counties that are their own states ("echte Stadtstaaten": Hamburg, Berlin) are found as states
+        AND municipality_key NOT LIKE '%%000000'
+      GROUP BY county, state
+      UNION ALL
+      SELECT 'state', NULL, NULL, state, word_similarity(%(query)s, state), length(state)
+      FROM current_totals
+      WHERE state ILIKE %(pattern)s
+      GROUP BY state) AS results
+ORDER BY similarity DESC, name_length, municipality, county, state
+LIMIT %(limit)s
+"""
+
+
+def like_pattern(query):
+    """Return an ILIKE pattern matching query anywhere, with wildcards in query escaped."""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_realms_in_database(query):
+    """
+    Return the states, counties and municipalities matching query, each list
+    ordered by relevance and at most MASTR_DATA_SEARCH_LIMIT results in total.
+    """
+    results = {"state": [], "county": [], "municipality": []}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            SEARCH_SQL,
+            {
+                "query": query,
+                "pattern": like_pattern(query),
+                "limit": settings.MASTR_DATA_SEARCH_LIMIT,
+            },
+        )
+        for kind, municipality, county, state in cursor.fetchall():
+            results[kind].append(
+                {"municipality": municipality, "county": county, "state": state}
+            )
+    return results
+
+
+def trigrams(term):
+    return {term[i : i + 3] for i in range(len(term) - 2)}  # noqa: E203
+
+
+def word_starts(term):
+    """Yield term and every part of it starting at a word, e.g. "am main" of "frankfurt am main"."""
+    yield term
+    for i, character in enumerate(term):
+        if character in " -/(" and term[i + 1 :]:  # noqa: E203
+            yield term[i + 1 :]  # noqa: E203
+
+
+class SearchIndex:
+    """
+    The states, counties and municipalities of current_totals held in memory
+    for the search on the start page.
+
+    Every realm is searchable by its name, municipalities also by their
+    municipality keys and zip codes. Queries of three and more characters
+    match anywhere in a term (trigram inverted index), shorter queries match
+    the start of a term or of a word within it (sorted prefix array).
+    Results are ordered like the database search: exact matches, then
+    prefixes, then word prefixes, then any other match; shorter names first.
+    """
+
+    def __init__(self, rows):
+        """rows: (municipality_key, municipality, county, state, zip_code) per municipality"""
+        self.realms = []
+        self.terms = []
+        realm_ids = {}
+
+        def add(kind, municipality, county, state, terms):
+            name = municipality or county or state
+            key = (kind, municipality, county, state)
+            if key not in realm_ids:
+                realm_ids[key] = len(self.realms)
+                self.realms.append(
+                    (
+                        len(name),
+                        municipality or "",
+                        county or "",
+                        state,
+                        kind,
+                    )
+                )
+            for term in terms:
+                if term:
+                    self.terms.append((term.strip().casefold(), realm_ids[key]))
+
+        for municipality_key, municipality, county, state, zip_code in rows:
+            if not state:
+                continue
+            add("state", None, None, state, [state])
+            # counties that are their own states ("echte Stadtstaaten": Hamburg, Berlin) are found as states
+            if county and not municipality_key.endswith("000000"):
+                add("county", None, county, state, [county])
+            # municipalities that are their own counties ("kreisfreie Städte") are found as counties
+            if municipality and not municipality_key.endswith("000"):
+                add(
+                    "municipality",
+                    municipality,
+                    county,
+                    state,
+                    [municipality, municipality_key, *(zip_code or "").split(",")],
+                )
+
+        self.terms = sorted(set(self.terms))
+        self.trigram_index = defaultdict(list)
+        prefixes = []
+        for term_id, (term, _realm_id) in enumerate(self.terms):
+            for trigram in trigrams(term):
+                self.trigram_index[trigram].append(term_id)
+            prefixes.extend((start, term_id) for start in word_starts(term))
+        self.prefixes = sorted(prefixes)
+
+    @classmethod
+    def from_database(cls):
+        return cls(
+            CurrentTotal.objects.values_list(
+                "municipality_key", "municipality", "county", "state", "zip_code"
+            )
+        )
+
+    def matching_terms(self, query):
+        """Return the ids of the terms matching query"""
+        if len(query) >= 3:
+            postings = sorted(
+                (self.trigram_index.get(trigram, ()) for trigram in trigrams(query)),
+                key=len,
+            )
+            candidates = set(postings[0]).intersection(*postings[1:])
+            return {i for i in candidates if query in self.terms[i][0]}
+
+        term_ids = set()
+        i = bisect_left(self.prefixes, (query,))
+        while i < len(self.prefixes) and self.prefixes[i][0].startswith(query):
+            term_ids.add(self.prefixes[i][1])
+            i += 1
+        return term_ids
+
+    def search(self, query, limit):
+        """Return the states, counties and municipalities matching query, like search_realms_in_database"""
+        query = query.strip().casefold()
+        if query:
+            term_ids = self.matching_terms(query)
+        else:
+            term_ids = range(len(self.terms))
+
+        relevance = {}
+        for term_id in term_ids:
+            term, realm_id = self.terms[term_id]
+            if term == query:
+                match = 0
+            elif term.startswith(query):
+                match = 1
+            elif any(start.startswith(query) for start in word_starts(term)):
+                match = 2
+            else:
+                match = 3
+            relevance[realm_id] = min(match, relevance.get(realm_id, match))
+
+        results = {"state": [], "county": [], "municipality": []}
+        for realm_id in sorted(
+            relevance, key=lambda i: (relevance[i], *self.realms[i])
+        )[:limit]:
+            _name_length, municipality, county, state, kind = self.realms[realm_id]
+            results[kind].append(
+                {
+                    "municipality": municipality or None,
+                    "county": county or None,
+                    "state": state,
+                }
+            )
+        return results
+
+
+@per_data_version
+def get_search_index():
+    """Return the search index of this process, rebuilt whenever the data version changes"""
+    return SearchIndex.from_database()
+
+
+def search_realms(query):
+    """Return the states, counties and municipalities matching query"""
+    if settings.MASTR_DATA_IN_MEMORY_SEARCH:
+        return get_search_index().search(query, settings.MASTR_DATA_SEARCH_LIMIT)
+    return search_realms_in_database(query)
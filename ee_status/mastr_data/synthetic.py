@@ -0,0 +1,217 @@
+"""
+Synthetic MaStR data for benchmarks (python manage.py generate_synthetic_mastr).
+
+The units are written into an SQLite file laid out like the one of
+open-MaStR, so that python manage.py import_mastr builds every table from
+them like from the real data. Municipalities, counties and states follow the
+real hierarchy of the municipality keys of
+sql_scripts/municipality_key_import_file.csv; county names, locations and
+the units themselves are made up.
+"""
+import csv
+import sqlite3
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+
+from . import etl
+from .loader import SOURCE_COLUMNS
+
+MUNICIPALITY_KEYS_FILE = (
+    settings.ROOT_DIR / "sql_scripts" / "municipality_key_import_file.csv"
+)
+
+# names of the states by the first two digits of the municipality key
+STATES = {
+    "01": "Schleswig-Holstein",
+    "02": "Hamburg",
+    "03": "Niedersachsen",
+    "04": "Bremen",
+    "05": "Nordrhein-Westfalen",
+    "06": "Hessen",
+    "07": "Rheinland-Pfalz",
+    "08": "Baden-Württemberg",
+    "09": "Bayern",
+    "10": "Saarland",
+    "11": "Berlin",
+    "12": "Brandenburg",
+    "13": "Mecklenburg-Vorpommern",
+    "14": "Sachsen",
+    "15": "Sachsen-Anhalt",
+    "16": "Thüringen",
+}
+
+# share of the units and lognormal (median kW, sigma) of the capacity of every technology, roughly like the MaStR
+TECHNOLOGIES = {
+    "solar": (0.77, 9.0, 1.0),
+    "storage": (0.2, 8.0, 0.5),
+    "wind": (0.015, 2500.0, 0.6),
+    "biomass": (0.01, 400.0, 1.0),
+    "hydro": (0.005, 50.0, 1.5),
+}
+# start-up dates between these days, more units every year; some before 2000, where the timelines start
+FIRST_START_UP = date(1990, 1, 1)
+LAST_START_UP = date(2024, 12, 31)
+CLOSED_DOWN_SHARE = 0.03
+NOT_APPROVED_SHARE = 0.02
+
+# bounding box of Germany (longitude, latitude), the municipalities are placed within it
+GERMANY_BOUNDS = (5.9, 47.3, 15.0, 55.0)
+
+
+class Municipality:
+    def __init__(self, key, name, area, population):
+        self.key = key
+        self.name = name
+        self.area = area
+        self.population = population
+        self.county_key = key[:5]
+        self.state = STATES[key[:2]]
+        self.county = None
+        self.longitude = None
+        self.latitude = None
+
+    @property
+    def half_side(self):
+        """Half the side in km of the square standing in for the municipality"""
+        return max(self.area, 0.01) ** 0.5 / 2
+
+
+def read_municipalities(path=MUNICIPALITY_KEYS_FILE, seed=0):
+    """
+    Return the municipalities of the municipality key file with made-up
+    county names and locations.
+    """
+    with open(path, encoding="utf-8") as file:
+        municipalities = [
+            Municipality(
+                row["municipality_key"],
+                # "Bottrop; Stadt" is "Bottrop" in the MaStR
+                row["municipality"].split(";")[0].strip(),
+                float(row["area"]),
+                int(row["population"]),
+            )
+            for row in csv.DictReader(file)
+        ]
+
+    counties = {}
+    for municipality in municipalities:
+        counties.setdefault(municipality.county_key, []).append(municipality)
+    for members in counties.values():
+        largest = max(members, key=lambda member: member.population)
+        # a county with a single municipality is a city not belonging to a county
+        name = largest.name if len(members) == 1 else f"Landkreis {largest.name}"
+        for member in members:
+            member.county = name
+
+    rng = np.random.default_rng(seed)
+    west, south, east, north = GERMANY_BOUNDS
+    for municipality in municipalities:
+        municipality.longitude = float(rng.uniform(west, east))
+        municipality.latitude = float(rng.uniform(south, north))
+    return municipalities
+
+
+def start_up_dates(rng, size):
+    """Random start-up dates, more of them in later years"""
+    days = (LAST_START_UP - FIRST_START_UP).days
+    offsets = (rng.beta(3, 1, size) * days).astype(int)
+    return [FIRST_START_UP + timedelta(days=int(offset)) for offset in offsets]
+
+
+def unit_rows(rng, municipalities, technology, size, first_number=1):
+    """
+    Rows of units of a technology in the column order of loader.SOURCE_COLUMNS,
+    placed in municipalities weighted by their population.
+    """
+    _, median, sigma = TECHNOLOGIES[technology]
+    weights = np.array(
+        [municipality.population for municipality in municipalities], dtype=float
+    )
+    chosen = rng.choice(len(municipalities), size=size, p=weights / weights.sum())
+    capacities = rng.lognormal(np.log(median), sigma, size).round(2)
+    started = start_up_dates(rng, size)
+    closed = rng.random(size) < CLOSED_DOWN_SHARE
+    closed_after = rng.integers(30, 3650, size)
+    approved = rng.random(size) >= NOT_APPROVED_SHARE
+    offsets = rng.uniform(-1, 1, (size, 2))
+
+    for i in range(size):
+        municipality = municipalities[chosen[i]]
+        # km to degrees, a degree of longitude gets shorter to the north
+        latitude = municipality.latitude + offsets[i, 1] * municipality.half_side / 111
+        longitude = municipality.longitude + offsets[i, 0] * municipality.half_side / (
+            111 * np.cos(np.radians(municipality.latitude))
+        )
+        close_down_date = None
+        if closed[i]:
+            close_down_date = min(
+                started[i] + timedelta(days=int(closed_after[i])), LAST_START_UP
+            )
+        yield (
+            f"SEE9{first_number + i:011d}",
+            "2" if approved[i] else "0",
+            municipality.key,
+            municipality.name,
+            municipality.county,
+            municipality.state,
+            f"{int(municipality.key[:5]) % 90000 + 10000:05d}",
+            started[i].isoformat(),
+            close_down_date.isoformat() if close_down_date else None,
+            float(capacities[i]),
+            round(latitude, 6),
+            round(longitude, 6),
+        )
+
+
+def write_sqlite(path, municipalities, units, seed=0, batch_size=100000):
+    """Write an open-MaStR like SQLite file with units units spread over the technologies"""
+    rng = np.random.default_rng(seed)
+    target = sqlite3.connect(path)
+    try:
+        first_number = 1
+        for technology, (share, _, _) in TECHNOLOGIES.items():
+            table = f"{technology}_extended"
+            size = max(1, round(units * share))
+            target.execute(f"DROP TABLE IF EXISTS {table}")
+            target.execute(f"CREATE TABLE {table} ({', '.join(SOURCE_COLUMNS)})")
+            rows = unit_rows(rng, municipalities, technology, size, first_number)
+            insert = (
+                f"INSERT INTO {table} VALUES ({', '.join('?' * len(SOURCE_COLUMNS))})"
+            )
+            while batch := [row for _, row in zip(range(batch_size), rows)]:
+                target.executemany(insert, batch)
+            first_number += size
+        target.commit()
+    finally:
+        target.close()
+
+
+def seed_municipalities(cursor, municipalities):
+    """
+    Store population, area and a square polygon of every municipality in
+    the seed table, import_mastr fills them into the current_totals of the
+    generation it builds where the live generation lacks them
+    (etl.carry_over_columns). The published data stays untouched.
+    """
+    cursor.execute(f"DROP TABLE IF EXISTS public.{etl.SEED_TABLE}")
+    cursor.execute(
+        f"CREATE TABLE public.{etl.SEED_TABLE} "
+        "(municipality_key VARCHAR(8), population INTEGER, area NUMERIC(20, 2), geom GEOMETRY)"
+    )
+    cursor.executemany(
+        f"INSERT INTO public.{etl.SEED_TABLE} (municipality_key, population, area, geom) "
+        "SELECT %s, %s, %s, ST_Multi(ST_Expand(ST_Transform(ST_SetSRID(ST_MakePoint(%s, %s), 4326), 25832), %s))",
+        [
+            (
+                municipality.key,
+                municipality.population,
+                municipality.area,
+                municipality.longitude,
+                municipality.latitude,
+                municipality.half_side * 1000,
+            )
+            for municipality in municipalities
+        ],
+    )
@@ -1,5 +1,7 @@
 from django import template
 
+from ee_status.mastr_data import cache
+
 register = template.Library()
 
 
@@ -32,3 +34,21 @@ def param_replace(context, **kwargs):
     for k in [k for k, v in d.items() if not v]:
         del d[k]
     return d.urlencode()
+
+
+@register.simple_tag(takes_context=True)
+def keyed_parameters(context, *names):
+    """
+    Return the request's parameters the cached views are keyed by
+    (``cache.CACHE_PARAMETERS``) as a QueryDict, only those in names if given.
+
+    Links and forms of cached pages are built from them, so they are the same
+    for every visitor sharing the cached page:
+
+    {% keyed_parameters "county" "state" as realm %}
+    <a href="/rankings/?{{ realm.urlencode }}">Rankings</a>
+    """
+    params = context["request"].GET
+    if names:
+        params = {name: params.get(name) for name in names}
+    return cache.keyed_parameters(params)
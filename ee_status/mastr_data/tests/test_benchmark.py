@@ -0,0 +1,33 @@
+from ee_status.mastr_data.benchmark import percentile, regressions, summarize
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 21))
+    assert percentile(values, 0.5) == 10
+    assert percentile(values, 0.95) == 19
+    assert percentile([3], 0.95) == 3
+
+
+def test_summarize_reports_milliseconds():
+    assert summarize([0.002, 0.001, 0.004], 7, 2048) == {
+        "p50": 2.0,
+        "p95": 4.0,
+        "queries": 7,
+        "peak_memory": 2048,
+    }
+
+
+def test_regressions():
+    baseline = {
+        "totals:state": {"p95": 10.0, "queries": 5},
+        "search": {"p95": 2.0, "queries": 0},
+    }
+    results = {
+        "totals:state": {"p95": 16.0, "queries": 5},
+        "search": {"p95": 2.5, "queries": 1},
+        "rankings:state": {"p95": 100.0, "queries": 9},
+    }
+    assert regressions(results, baseline) == [
+        "totals:state: p95 16.0 ms, baseline 10.0 ms",
+        "search: 1 queries, baseline 0",
+    ]
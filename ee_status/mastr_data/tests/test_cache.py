@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory
+from django.utils.cache import patch_vary_headers
+
+from ee_status.mastr_data import cache
+from ee_status.mastr_data.models import DataVersion
+
+
+@pytest.fixture(autouse=True)
+def data_version(monkeypatch):
+    version = DataVersion(pk=1, imported_at=datetime(2023, 5, 1, tzinfo=timezone.utc))
+    monkeypatch.setattr(cache, "get_data_version", lambda: version)
+    return version
+
+
+def test_cache_key_leaves_out_empty_parameters():
+    assert cache.cache_key(
+        "totals_view", QueryDict("state=Bayern&county=Passau&scope=&page=2")
+    ) == cache.cache_key("totals_view", QueryDict("county=Passau&state=Bayern"))
+
+
+def test_cache_key_keeps_values_as_the_views_read_them():
+    assert cache.cache_key(
+        "totals_view", QueryDict("county=Passau+")
+    ) != cache.cache_key("totals_view", QueryDict("county=Passau"))
+
+
+def test_cache_key_tolerates_missing_values():
+    assert cache.cache_key("choropleth_metrics", {"county": None}) == cache.cache_key(
+        "choropleth_metrics", {}
+    )
+
+
+def test_cache_key_depends_on_filters():
+    assert cache.cache_key(
+        "totals_view", QueryDict("county=Passau")
+    ) != cache.cache_key("totals_view", QueryDict("state=Passau"))
+
+
+def test_cache_key_changes_with_data_version(data_version):
+    key = cache.cache_key("rankings_view", QueryDict("state=Bayern"))
+    data_version.pk = 2
+
+    assert cache.cache_key("rankings_view", QueryDict("state=Bayern")) != key
+
+
+@cache.conditional_per_data_version
+def data_view(request):
+    return HttpResponse("{}")
+
+
+def test_conditional_response_carries_data_version():
+    response = data_view(RequestFactory().get("/"))
+
+    assert response.status_code == 200
+    assert response["ETag"].startswith('"1-')
+    assert response["Last-Modified"] == "Mon, 01 May 2023 00:00:00 GMT"
+
+
+def test_unchanged_data_is_not_modified(data_version):
+    etag = data_view(RequestFactory().get("/"))["ETag"]
+    request = RequestFactory().get("/", HTTP_IF_NONE_MATCH=etag)
+
+    assert data_view(request).status_code == 304
+
+    data_version.pk = 2
+    assert data_view(request).status_code == 200
+
+
+@cache.cache_per_data_version
+def attachment_view(request):
+    response = HttpResponse("a;b", content_type="text/csv")
+    response["Content-Disposition"] = 'attachment; filename="totals.csv"'
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def test_cached_response_keeps_its_headers():
+    request = RequestFactory().get("/", {"county": "Passau"})
+    request.user = AnonymousUser()
+    first = attachment_view(request)
+    cached = attachment_view(request)
+
+    assert cached is not first
+    assert cached.content == b"a;b"
+    assert cached["Content-Type"] == "text/csv"
+    assert cached["Content-Disposition"] == 'attachment; filename="totals.csv"'
+    assert cached["Vary"] == "Accept-Encoding"
+
+
+@cache.cache_per_data_version
+def query_view(request):
+    return HttpResponse(request.GET.urlencode())
+
+
+def test_unkeyed_parameters_do_not_leak_into_cached_responses():
+    requests = [
+        RequestFactory().get("/", {"county": "Passau", "utm_source": source})
+        for source in ["newsletter", "feed"]
+    ]
+    for request in requests:
+        request.user = AnonymousUser()
+
+    first, second = [query_view(request) for request in requests]
+
+    assert first.content == second.content == b"county=Passau"
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import RequestFactory
+
+from ee_status.mastr_data import cache, choropleth, views
+
+
+def test_feature_collection_splices_in_the_geometries():
+    geometry = '{"type":"MultiPolygon","coordinates":[[[[7.1,51.5],[7.2,51.5],[7.2,51.6],[7.1,51.5]]]]}'
+
+    collection = json.loads(
+        choropleth.feature_collection([(3, geometry), (5, geometry)])
+    )
+
+    assert collection["type"] == "FeatureCollection"
+    assert [feature["properties"]["pk"] for feature in collection["features"]] == [3, 5]
+    assert collection["features"][0]["geometry"] == json.loads(geometry)
+
+
+def test_feature_collection_of_no_rows_is_valid():
+    assert json.loads(choropleth.feature_collection([])) == {
+        "type": "FeatureCollection",
+        "features": [],
+    }
+
+
+def test_scores_divide_numerator_by_denominator():
+    metrics = {
+        "total_net_nominal_capacity": np.array([100.0, 50.0, np.nan, 10.0]),
+        "population": np.array([3.0, 0.0, 10.0, np.nan]),
+    }
+
+    assert choropleth.scores(metrics, "total_net_nominal_capacity", "population") == [
+        33.33,
+        None,
+        None,
+        None,
+    ]
+
+
+def test_scores_without_denominator_are_the_numerator():
+    metrics = {"area": np.array([1.234, np.nan])}
+
+    assert choropleth.scores(metrics, "area") == [1.23, None]
+
+
+def test_geometry_etag_depends_on_the_encoding(monkeypatch):
+    monkeypatch.setattr(choropleth, "data_version_etag", lambda request: "1-de")
+    factory = RequestFactory()
+
+    plain = choropleth.geometry_etag(factory.get("/"))
+    compressed = choropleth.geometry_etag(
+        factory.get("/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+    )
+
+    assert plain == "1-de"
+    assert compressed == "1-de-gzip"
+
+
+@pytest.mark.parametrize("view", [views.rankings_map_json, views.rankings_map_geometry])
+@pytest.mark.parametrize("query", [{}, {"county": ""}])
+def test_map_views_need_a_county(monkeypatch, view, query):
+    monkeypatch.setattr(cache, "get_data_version", lambda: None)
+    request = RequestFactory().get("/", query)
+    request.user = AnonymousUser()
+
+    with pytest.raises(Http404):
+        view(request)
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+import pytest
+
+from ee_status.mastr_data.clusters import (
+    CLUSTER_GRID,
+    WORLD_WIDTH,
+    cell_size,
+    cluster_from_row,
+    point_from_row,
+)
+
+
+def test_cell_size_halves_with_every_zoom_level():
+    assert cell_size(0) == pytest.approx(WORLD_WIDTH / CLUSTER_GRID)
+    assert cell_size(9) == pytest.approx(cell_size(8) / 2)
+
+
+def test_cluster_from_row_leaves_out_missing_technologies():
+    row = (
+        3,
+        52.5,
+        13.4,
+        2,
+        Decimal("9.80"),
+        0,
+        None,
+        0,
+        None,
+        0,
+        None,
+        1,
+        Decimal("5"),
+    )
+    assert cluster_from_row(row) == {
+        "latitude": 52.5,
+        "longitude": 13.4,
+        "count": 3,
+        "technologies": {
+            "pv": {"count": 2, "capacity": 9.8},
+            "storage": {"count": 1, "capacity": 5.0},
+        },
+    }
+
+
+def test_point_from_row_names_the_technology():
+    row = ("SEE900000000001", 52.5, 13.4, None, Decimal("3000.00"), None, None, None)
+    assert point_from_row(row) == {
+        "unit_nr": "SEE900000000001",
+        "latitude": 52.5,
+        "longitude": 13.4,
+        "technology": "wind",
+        "capacity": 3000.0,
+    }
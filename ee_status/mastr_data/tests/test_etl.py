@@ -0,0 +1,261 @@
+import pytest
+
+from ee_status.mastr_data.etl import (
+    FULL_IMPORT_SCRIPT,
+    Step,
+    carry_over_columns,
+    duration_regressions,
+    import_steps,
+    live_schema,
+    previous_schema,
+    publish_staging_schema,
+    read_script,
+    restore_previous_schema,
+    run_steps,
+    script_steps,
+    sql_statements,
+    staging_schema,
+)
+
+
+def test_script_steps_of_the_full_import():
+    steps = script_steps(FULL_IMPORT_SCRIPT, read_script(FULL_IMPORT_SCRIPT))
+    after = {step.name: step.after for step in steps}
+
+    assert after["unit_snapshot"] == set()
+    assert after["energy_units"] == {
+        "load_solar",
+        "load_wind",
+        "load_biomass",
+        "load_hydro",
+        "load_storage",
+    }
+    assert after["approved_units"] == {"energy_units"}
+    assert after["monthly_timeline"] == {"approved_units"}
+    assert after["zip_codes"] == {"energy_unit_counts"}
+    assert after["active_units"] == {"energy_unit_counts"}
+
+
+def test_import_steps_load_technologies_before_the_derived_tables():
+    after = {step.name: step.after for step in import_steps()}
+
+    assert after["load_solar"] == {"unit_snapshot"}
+    assert after["carry_over_columns"] == {"zip_codes", "active_units"}
+    assert after["04_current_rankings"] == {"carry_over_columns"}
+    assert after["08_realm_totals"] == {"carry_over_columns"}
+
+
+def test_incremental_import_steps_load_into_incoming_units():
+    after = {step.name: step.after for step in import_steps(incremental=True)}
+
+    assert after["incoming_units"] == {
+        "link_unit_snapshot",
+        "copy_monthly_timeline",
+        "copy_current_totals",
+    }
+    assert after["load_storage"] == {"incoming_units"}
+    assert after["04_current_rankings"] == {"update_tables"}
+
+
+def test_incremental_import_updates_copies_of_derived_tables():
+    after = {step.name: step.after for step in import_steps(incremental=True)}
+
+    assert "copy_unit_snapshot" not in after
+    assert "copy_energy_units" not in after
+    assert "05_cumulative_timeline" not in after
+    assert "07_map_geometries" not in after
+    assert after["copy_cumulative_timeline"] == set()
+    assert after["05_update_cumulative_timeline"] == {
+        "update_tables",
+        "copy_cumulative_timeline",
+    }
+    assert after["07_update_map_geometries"] == {
+        "update_tables",
+        "copy_simplified_geometries",
+    }
+
+
+def test_copies_leave_out_indexes_the_scripts_create():
+    (copy,) = [
+        step
+        for step in import_steps(derived_only=True)
+        if step.name == "copy_current_totals"
+    ]
+
+    assert "totals_municipality_trgm_idx" in copy.function.keywords["skip_indexes"]
+    assert "totals_state_idx" not in copy.function.keywords["skip_indexes"]
+
+
+def test_script_without_markers_is_one_step():
+    (step,) = script_steps("04_current_rankings.sql", "SELECT 1;", after={"import"})
+    assert step.name == "04_current_rankings"
+    assert step.sql == "SELECT 1;"
+    assert step.after == {"import"}
+
+
+def test_run_steps_waits_for_after_steps():
+    steps = [
+        Step("d", after={"b", "c"}),
+        Step("b", after={"a"}),
+        Step("c", after={"a"}),
+        Step("a"),
+    ]
+    order = []
+    run_steps(steps, 3, run_step=lambda step: order.append(step.name))
+
+    assert order[0] == "a"
+    assert set(order[1:3]) == {"b", "c"}
+    assert order[3] == "d"
+
+
+def test_run_steps_rejects_unknown_after_steps():
+    with pytest.raises(ValueError):
+        run_steps([Step("a", after={"missing"})], 2, run_step=lambda step: None)
+
+
+def test_sql_statements_leave_out_comments():
+    sql = "-- drop it first\nDROP TABLE a;\n\n/* then */\nCREATE TABLE a (b INTEGER);\n-- done\n"
+    assert sql_statements(sql) == [
+        "-- drop it first\nDROP TABLE a;",
+        "/* then */\nCREATE TABLE a (b INTEGER);",
+    ]
+
+
+def test_run_steps_records_every_step():
+    recorded = []
+    run_steps(
+        [Step("a"), Step("b", after={"a"})],
+        workers=2,
+        run_step=lambda step: {"name": step.name},
+        record=recorded.append,
+    )
+    assert recorded == [{"name": "a"}, {"name": "b"}]
+
+
+def test_duration_regressions():
+    regressions = duration_regressions(
+        {"fast": 1.0, "slow": 10.0, "slower": 30.0, "new": 100.0},
+        {"fast": [1.0, 1.2, 0.9], "slow": [5.0, 4.0, 6.0], "slower": [10.0]},
+    )
+    assert regressions == [("slower", 30.0, 10.0), ("slow", 10.0, 5.0)]
+
+
+class TableCursor:
+    """
+    Stands in for a cursor on a database with the given tables and keeps the
+    other statements, results maps a part of a query to the rows it returns
+    """
+
+    def __init__(self, tables, results=None):
+        self.tables = tables
+        self.results = results or {}
+        self.statements = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        if "to_regclass" in sql:
+            self.found = params[0] in self.tables
+        else:
+            self.statements.append(sql)
+            self.rowcount = 10
+            self.rows = next(
+                (rows for query, rows in self.results.items() if query in sql), []
+            )
+
+    def fetchone(self):
+        return (self.found,)
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_carry_over_columns_fill_from_the_live_generation_then_the_seed():
+    cursor = TableCursor(
+        {f"{live_schema()}.current_totals", "public.municipality_seed"}
+    )
+
+    assert carry_over_columns(cursor) == 20
+    live, seed = cursor.statements
+    assert f"FROM {live_schema()}.current_totals source" in live
+    assert "FROM public.municipality_seed source" in seed
+    assert "population = coalesce(staged.population, source.population)" in seed
+
+
+def test_carry_over_columns_without_sources():
+    cursor = TableCursor(set())
+
+    assert carry_over_columns(cursor) == 0
+    assert cursor.statements == []
+
+
+# what the generations of energy_units look like to publish and rollback
+ENERGY_UNITS_RESULTS = {
+    "pg_inherits": [("energy_units_by",)],
+    "information_schema.columns": [("unit_nr",), ("date",)],
+}
+
+
+def energy_units_statements(cursor):
+    return [
+        statement
+        for statement in cursor.statements
+        if "energy_units" in statement and "pg_inherits" not in statement
+    ]
+
+
+def test_publish_of_an_incremental_import_takes_over_energy_units():
+    live, staging = live_schema(), staging_schema()
+    cursor = TableCursor({f"{live}.energy_units"}, ENERGY_UNITS_RESULTS)
+
+    publish_staging_schema(cursor)
+
+    changed = f"SELECT unit_nr FROM {staging}.energy_units_changes"
+    assert energy_units_statements(cursor)[2:] == [
+        f"CREATE TABLE {staging}.energy_units_replaced AS "
+        f"SELECT * FROM {live}.energy_units WHERE unit_nr IN ({changed})",
+        f"DELETE FROM {live}.energy_units WHERE unit_nr IN ({changed})",
+        f"INSERT INTO {live}.energy_units (unit_nr, date) "
+        f"SELECT unit_nr, date FROM {staging}.energy_units_incoming",
+        f"ALTER TABLE {live}.energy_units_by SET SCHEMA {staging}",
+        f"ALTER TABLE {live}.energy_units SET SCHEMA {staging}",
+    ]
+    # before the schemas are renamed
+    assert cursor.statements[-4].startswith(f"ALTER TABLE {live}.energy_units SET")
+
+
+def test_publish_of_a_full_import_keeps_its_energy_units():
+    cursor = TableCursor({f"{staging_schema()}.energy_units"}, ENERGY_UNITS_RESULTS)
+
+    publish_staging_schema(cursor)
+
+    assert energy_units_statements(cursor) == []
+
+
+def test_rollback_of_an_incremental_import_hands_energy_units_back():
+    live, previous = live_schema(), previous_schema()
+    cursor = TableCursor(
+        {f"{live}.energy_units", f"{live}.energy_units_replaced"},
+        ENERGY_UNITS_RESULTS,
+    )
+
+    restore_previous_schema(cursor)
+
+    assert energy_units_statements(cursor) == [
+        f"DELETE FROM {live}.energy_units "
+        f"WHERE unit_nr IN (SELECT unit_nr FROM {live}.energy_units_changes)",
+        f"INSERT INTO {live}.energy_units SELECT * FROM {live}.energy_units_replaced",
+        f"DROP TABLE {live}.energy_units_replaced",
+        f"ALTER TABLE {live}.energy_units_by SET SCHEMA {previous}",
+        f"ALTER TABLE {live}.energy_units SET SCHEMA {previous}",
+    ]
+
+
+def test_undoing_the_rollback_hands_energy_units_over_again():
+    live, previous = live_schema(), previous_schema()
+    cursor = TableCursor({f"{live}.energy_units"}, ENERGY_UNITS_RESULTS)
+
+    restore_previous_schema(cursor)
+
+    statements = energy_units_statements(cursor)
+    assert f"DELETE FROM {live}.energy_units" in statements[3]
+    assert statements[-1] == f"ALTER TABLE {live}.energy_units SET SCHEMA {previous}"
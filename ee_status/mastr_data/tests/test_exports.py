@@ -0,0 +1,128 @@
+import csv
+import io
+from datetime import date, datetime, timezone
+
+import pytest
+from django.http import FileResponse
+from django.test import RequestFactory, override_settings
+
+from ee_status.mastr_data import exports, views
+from ee_status.mastr_data.exports import (
+    export_filters,
+    export_path,
+    remove_old_exports,
+    stream_export,
+    write_csv,
+    write_parquet,
+)
+from ee_status.mastr_data.models import DataVersion
+
+COLUMNS = [
+    ("municipality", "string"),
+    ("date", "date"),
+    ("pv_net_nominal_capacity", "float"),
+]
+ROWS = [("Ilsfeld", date(2023, 1, 1), 9.8), ("Ilsfeld", date(2023, 2, 1), None)]
+
+
+def test_export_filters_only_keep_set_filter_parameters():
+    params = {"state": " Bayern ", "county": "", "municipality": None, "search": "x"}
+    assert export_filters(params) == {"state": "Bayern"}
+
+
+def test_write_csv():
+    file = io.BytesIO()
+    write_csv(iter(ROWS), COLUMNS, file)
+    assert list(csv.reader(io.StringIO(file.getvalue().decode()))) == [
+        ["municipality", "date", "pv_net_nominal_capacity"],
+        ["Ilsfeld", "2023-01-01", "9.8"],
+        ["Ilsfeld", "2023-02-01", ""],
+    ]
+
+
+def test_write_parquet(monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr("ee_status.mastr_data.exports.CHUNK_SIZE", 1)
+    file = io.BytesIO()
+    write_parquet(iter(ROWS), COLUMNS, file)
+    table = pq.read_table(io.BytesIO(file.getvalue()))
+    assert table.column_names == ["municipality", "date", "pv_net_nominal_capacity"]
+    assert table.to_pylist()[1] == {
+        "municipality": "Ilsfeld",
+        "date": date(2023, 2, 1),
+        "pv_net_nominal_capacity": None,
+    }
+
+
+@pytest.fixture
+def monthly_rows(monkeypatch):
+    monkeypatch.setattr(exports, "CHUNK_SIZE", 1)
+    monkeypatch.setitem(exports.EXPORTS, "monthly_timeline", (None, COLUMNS))
+    monkeypatch.setattr(exports, "export_rows", lambda name, filters: iter(ROWS))
+
+
+def test_stream_export_csv_yields_every_chunk(monthly_rows):
+    parts = list(stream_export("monthly_timeline", "csv", {"state": "Bayern"}))
+
+    assert len([part for part in parts if part]) == 3
+    assert b"".join(parts).decode().splitlines() == [
+        "municipality,date,pv_net_nominal_capacity",
+        "Ilsfeld,2023-01-01,9.8",
+        "Ilsfeld,2023-02-01,",
+    ]
+
+
+def test_stream_export_parquet(monthly_rows):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    parts = list(stream_export("monthly_timeline", "parquet", {"state": "Bayern"}))
+
+    table = pq.read_table(io.BytesIO(b"".join(parts)))
+    assert table.num_rows == 2
+    assert table.column_names == ["municipality", "date", "pv_net_nominal_capacity"]
+
+
+def test_remove_old_exports(tmp_path):
+    current, old = tmp_path / "2", tmp_path / "1"
+    current.mkdir()
+    old.mkdir()
+    (old / "energy_units.csv").write_text("")
+    (current / "energy_units.csv").write_text("")
+    (current / "tmpx1y2.part").write_text("")
+
+    remove_old_exports(current)
+
+    assert [path.name for path in tmp_path.iterdir()] == ["2"]
+    assert [path.name for path in current.iterdir()] == ["energy_units.csv"]
+
+
+@pytest.fixture
+def published_version(monkeypatch, tmp_path):
+    """Data version 2 is published, its exports are not written yet"""
+    version = DataVersion(pk=2, imported_at=datetime(2023, 5, 1, tzinfo=timezone.utc))
+    monkeypatch.setattr(exports, "get_data_version", lambda: version)
+    (tmp_path / "1").mkdir()
+    (tmp_path / "1" / "energy_units.csv").write_text("unit_nr\n")
+    with override_settings(MASTR_DATA_EXPORT_DIR=tmp_path):
+        yield tmp_path
+
+
+def test_export_between_publish_and_write_exports(published_version):
+    response = views.export_view(
+        RequestFactory().get("/"), name="energy_units", file_format="csv"
+    )
+
+    assert isinstance(response, FileResponse)
+    assert b"".join(response.streaming_content) == b"unit_nr\n"
+    response.close()
+
+
+def test_export_path_prefers_the_current_version(published_version):
+    (published_version / "2").mkdir()
+    (published_version / "2" / "energy_units.csv").write_text("")
+
+    assert (
+        export_path("energy_units", "csv")
+        == published_version / "2" / "energy_units.csv"
+    )
+    assert export_path("current_totals", "csv") is None
@@ -0,0 +1,94 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from ee_status.mastr_data.history import History, month_date, parse_month
+from ee_status.mastr_data.ranking_engine import NUMERIC_FIELDS, RankingEngine
+
+
+def engine_row(municipality, county, state, **values):
+    return (
+        municipality,
+        county,
+        state,
+        *(values.get(field) for field in NUMERIC_FIELDS),
+    )
+
+
+@pytest.fixture
+def engine():
+    return RankingEngine(
+        [
+            engine_row("A", "K1", "S1", total_net_nominal_capacity=300, population=10),
+            engine_row("B", "K1", "S1", total_net_nominal_capacity=50, population=10),
+            engine_row("C", "K2", "S2", total_net_nominal_capacity=80, population=20),
+        ]
+    )
+
+
+@pytest.fixture
+def history(engine):
+    # (state, county, municipality, municipality_key, date, total, storage), not sorted
+    return History(
+        engine,
+        [
+            ("S1", "K1", "A", "01", date(2010, 5, 1), 300, 0),
+            ("S1", "K1", "A", "01", date(2005, 1, 1), 100, 0),
+            ("S1", "K1", "B", "02", date(2008, 3, 1), 50, 5),
+            ("S2", "K2", "C", "03", date(2001, 1, 1), 20, 0),
+            ("S2", "K2", "C", "04", date(2012, 1, 1), 60, 0),
+            # no longer in current_totals
+            ("S2", "K2", "Gone", "05", date(2001, 1, 1), 1000, 0),
+        ],
+    )
+
+
+def test_parse_month():
+    assert month_date(parse_month("2015-03")) == date(2015, 3, 1)
+    assert month_date(parse_month("2015-03-17")) == date(2015, 3, 1)
+
+
+@pytest.mark.parametrize("value", ["2015", "2015-13", "03/2015", "today"])
+def test_parse_month_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        parse_month(value)
+
+
+def test_values_as_of_take_the_last_running_total_up_to_the_month(history):
+    values = history.values_as_of(parse_month("2009-12"))
+
+    assert values["total_net_nominal_capacity"].tolist() == [100, 50, 20]
+    assert values["storage_net_nominal_capacity"].tolist() == [0, 5, 0]
+
+
+def test_values_as_of_are_zero_before_the_first_unit(history):
+    values = history.values_as_of(parse_month("2000-06"))
+
+    assert values["total_net_nominal_capacity"].tolist() == [0, 0, 0]
+
+
+def test_values_as_of_add_up_municipality_keys(history):
+    values = history.values_as_of(parse_month("2020-01"))
+
+    assert values["total_net_nominal_capacity"].tolist() == [300, 50, 80]
+
+
+def test_engine_as_of_ranks_past_capacities(history):
+    engine = history.engine_as_of(parse_month("2009-01"))
+
+    ranking = engine.ranking(
+        "total_net_nominal_capacity", "population", "municipality", "country", None
+    )
+
+    assert [row["municipality"] for row in ranking] == ["A", "B", "C"]
+    assert [row["score"] for row in ranking] == [10, 5, 1]
+    # unit counts are not known for past months
+    assert np.isnan(engine.values["energy_units"]).all()
+    assert engine.values["population"].tolist() == [10, 10, 20]
+
+
+def test_engine_as_of_is_kept_per_month(history):
+    month = parse_month("2009-01")
+
+    assert history.engine_as_of(month) is history.engine_as_of(month)
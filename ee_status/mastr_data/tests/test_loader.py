@@ -0,0 +1,77 @@
+import csv
+import sqlite3
+
+import pytest
+
+from ee_status.mastr_data.loader import SOURCE_COLUMNS, load_technology
+
+
+class CopyCursor:
+    """Stands in for a psycopg2 cursor and keeps what COPY would have received"""
+
+    def copy_expert(self, sql, file, size=8192):
+        self.sql = sql
+        self.data = ""
+        while chunk := file.read(size):
+            self.data += chunk
+        self.rowcount = self.data.count("\n")
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    path = tmp_path / "open-mastr.db"
+    source = sqlite3.connect(path)
+    source.execute(
+        f"CREATE TABLE wind_extended (Id INTEGER, {', '.join(SOURCE_COLUMNS)}, Hersteller TEXT)"
+    )
+    source.executemany(
+        f"INSERT INTO wind_extended VALUES (?, {', '.join('?' * len(SOURCE_COLUMNS))}, ?)",
+        [
+            (
+                i,
+                f"SEE{i:012}",
+                "2",
+                "09275116",
+                "Tittling",
+                "Passau",
+                "Bayern",
+                "94104-1234",
+                "2010-05-01",
+                None,
+                2300.5,
+                48.7,
+                13.4,
+                "Enercon",
+            )
+            for i in range(25)
+        ],
+    )
+    source.commit()
+    source.close()
+    return path
+
+
+def test_load_technology_streams_the_needed_columns(sqlite_path):
+    cursor = CopyCursor()
+    load_technology(cursor, "wind", "unit_snapshot", sqlite_path, batch_size=10)
+
+    assert cursor.sql.startswith(
+        "COPY unit_snapshot (unit_nr, technology, grid_operator_status,"
+    )
+    rows = list(csv.reader(cursor.data.splitlines()))
+    assert len(rows) == 25
+    assert rows[0] == [
+        "SEE000000000000",
+        "wind",
+        "2",
+        "09275116",
+        "Tittling",
+        "Passau",
+        "Bayern",
+        "94104-",
+        "2010-05-01",
+        "",
+        "2300.5",
+        "48.7",
+        "13.4",
+    ]
@@ -0,0 +1,35 @@
+from prometheus_client import REGISTRY
+
+from ee_status.mastr_data.metrics import observe_cache, observe_request
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_observe_request():
+    before = sample("mastr_data_request_duration_seconds_count", view="test:view")
+    observe_request("test:view", 0.02, 3)
+
+    assert (
+        sample("mastr_data_request_duration_seconds_count", view="test:view")
+        == before + 1
+    )
+    assert sample("mastr_data_request_queries_bucket", view="test:view", le="5.0") >= 1
+
+
+def test_observe_cache_counts_hits_and_misses():
+    hits = sample("mastr_data_cache_requests_total", view="test_view", result="hit")
+    misses = sample("mastr_data_cache_requests_total", view="test_view", result="miss")
+    observe_cache("test_view", hit=True)
+    observe_cache("test_view", hit=False)
+    observe_cache("test_view", hit=False)
+
+    assert (
+        sample("mastr_data_cache_requests_total", view="test_view", result="hit")
+        == hits + 1
+    )
+    assert (
+        sample("mastr_data_cache_requests_total", view="test_view", result="miss")
+        == misses + 2
+    )
@@ -0,0 +1,16 @@
+from django.test import RequestFactory
+
+from ee_status.mastr_data.templatetags.my_tags import keyed_parameters
+
+
+def test_keyed_parameters_leave_out_unkeyed_and_unnamed_parameters():
+    request = RequestFactory().get(
+        "/", {"county": "Passau", "numerator": "area", "utm_source": "feed"}
+    )
+
+    assert keyed_parameters({"request": request}).urlencode() == (
+        "county=Passau&numerator=area"
+    )
+    assert keyed_parameters({"request": request}, "county", "state").dict() == {
+        "county": "Passau"
+    }
@@ -0,0 +1,109 @@
+import pytest
+
+from ee_status.mastr_data.models import CurrentTotal
+from ee_status.mastr_data.ranking_engine import NUMERIC_FIELDS, RankingEngine
+
+
+def current_total(municipality, county, state, **values):
+    return CurrentTotal(
+        municipality=municipality,
+        county=county,
+        state=state,
+        **{field: values.get(field) for field in NUMERIC_FIELDS},
+    )
+
+
+@pytest.fixture
+def municipalities():
+    return [
+        current_total("A", "K1", "S1", total_net_nominal_capacity=100, population=10),
+        current_total(
+            "B",
+            "K1",
+            "S1",
+            total_net_nominal_capacity=300,
+            storage_net_nominal_capacity=20,
+            population=10,
+        ),
+        current_total("C", "K2", "S1", total_net_nominal_capacity=50, population=50),
+        current_total("D", "K3", "S2", total_net_nominal_capacity=10, population=0),
+    ]
+
+
+@pytest.fixture
+def engine(municipalities):
+    return RankingEngine(
+        (m.municipality, m.county, m.state, *(getattr(m, f) for f in NUMERIC_FIELDS))
+        for m in municipalities
+    )
+
+
+def test_ratio_and_rank(engine, municipalities):
+    result = engine.ratio_and_rank(
+        municipalities[0], "total_net_nominal_capacity", "population", "municipality"
+    )
+
+    assert [r["realm_type"] for r in result] == [
+        "municipality",
+        "county",
+        "state",
+        "country",
+    ]
+    assert [r["score"] for r in result] == [10.0, 20.0, 6.43, 6.57]
+    assert [r["rank"] for r in result] == ["n.a", "2", "2", "2"]
+    assert [r["total_ranks"] for r in result] == [1, 2, 3, 3]
+    assert result[-1]["max_score"] == 30.0
+
+
+def test_missing_scores_rank_last(engine, municipalities):
+    result = engine.ratio_and_rank(
+        municipalities[0], "storage_net_nominal_capacity", "population", "municipality"
+    )
+
+    assert result[1]["rank"] == "2"
+    assert result[1]["max_score"] == 2.0
+
+
+def test_country_is_ranked_by_states(engine, municipalities):
+    result = engine.ratio_and_rank(
+        municipalities[0], "total_net_nominal_capacity", "population", "country"
+    )
+
+    # S2 has no population and is left out
+    assert result == [
+        {
+            "realm_type": "country",
+            "realm_name": "Deutschland",
+            "score": 6.57,
+            "unit": "kW",
+            "numerator": "total_net_nominal_capacity",
+            "denominator": "population",
+            "rank": "n.a",
+            "total_ranks": 1,
+            "max_score": 6.4,
+        }
+    ]
+
+
+def test_ranking(engine):
+    ranking = engine.ranking(
+        "total_net_nominal_capacity", "population", "municipality", "state", "S1"
+    )
+
+    assert ranking == [
+        {"municipality": "B", "numerator": 300.0, "denominator": 10, "score": 30.0},
+        {"municipality": "A", "numerator": 100.0, "denominator": 10, "score": 10.0},
+        {"municipality": "C", "numerator": 50.0, "denominator": 50, "score": 1.0},
+    ]
+
+
+def test_ranking_without_denominator(engine):
+    ranking = engine.ranking(
+        "total_net_nominal_capacity", None, "county", "country", None
+    )
+
+    assert ranking == [
+        {"county": "K1", "numerator": 400.0},
+        {"county": "K2", "numerator": 50.0},
+        {"county": "K3", "numerator": 10.0},
+    ]
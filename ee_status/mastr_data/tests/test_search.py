@@ -0,0 +1,58 @@
+import pytest
+
+from ee_status.mastr_data.search import SearchIndex, like_pattern
+
+
+def test_like_pattern_matches_anywhere():
+    assert like_pattern("Passau") == "%Passau%"
+
+
+def test_like_pattern_escapes_wildcards():
+    assert like_pattern("100%_sol\\ar") == "%100\\%\\_sol\\\\ar%"
+
+
+@pytest.fixture
+def search_index():
+    return SearchIndex(
+        [
+            ("09262000", "Passau", "Passau", "Bayern", "94032,94034"),
+            ("09275116", "Tittling", "Passau", "Bayern", "94104"),
+            ("09275117", "Neuburg am Inn", "Passau", "Bayern", "94127"),
+            ("06412000", "Frankfurt am Main", "Frankfurt am Main", "Hessen", "60311"),
+            ("11000000", "Berlin", "Berlin", "Berlin", "10115"),
+        ]
+    )
+
+
+def test_search_index_finds_municipalities_by_zip_code(search_index):
+    results = search_index.search("94104", 25)
+    assert results["municipality"] == [
+        {"municipality": "Tittling", "county": "Passau", "state": "Bayern"}
+    ]
+
+
+def test_search_index_finds_kreisfreie_stadt_and_stadtstaat_once(search_index):
+    assert search_index.search("passau", 25) == {
+        "state": [],
+        "county": [{"municipality": None, "county": "Passau", "state": "Bayern"}],
+        "municipality": [],
+    }
+    assert search_index.search("Berlin", 25)["county"] == []
+
+
+def test_search_index_matches_inside_names_and_word_prefixes(search_index):
+    assert search_index.search("burg", 25)["municipality"][0]["municipality"] == (
+        "Neuburg am Inn"
+    )
+    assert search_index.search("in", 25)["municipality"][0]["municipality"] == (
+        "Neuburg am Inn"
+    )
+
+
+def test_search_index_orders_by_match_and_name_length_and_limits(search_index):
+    results = search_index.search("am", 1)
+    assert results["county"] == []
+    assert results["municipality"] == [
+        {"municipality": "Neuburg am Inn", "county": "Passau", "state": "Bayern"}
+    ]
+    assert search_index.search("ber", 25)["state"][0]["state"] == "Berlin"
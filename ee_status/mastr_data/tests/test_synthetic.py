@@ -0,0 +1,58 @@
+import sqlite3
+
+import numpy as np
+
+from ee_status.mastr_data.loader import SOURCE_COLUMNS
+from ee_status.mastr_data.synthetic import (
+    TECHNOLOGIES,
+    read_municipalities,
+    unit_rows,
+    write_sqlite,
+)
+
+
+def test_municipalities_follow_the_hierarchy_of_their_keys():
+    municipalities = {
+        municipality.key: municipality for municipality in read_municipalities()
+    }
+
+    bottrop = municipalities["05512000"]
+    assert bottrop.name == "Bottrop"
+    # cities not belonging to a county are their own county
+    assert bottrop.county == "Bottrop"
+    assert bottrop.state == "Nordrhein-Westfalen"
+    assert municipalities["16061086"].state == "Thüringen"
+    assert (
+        len({m.county for m in municipalities.values() if m.county_key == "16061"}) == 1
+    )
+
+
+def test_unit_rows():
+    municipalities = read_municipalities()
+    rows = list(unit_rows(np.random.default_rng(0), municipalities, "wind", 100))
+
+    assert len(rows) == 100
+    assert all(len(row) == len(SOURCE_COLUMNS) for row in rows)
+    assert len({row[0] for row in rows}) == 100
+    assert all(row[7] <= (row[8] or "9999") for row in rows)
+
+
+def test_write_sqlite(tmp_path):
+    path = tmp_path / "synthetic.db"
+    write_sqlite(path, read_municipalities(), 1000, batch_size=100)
+
+    source = sqlite3.connect(path)
+    counts = {
+        technology: source.execute(
+            f"SELECT count(*) FROM {technology}_extended"
+        ).fetchone()[0]
+        for technology in TECHNOLOGIES
+    }
+    source.close()
+    assert counts == {
+        "solar": 770,
+        "storage": 200,
+        "wind": 15,
+        "biomass": 10,
+        "hydro": 5,
+    }
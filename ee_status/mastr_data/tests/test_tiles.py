@@ -0,0 +1,25 @@
+from ee_status.mastr_data.tiles import geometry_level, is_valid_tile
+
+
+def test_is_valid_tile():
+    assert is_valid_tile(0, 0, 0)
+    assert is_valid_tile(8, 136, 84)
+
+
+def test_is_valid_tile_rejects_coordinates_outside_the_zoom_level():
+    assert not is_valid_tile(0, 1, 0)
+    assert not is_valid_tile(8, 136, 256)
+    assert not is_valid_tile(23, 0, 0)
+
+
+def test_geometry_level_gets_finer_with_zoom():
+    assert [geometry_level(zoom) for zoom in [0, 5, 6, 7, 8, 11, 12, 18]] == [
+        0,
+        0,
+        1,
+        1,
+        2,
+        3,
+        4,
+        4,
+    ]
@@ -0,0 +1,46 @@
+from ee_status.mastr_data import timing
+
+
+def test_timed_adds_up_the_phases_of_the_current_request():
+    timings = timing.start_request()
+    try:
+        for _ in range(2):
+            with timing.timed("render"):
+                pass
+    finally:
+        timing.end_request()
+
+    assert list(timings.durations) == ["render"]
+    assert timings.durations["render"] >= 0
+
+
+def test_timed_without_request_does_nothing():
+    @timing.timed("aggregation")
+    def aggregate():
+        return 42
+
+    assert aggregate() == 42
+    assert timing.current_timings() is None
+
+
+def test_execute_wrapper_counts_queries():
+    timings = timing.RequestTimings()
+    result = timings.execute_wrapper(
+        lambda sql, params, many, context: "rows", "SELECT 1", None, False, {}
+    )
+
+    assert result == "rows"
+    assert timings.queries == 1
+    assert "db" in timings.durations
+
+
+def test_server_timing_header():
+    timings = timing.RequestTimings()
+    timings.queries = 3
+    timings.add("db", 0.0123)
+    timings.add("render", 0.004)
+
+    assert (
+        timings.server_timing(0.05)
+        == 'total;dur=50.0, db;dur=12.3;desc="3 queries", render;dur=4.0'
+    )
@@ -0,0 +1,58 @@
+from bisect import bisect_left
+
+from django.db import connection
+
+MVT_CONTENT_TYPE = "application/vnd.mapbox-vector-tile"
+# name of the layer holding the municipalities in every tile
+TILE_LAYER = "municipalities"
+
+# Highest zoom level each level of simplified_geometries is used for, the last level serves all higher zoom levels.
+# The tolerances are set in sql_scripts/07_map_geometries.sql.
+GEOMETRY_LEVEL_MAX_ZOOM = [5, 7, 9, 11]
+
+# Municipality polygons clipped to the tile with their capacities as attributes.
+# ST_Transform(s.geom, 3857) is served by the index of sql_scripts/07_map_geometries.sql.
+TILE_SQL = """
+WITH bounds AS (SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS envelope),
+     tile AS (SELECT ST_AsMVTGeom(ST_Transform(s.geom, 3857), bounds.envelope, 4096, 64, TRUE) AS geom,
+                     t.municipality_key,
+                     t.municipality,
+                     t.county,
+                     t.state,
+                     t.pv_net_nominal_capacity,
+                     t.wind_net_nominal_capacity,
+                     t.biomass_net_nominal_capacity,
+                     t.hydro_net_nominal_capacity,
+                     t.storage_net_nominal_capacity,
+                     t.total_net_nominal_capacity,
+                     t.population,
+                     t.area
+              FROM simplified_geometries s
+                       JOIN current_totals t ON t.id = s.current_total_id,
+                   bounds
+              WHERE s.level = %(level)s
+                AND ST_Transform(s.geom, 3857) && bounds.envelope)
+SELECT ST_AsMVT(tile, %(layer)s, 4096, 'geom')
+FROM tile
+WHERE geom IS NOT NULL
+"""
+
+
+def geometry_level(zoom):
+    """Return the level of simplified_geometries to draw a map at zoom"""
+    return bisect_left(GEOMETRY_LEVEL_MAX_ZOOM, zoom)
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= 22 and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def get_tile(z, x, y):
+    """Return the Mapbox Vector Tile z/x/y of the municipalities as bytes"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TILE_SQL,
+            {"z": z, "x": x, "y": y, "level": geometry_level(z), "layer": TILE_LAYER},
+        )
+        (tile,) = cursor.fetchone()
+    return bytes(tile or b"")
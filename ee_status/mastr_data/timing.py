@@ -0,0 +1,69 @@
+"""
+Time spent per phase of a request (SQL, aggregation, rendering, ...), collected
+by middleware.InstrumentationMiddleware.
+
+Phases may overlap: queries run while a template is rendered count for db
+and for render.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        self.durations[phase] = self.durations.get(phase, 0) + seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Count the queries of the request and the time spent in them (connection.execute_wrapper)"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add("db", time.perf_counter() - start)
+            self.queries += 1
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """Value of the Server-Timing header, durations in milliseconds"""
+        metrics = [f"total;dur={total * 1000:.1f}"]
+        for phase, seconds in self.durations.items():
+            description = f';desc="{self.queries} queries"' if phase == "db" else ""
+            metrics.append(f"{phase};dur={seconds * 1000:.1f}{description}")
+        return ", ".join(metrics)
+
+
+def start_request():
+    _local.timings = RequestTimings()
+    return _local.timings
+
+
+def end_request():
+    _local.timings = None
+
+
+def current_timings():
+    return getattr(_local, "timings", None)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block (or decorated function) to phase of the current request."""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
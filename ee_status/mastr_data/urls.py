@@ -1,11 +1,19 @@
 from django.urls import path
 
 from .views import (
+    export_view,
     multi_polygon_map,
+    rankings_api,
+    rankings_map_geometry,
+    rankings_map_json,
     rankings_view,
     search_municipality,
     search_view,
+    tile_view,
+    timeline_json,
+    totals_api,
     totals_view,
+    units_view,
 )
 
 app_name = "mastr_data"
@@ -14,6 +22,14 @@ urlpatterns = [
     path("totals", totals_view, name="totals"),
     path("rankings", rankings_view, name="rankings"),
     path("multi_polygon_map/", multi_polygon_map, name="multi_polygon_map"),
+    path("totals/timeline.json", timeline_json, name="timeline"),
+    path("rankings/map.json", rankings_map_json, name="rankings-map"),
+    path("rankings/map.geojson", rankings_map_geometry, name="rankings-map-geometry"),
+    path("tiles/<int:z>/<int:x>/<int:y>.mvt", tile_view, name="tile"),
+    path("units/<int:z>/<int:x>/<int:y>.json", units_view, name="units"),
+    path("api/totals", totals_api, name="totals-api"),
+    path("api/rankings", rankings_api, name="rankings-api"),
+    path("exports/<slug:name>.<slug:file_format>", export_view, name="export"),
 ]
 
 htmx_urlpatterns = [
@@ -1,23 +1,94 @@
-import json
-
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from django.contrib.gis.db.models.functions import AsGeoJSON
-from django.core.serializers import serialize
-from django.db.models import F, Q, Sum, Window
+import gzip
+
+from django.conf import settings
+from django.db.models import F, Sum
 from django.db.models.functions import Round
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect, render
 from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.timezone import localtime
 from django.utils.translation import gettext as _
-from plotly.offline import plot
-
-from .filters import CurrentTotalFilter, MonthlyTimelineFilter, RankingsFilter
-from .models import CurrentTotal, MonthlyTimeline
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
+
+from .cache import (
+    cache_per_data_version,
+    conditional_per_data_version,
+    data_version_last_modified,
+)
+from .choropleth import (
+    METRICS,
+    accepts_gzip,
+    geometry_etag,
+    get_county_geometry,
+    get_county_metrics,
+    scores,
+)
+from .clusters import get_units
+from .exports import (
+    EXPORTS,
+    FORMATS,
+    export_filters,
+    export_path,
+    has_rows,
+    stream_export,
+)
+from .filters import CurrentTotalFilter, RankingsFilter
+from .history import get_history, month_date, parse_month
+from .models import CumulativeTimeline, CurrentTotal, RealmTotal
+from .ranking_engine import get_ranking_engine
+from .search import search_realms
+from .tiles import MVT_CONTENT_TYPE, geometry_level, get_tile, is_valid_tile
+from .timing import timed
+
+# series of the totals chart and the CumulativeTimeline fields they are read from
+TIMELINE_SERIES = {
+    "pv": "pv_net_nominal_capacity",
+    "wind": "wind_net_nominal_capacity",
+    "hydro": "hydro_net_nominal_capacity",
+    "biomass": "biomass_net_nominal_capacity",
+    "storage": "storage_net_nominal_capacity",
+}
+# zoom level of the choropleth on the rankings page
+RANKINGS_MAP_ZOOM = 8
+
+
+def get_month(params):
+    """Month number of the date parameter (YYYY-MM), None for today"""
+    value = params.get("date", "").strip()
+    if not value:
+        return None
+    try:
+        return parse_month(value)
+    except ValueError:
+        raise Http404
+
+
+@timed("aggregation")
+def ratio_and_rank(current_object, numerator, denominator, realm_type, month=None):
+    if month is not None:
+        return (
+            get_history()
+            .engine_as_of(month)
+            .ratio_and_rank(current_object, numerator, denominator, realm_type)
+        )
+    if settings.MASTR_DATA_IN_MEMORY_RANKINGS:
+        return get_ranking_engine().ratio_and_rank(
+            current_object, numerator, denominator, realm_type
+        )
+    return current_object.ratio_and_rank(numerator, denominator, realm_type)
 
 
+@cache_per_data_version
 def search_municipality(request):
-    query = request.POST.get("search")
+    query = request.GET.get("search", "")
     # look up all municipalities that contain the text
     # Search logic
     # search for aliases of Germany
@@ -39,180 +110,213 @@ def search_municipality(request):
     if query in names_for_germany:
         return redirect(reverse("mastr_data:totals"))
 
-    municipality_results = (
-        CurrentTotal.objects.filter(
-            Q(municipality__icontains=query)
-            | Q(municipality_key__icontains=query)
-            | Q(zip_code__icontains=query)
+    # relevance-ranked municipalities, counties and states, served from memory
+    with timed("search"):
+        results = search_realms(query.strip())
+
+    with timed("render"):
+        return render(
+            request,
+            "mastr_data/partials/search-results.html",
+            {
+                "municipality_results": results["municipality"],
+                "county_results": results["county"],
+                "state_results": results["state"],
+            },
         )
-        # we exclude municipalities that are their own counties ("kreisfreie Städte")
-        # their municipality keys ends with "000"
-        .exclude(municipality_key__endswith="000").values(
-            "municipality", "county", "state"
-        )
-    )
 
-    county_results = (
-        CurrentTotal.objects.filter(county__icontains=query)
-        .values("county", "state")
-        # we exclude counties that are their own states ("echte Stadtstaaten": Hamburg, Berlin)
-        # their municipality keys ends with "000000"
-        .exclude(municipality_key__endswith="000000")
-        .distinct()
-    )
-    state_results = (
-        CurrentTotal.objects.filter(state__icontains=query).values("state").distinct()
-    )
 
-    return render(
-        request,
-        "mastr_data/partials/search-results.html",
-        {
-            "municipality_results": municipality_results,
-            "county_results": county_results,
-            "state_results": state_results,
-        },
+def multi_polygon_map(request):
+    return render(request, "mastr_data/map_template.html")
+
+
+@gzip_page
+@cache_per_data_version
+def tile_view(request, z, x, y):
+    """Vector tile of the municipalities for the map"""
+    if not is_valid_tile(z, x, y):
+        raise Http404
+    return HttpResponse(get_tile(z, x, y), content_type=MVT_CONTENT_TYPE)
+
+
+@gzip_page
+@cache_per_data_version
+def units_view(request, z, x, y):
+    """Energy units of a map tile, clustered unless zoomed in far enough"""
+    if not is_valid_tile(z, x, y):
+        raise Http404
+    return JsonResponse(get_units(z, x, y))
+
+
+def export_view(request, name, file_format):
+    """
+    CSV or Parquet export of a table. The unfiltered exports are written by
+    import_mastr (those of the previous data version are served until then),
+    exports filtered by state, county or municipality are streamed from the
+    database.
+    """
+    if name not in EXPORTS or file_format not in FORMATS:
+        raise Http404
+    filters = export_filters(request.GET)
+    if not filters:
+        path = export_path(name, file_format)
+        if path is None:
+            raise Http404
+        return FileResponse(
+            open(path, "rb"),
+            as_attachment=True,
+            filename=f"{name}.{file_format}",
+            content_type=FORMATS[file_format],
+        )
+
+    if not has_rows(name, filters):
+        raise Http404
+    response = StreamingHttpResponse(
+        stream_export(name, file_format, filters), content_type=FORMATS[file_format]
     )
+    response["Content-Disposition"] = f'attachment; filename="{name}.{file_format}"'
+    return response
 
 
-def multi_polygon_map(request):
-    qs = (
-        CurrentTotal.objects.filter(geom__isnull=False)
-        .annotate(json=AsGeoJSON("geom", precision=4))
-        .values("id", "json")
-    )
+def get_realm(params):
+    """
+    Return the filter, the first matching CurrentTotal and the realm type
+    (municipality, county, state or country) the request parameters ask for.
+    """
+    f_current_totals = CurrentTotalFilter(params, queryset=CurrentTotal.objects.all())
+    current_object = f_current_totals.qs.first()
+    if current_object is None:
+        raise Http404
 
-    # Prepare the GeoJSON object
-    json_object = json.loads(qs)
+    # Determine which realm type we are about to handle
+    if params.get("municipality") or params.get("municipality_key"):
+        realm_type = "municipality"
+    elif params.get("county"):
+        realm_type = "county"
+    elif params.get("state"):
+        realm_type = "state"
+    else:
+        realm_type = "country"
 
-    return render(
-        request,
-        "mastr_data/map_template.html",
-        {"geojson": json_object},
-    )
+    return f_current_totals, current_object, realm_type
 
 
-def totals_view(request):
-    tempdict = request.GET
-    municipality_key = tempdict.get("municipality_key")
-    municipality = tempdict.get("municipality")
-    county = tempdict.get("county")
-    state = tempdict.get("state")
+def get_timeline(params):
+    """Running totals of every technology of the realm in params as columnar arrays"""
+    _, current_object, realm_type = get_realm(params)
 
-    f = MonthlyTimelineFilter(tempdict, queryset=MonthlyTimeline.objects.all())
+    # running totals are precomputed per realm by sql_scripts/05_cumulative_timeline.sql
     data = (
-        f.qs.annotate(
-            pv_net_sum=Window(
-                expression=Sum(F("pv_net_nominal_capacity")), order_by=[F("date").asc()]
-            ),
-            wind_net_sum=Window(
-                expression=Sum(F("wind_net_nominal_capacity")),
-                order_by=[F("date").asc()],
-            ),
-            biomass_net_sum=Window(
-                expression=Sum(F("biomass_net_nominal_capacity")),
-                order_by=[F("date").asc()],
-            ),
-            hydro_net_sum=Window(
-                expression=Sum(F("hydro_net_nominal_capacity")),
-                order_by=[F("date").asc()],
-            ),
-        )
-        .distinct("date")
-        .values_list(
-            "date", "pv_net_sum", "wind_net_sum", "biomass_net_sum", "hydro_net_sum"
+        CumulativeTimeline.objects.filter(
+            level=realm_type, **current_object.realm_filter(realm_type)
         )
+        .order_by("date")
+        .values_list("date", *TIMELINE_SERIES.values())
     )
 
-    # transform QuerySet to list
-    data = list(data)
-
-    #  Build Graph
-    # Extract data for each category (pv, wind, hydro, biomass)
-    dates = [item[0] for item in data]
-    pv_data = [item[1] if item[1] is not None else 0 for item in data]
-    wind_data = [item[2] if item[2] is not None else 0 for item in data]
-    hydro_data = [item[3] if item[3] is not None else 0 for item in data]
-    biomass_data = [item[4] if item[4] is not None else 0 for item in data]
-
-    # Create traces for each category
-    trace_pv = go.Scatter(x=dates, y=pv_data, mode="lines", name=_("Photovoltaics"))
-    trace_wind = go.Scatter(x=dates, y=wind_data, mode="lines", name=_("Wind power"))
-    trace_hydro = go.Scatter(x=dates, y=hydro_data, mode="lines", name=_("Hydropower"))
-    trace_biomass = go.Scatter(
-        x=dates,
-        y=biomass_data,
-        mode="lines",
-        name=_("Biomass"),
-    )
+    columns = list(zip(*data)) or [()] * (len(TIMELINE_SERIES) + 1)
+    return {
+        "dates": [localtime(date).strftime("%Y-%m-%d") for date in columns[0]],
+        "series": {
+            series: [round(float(value), 2) for value in values]
+            for series, values in zip(TIMELINE_SERIES, columns[1:])
+        },
+    }
 
-    # Create the layout for the timeline graph
-    layout = go.Layout(
-        xaxis=dict(title=_("Date")),
-        yaxis=dict(
-            title=_("Power generation"),
-        ),
-        hovermode="x unified",
-        template="plotly_white",
-    )
 
-    # Create a figure and add traces to it
-    fig = go.Figure(
-        data=[trace_pv, trace_wind, trace_hydro, trace_biomass], layout=layout
-    )
+@gzip_page
+@cache_per_data_version
+def timeline_json(request):
+    """Running totals of every technology as columnar arrays for the totals chart"""
+    return JsonResponse(get_timeline(request.GET))
 
-    plt_div = plot(fig, output_type="div", include_plotlyjs=False)
 
-    f_current_totals = CurrentTotalFilter(
-        request.GET, queryset=CurrentTotal.objects.all()
+def get_basics(f_current_totals, current_object, realm_type):
+    """Population, area, capacities and unit count of the realm"""
+    if realm_type == "municipality":
+        return f_current_totals.qs.aggregate(
+            total_population=Sum("population"),
+            total_area=Sum("area"),
+            total_production_capacity=Sum("total_net_nominal_capacity"),
+            total_storage_capacity=Sum("storage_net_nominal_capacity"),
+            count_of_devices=Sum("energy_units"),
+        )
+
+    # counties, states and the country are presummed by sql_scripts/08_realm_totals.sql
+    return (
+        RealmTotal.objects.filter(
+            realm_type=realm_type, **current_object.realm_filter(realm_type)
+        )
+        .values(
+            total_population=F("population"),
+            total_area=F("area"),
+            total_production_capacity=F("total_net_nominal_capacity"),
+            total_storage_capacity=F("storage_net_nominal_capacity"),
+            count_of_devices=F("energy_units"),
+        )
+        .get()
     )
-    current_object = f_current_totals.qs.first()
 
-    # Determine which realm type we are about to handle
-    if municipality or municipality_key:
-        realm_type = "municipality"
-    elif county:
-        realm_type = "county"
-    elif state:
-        realm_type = "state"
-    else:
-        realm_type = "country"
+
+def get_basics_as_of(basics, current_object, realm_type, month):
+    """Basics of the realm with the capacities as of month, the unit count is not known for past months"""
+    engine = get_history().engine_as_of(month)
+    return {
+        **basics,
+        "total_production_capacity": engine.realm_sum(
+            "total_net_nominal_capacity", current_object, realm_type
+        ),
+        "total_storage_capacity": engine.realm_sum(
+            "storage_net_nominal_capacity", current_object, realm_type
+        ),
+        "count_of_devices": None,
+    }
+
+
+def get_totals(params):
+    """Numbers of the totals page of the realm the request parameters ask for, as of the date parameter if given"""
+    f_current_totals, current_object, realm_type = get_realm(params)
+    month = get_month(params)
 
     # GET TOTAL NET NOMINAL CAPACITY PER CAPITA
-    total_net_nominal_capacity_per_capita = current_object.ratio_and_rank(
+    total_net_nominal_capacity_per_capita = ratio_and_rank(
+        current_object,
         numerator="total_net_nominal_capacity",
         denominator="population",
         realm_type=realm_type,
+        month=month,
     )
 
     # GET TOTAL NET NOMINAL CAPACITY PER SQUARE METERS
-    total_net_nominal_capacity_per_area = current_object.ratio_and_rank(
+    total_net_nominal_capacity_per_area = ratio_and_rank(
+        current_object,
         numerator="total_net_nominal_capacity",
         denominator="area",
         realm_type=realm_type,
+        month=month,
     )
 
     # GET Storage Capacity per capita
-    storage_capacity_per_capita = current_object.ratio_and_rank(
+    storage_capacity_per_capita = ratio_and_rank(
+        current_object,
         numerator="storage_net_nominal_capacity",
         denominator="population",
         realm_type=realm_type,
+        month=month,
     )
 
     # GET Storage Capacity per are
-    storage_capacity_per_area = current_object.ratio_and_rank(
+    storage_capacity_per_area = ratio_and_rank(
+        current_object,
         numerator="storage_net_nominal_capacity",
         denominator="area",
         realm_type=realm_type,
+        month=month,
     )
 
-    basics = f_current_totals.qs.aggregate(
-        total_population=Sum("population"),
-        total_area=Sum("area"),
-        total_production_capacity=Sum("total_net_nominal_capacity"),
-        total_storage_capacity=Sum("storage_net_nominal_capacity"),
-        count_of_devices=Sum("energy_units"),
-    )
+    basics = get_basics(f_current_totals, current_object, realm_type)
+    if month is not None:
+        basics = get_basics_as_of(basics, current_object, realm_type, month)
     basics["realm_type"] = realm_type
 
     if realm_type == "country":
@@ -227,31 +331,36 @@ def totals_view(request):
             hierarchy[i] = getattr(current_object, i)
     hierarchy["country"] = _("Germany")
 
-    return render(
-        request,
-        "mastr_data/totals.html",
-        {
-            "filter": f_current_totals,
-            "total_net_nominal_capacity_per_capita": total_net_nominal_capacity_per_capita,
-            "total_net_nominal_capacity_per_area": total_net_nominal_capacity_per_area,
-            "storage_capacity_per_capita": storage_capacity_per_capita,
-            "storage_capacity_per_area": storage_capacity_per_area,
-            "basics": basics,
-            "hierarchy": hierarchy,
-            "realm_type": realm_type,
-            "plt_div": plt_div,
-        },
-    )
+    return {
+        "filter": f_current_totals,
+        "total_net_nominal_capacity_per_capita": total_net_nominal_capacity_per_capita,
+        "total_net_nominal_capacity_per_area": total_net_nominal_capacity_per_area,
+        "storage_capacity_per_capita": storage_capacity_per_capita,
+        "storage_capacity_per_area": storage_capacity_per_area,
+        "basics": basics,
+        "hierarchy": hierarchy,
+        "realm_type": realm_type,
+        "date": None if month is None else f"{month_date(month):%Y-%m}",
+    }
 
 
-def rankings_view(request):
-    tempdict = request.GET
+@cache_per_data_version
+def totals_view(request):
+    totals = get_totals(request.GET)
+    with timed("render"):
+        return render(request, "mastr_data/totals.html", totals)
+
+
+def get_rankings(params):
+    """Ranking of the rankings page the request parameters ask for"""
+    tempdict = params
     municipality = tempdict.get("municipality")
     county = tempdict.get("county")
     state = tempdict.get("state")
     numerator = tempdict.get("numerator")
     denominator = tempdict.get("denominator")
     scope = tempdict.get("scope")
+    month = get_month(tempdict)
 
     if not numerator and not denominator:
         numerator = "total_net_nominal_capacity"
@@ -333,83 +442,152 @@ def rankings_view(request):
         except (ValueError, IndexError):
             scope = realm_type
 
-    ranking = (
-        CurrentTotal.objects.filter(**filter_dict.get(scope))
-        .filter(**denominator_filter_kwargs)
-        .filter(**numerator_filter_kwargs)
-        .values(realm_type)
-        .annotate(**numerator_annotate)
-        .annotate(**denominator_annotate)
-        .annotate(**score_expression)
-        .order_by(*order_by_expression)
-        .distinct()
-    )
-
-    if municipality:
-        plot_qs = CurrentTotal.objects.filter(county__exact=county)
-
-        geojson_data = serialize(
-            "geojson",
-            plot_qs,
-            geometry_field="geom",
-            fields=["pk"],
-        )
-        if denominator:
-            data = plot_qs.values("pk", "municipality", numerator, denominator)
-            df = pd.DataFrame.from_records(data)
-            df[numerator] = (df[numerator] / df[denominator]).astype(float).round(2)
+    # past months are only kept in memory (history.py)
+    if month is not None or settings.MASTR_DATA_IN_MEMORY_RANKINGS:
+        if month is not None:
+            engine = get_history().engine_as_of(month)
         else:
-            data = plot_qs.values("pk", "municipality", numerator)
-            df = pd.DataFrame.from_records(data)
-            df[numerator] = df[numerator].astype(float).round(2)
-
-        geojson = json.loads(geojson_data)
-
-        first_feature = geojson["features"][0]
-        coordinates = first_feature["geometry"]["coordinates"]
-
-        fig = px.choropleth_mapbox(
-            df,
-            geojson=geojson,
-            locations="pk",
-            color=numerator,
-            featureidkey="properties.pk",
-            color_continuous_scale="greens",
-            center={"lat": coordinates[0][0][0][1], "lon": coordinates[0][0][0][0]},
-            zoom=8,
-            opacity=0.5,
-            labels={},
-            custom_data=["municipality"],
-            mapbox_style="carto-positron",
+            engine = get_ranking_engine()
+        with timed("aggregation"):
+            ranking = engine.ranking(
+                numerator, denominator, realm_type, scope, filter_dict[scope].get(scope)
+            )
+    else:
+        ranking = (
+            CurrentTotal.objects.filter(**filter_dict.get(scope))
+            .filter(**denominator_filter_kwargs)
+            .filter(**numerator_filter_kwargs)
+            .values(realm_type)
+            .annotate(**numerator_annotate)
+            .annotate(**denominator_annotate)
+            .annotate(**score_expression)
+            .order_by(*order_by_expression)
+            .distinct()
         )
 
-        fig.update_traces(
-            hovertemplate="<b>%{customdata[0]}</b><br> %{z}",
-        )
-        fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
-        fig.update_layout(
-            coloraxis_colorbar=dict(
-                title="",  # Customize the legend title
-                x=0,  # Adjust the x position of the color legend
-                xanchor="left",  # Anchor the legend to the left side
-            ),
-        )
-        plt_div = plot(fig, output_type="div", include_plotlyjs=False)
-    else:
-        plt_div = ""
-    return render(
-        request,
-        "mastr_data/rankings.html",
+    return {
+        "filter": f,
+        "rankings": ranking,
+        "table_captions": table_captions,
+        "hierarchy": hierarchy,
+        "basics": basics,
+        "numerator": numerator,
+        "denominator": denominator,
+        "scope": scope,
+        "date": None if month is None else f"{month_date(month):%Y-%m}",
+    }
+
+
+@cache_per_data_version
+def rankings_view(request):
+    rankings = get_rankings(request.GET)
+    with timed("render"):
+        return render(request, "mastr_data/rankings.html", rankings)
+
+
+@gzip_page
+@cache_per_data_version
+def rankings_map_json(request):
+    """Scores of the municipalities of a county for the choropleth of the rankings page"""
+    county = request.GET.get("county")
+    numerator = request.GET.get("numerator")
+    denominator = request.GET.get("denominator")
+    zoom = request.GET.get("zoom", "")
+    zoom = int(zoom) if zoom.isdigit() else RANKINGS_MAP_ZOOM
+
+    if not numerator and not denominator:
+        numerator = "total_net_nominal_capacity"
+        denominator = "population"
+    metrics = [field for field in [numerator, denominator] if field]
+    if not county or not set(metrics) <= set(METRICS):
+        raise Http404
+
+    county_metrics = get_county_metrics(county)
+    if county_metrics is None:
+        raise Http404
+
+    return JsonResponse(
         {
-            "filter": f,
-            "rankings": ranking,
-            "table_captions": table_captions,
-            "hierarchy": hierarchy,
-            "basics": basics,
-            "plt_div": plt_div,
-        },
+            "locations": county_metrics["locations"],
+            "values": scores(county_metrics["metrics"], *metrics),
+            "names": county_metrics["names"],
+            "center": county_metrics["center"],
+            "zoom": zoom,
+        }
     )
 
 
+@condition(etag_func=geometry_etag, last_modified_func=data_version_last_modified)
+def rankings_map_geometry(request):
+    """
+    Municipalities of a county as GeoJSON for the choropleth of the rankings
+    page, compressed once per data version and zoom range (choropleth.py).
+    """
+    zoom = request.GET.get("zoom", "")
+    zoom = int(zoom) if zoom.isdigit() else RANKINGS_MAP_ZOOM
+
+    county = request.GET.get("county")
+    if not county:
+        raise Http404
+
+    content = get_county_geometry(county, geometry_level(zoom))
+    if content is None:
+        raise Http404
+
+    if accepts_gzip(request):
+        response = HttpResponse(content, content_type="application/geo+json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(
+            gzip.decompress(content), content_type="application/geo+json"
+        )
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
 def search_view(request):
     return render(request, "mastr_data/search.html")
+
+
+# Read-only JSON API with the numbers of the totals and rankings pages. Clients
+# revalidate with If-None-Match/If-Modified-Since and get 304s until the next import.
+# Not gzipped, gzip_page would turn the strong ETags into weak ones.
+TOTALS_API_BLOCKS = [
+    "total_net_nominal_capacity_per_capita",
+    "total_net_nominal_capacity_per_area",
+    "storage_capacity_per_capita",
+    "storage_capacity_per_area",
+]
+
+
+@conditional_per_data_version
+@cache_per_data_version
+def totals_api(request):
+    totals = get_totals(request.GET)
+    return JsonResponse(
+        {
+            "realm_type": totals["realm_type"],
+            "date": totals["date"],
+            "hierarchy": totals["hierarchy"],
+            "basics": totals["basics"],
+            **{block: totals[block] for block in TOTALS_API_BLOCKS},
+            "timeline": get_timeline(request.GET),
+        }
+    )
+
+
+@conditional_per_data_version
+@cache_per_data_version
+def rankings_api(request):
+    rankings = get_rankings(request.GET)
+    return JsonResponse(
+        {
+            "realm_type": rankings["basics"]["realm_type"],
+            "date": rankings["date"],
+            "hierarchy": rankings["hierarchy"],
+            "numerator": rankings["numerator"],
+            "denominator": rankings["denominator"],
+            "scope": rankings["scope"],
+            "rankings": list(rankings["rankings"]),
+        }
+    )
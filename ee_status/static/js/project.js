@@ -1 +1,156 @@
 /* Project specific Javascript goes here. */
+
+/*
+ * Charts are built in the browser from the compact JSON served by the
+ * mastr_data views, so the server never renders plotly figures.
+ */
+function renderTimelineChart(element) {
+  fetch(element.dataset.url)
+    .then((response) => response.json())
+    .then((timeline) => {
+      const traces = Object.keys(timeline.series).map((series) => {
+        const trace = {
+          x: timeline.dates,
+          y: timeline.series[series],
+          mode: 'lines',
+          name: element.dataset['label' + series.charAt(0).toUpperCase() + series.slice(1)],
+        };
+        // storage is measured in kWh and gets its own axis
+        if (series === 'storage') {
+          trace.yaxis = 'y2';
+          trace.line = {dash: 'dot'};
+        }
+        return trace;
+      });
+      const layout = {
+        xaxis: {title: element.dataset.titleX, gridcolor: '#EBF0F8'},
+        yaxis: {title: element.dataset.titleY, gridcolor: '#EBF0F8'},
+        yaxis2: {title: element.dataset.titleY2, overlaying: 'y', side: 'right', showgrid: false},
+        hovermode: 'x unified',
+        plot_bgcolor: 'white',
+      };
+      Plotly.newPlot(element, traces, layout, {responsive: true});
+    });
+}
+
+/*
+ * The polygons of a county come separately from the scores, they are the
+ * same for every metric and the browser keeps them until the next import.
+ */
+function renderRankingsMap(element) {
+  Promise.all([element.dataset.url, element.dataset.geometryUrl].map((url) => fetch(url).then((response) => response.json())))
+    .then(([map, geojson]) => {
+      const trace = {
+        type: 'choroplethmapbox',
+        geojson: geojson,
+        locations: map.locations,
+        z: map.values,
+        customdata: map.names,
+        featureidkey: 'properties.pk',
+        colorscale: 'Greens',
+        reversescale: true,
+        marker: {opacity: 0.5},
+        hovertemplate: '<b>%{customdata}</b><br> %{z}<extra></extra>',
+        colorbar: {title: '', x: 0, xanchor: 'left'},
+      };
+      const layout = {
+        mapbox: {style: 'carto-positron', center: map.center, zoom: map.zoom},
+        margin: {r: 0, t: 0, l: 0, b: 0},
+      };
+      Plotly.newPlot(element, [trace], layout, {responsive: true});
+    });
+}
+
+/*
+ * Municipalities of the whole country, drawn from the vector tiles of the
+ * tile view and coloured by their total capacity per km².
+ */
+function municipalityColor(properties) {
+  const capacityPerArea = properties.area ? properties.total_net_nominal_capacity / properties.area : 0;
+  const steps = [[5000, '#00441b'], [2000, '#006d2c'], [1000, '#238b45'], [500, '#41ab5d'], [200, '#74c476'], [100, '#a1d99b']];
+  const step = steps.find(([threshold]) => capacityPerArea >= threshold);
+  return step ? step[1] : '#e5f5e0';
+}
+
+function renderMunicipalityMap(element) {
+  const map = L.map(element).setView([51.2, 10.4], 6);
+  L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    maxZoom: 19,
+    attribution: '&copy; <a href="http://www.openstreetmap.org/copyright">OpenStreetMap</a>',
+  }).addTo(map);
+
+  // the url of tile 0/0/0 is rendered by Django, Leaflet fills in the coordinates
+  const tileUrl = element.dataset.url.replace(/0\/0\/0\.mvt$/, '{z}/{x}/{y}.mvt');
+  L.vectorGrid.protobuf(tileUrl, {
+    rendererFactory: L.canvas.tile,
+    interactive: true,
+    vectorTileLayerStyles: {
+      municipalities: (properties) => ({
+        fill: true,
+        fillColor: municipalityColor(properties),
+        fillOpacity: 0.6,
+        color: '#555555',
+        weight: 0.5,
+      }),
+    },
+  }).on('click', (event) => {
+    const properties = event.layer.properties;
+    L.popup()
+      .setLatLng(event.latlng)
+      .setContent(`<b>${properties.municipality}</b><br>${Math.round(properties.total_net_nominal_capacity)} kW`)
+      .openOn(map);
+  }).addTo(map);
+
+  renderUnits(map, element.dataset.unitsUrl.replace(/0\/0\/0\.json$/, '{z}/{x}/{y}.json'));
+}
+
+/*
+ * Energy units on top of the municipalities: the units view sends clusters
+ * per tile and single units once zoomed in far enough.
+ */
+function renderUnits(map, urlTemplate) {
+  const layer = L.layerGroup().addTo(map);
+  const update = () => {
+    const zoom = map.getZoom();
+    const last = 2 ** zoom - 1;
+    const bounds = map.getPixelBounds();
+    const min = bounds.min.divideBy(256).floor();
+    const max = bounds.max.divideBy(256).floor();
+    const requests = [];
+    for (let x = Math.max(min.x, 0); x <= Math.min(max.x, last); x++) {
+      for (let y = Math.max(min.y, 0); y <= Math.min(max.y, last); y++) {
+        const url = urlTemplate.replace('{z}', zoom).replace('{x}', x).replace('{y}', y);
+        requests.push(fetch(url).then((response) => response.json()));
+      }
+    }
+    Promise.all(requests).then((tiles) => {
+      // the map moved on while the tiles were loading
+      if (zoom !== map.getZoom()) {
+        return;
+      }
+      layer.clearLayers();
+      tiles.forEach((tile) => {
+        (tile.clusters || []).forEach((cluster) => {
+          const technologies = Object.entries(cluster.technologies)
+            .map(([technology, values]) => `${technology}: ${values.count} (${Math.round(values.capacity)} kW)`);
+          L.circleMarker([cluster.latitude, cluster.longitude], {radius: 4 + 2 * Math.log2(cluster.count), weight: 1})
+            .bindTooltip(`<b>${cluster.count}</b><br>${technologies.join('<br>')}`)
+            .addTo(layer);
+        });
+        (tile.points || []).forEach((point) => {
+          L.circleMarker([point.latitude, point.longitude], {radius: 4, weight: 1})
+            .bindTooltip(`${point.unit_nr}<br>${point.technology}: ${point.capacity} kW`)
+            .addTo(layer);
+        });
+      });
+    });
+  };
+  map.on('moveend', update);
+  update();
+}
+
+window.addEventListener('DOMContentLoaded', () => {
+  document.querySelectorAll('.timeline-chart').forEach(renderTimelineChart);
+  document.querySelectorAll('.rankings-map').forEach(renderRankingsMap);
+  document.querySelectorAll('.municipality-map').forEach(renderMunicipalityMap);
+});
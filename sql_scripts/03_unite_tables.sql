@@ -1,17 +1,44 @@
 /*
 These commands transform the data to only contain the needed values and prepare it for being treated like timeseries data.
-1. Create new table energy_units.
-2. Copy necessary columns from solar_extended, wind_extended, biomass_extended and hydro_extended.
+1. Create the table unit_snapshot, python manage.py import_mastr loads the units of the five technologies from the
+   open-MaStR SQLite file into it (ee_status/mastr_data/loader.py, steps load_solar, load_wind, ...).
+   It is kept as it is, the incremental import (03_update_tables.sql) diffs the next import against it.
+2. Create new table energy_units from unit_snapshot, partitioned by state (one partition per state).
+   Rows that are no longer active are duplicated with negative values at their close-down date for easier
+   time-series-analysis, dates before 2000-01-01 are set to 2000-01-01 as this project is only interested in the
+   development from 2000 on.
 3. Delete rows that have not been approved (grid_operator_status)
-4. Prepare data for easier time-series-analysis by duplicating rows that are no longer active and set the value to negative and the new timestamp
-5. Set min date to 2000-01-01 as this project is only interested in the development from 2000 on.
+The "-- step:" comments split the script into steps for import_mastr, which runs steps whose "after:" steps are done
+concurrently. Steps without "after:" follow the step before.
 */
+-- step: unit_snapshot
+DROP TABLE IF EXISTS unit_snapshot;
+CREATE TABLE unit_snapshot
+(
+    unit_nr              VARCHAR(50),
+    technology           VARCHAR(10),
+    grid_operator_status VARCHAR(3),
+    municipality_key     VARCHAR(8),
+    municipality         VARCHAR(200),
+    county               VARCHAR(200),
+    state                VARCHAR(200),
+    zip_code             VARCHAR(6),
+    start_up_date        DATE,
+    close_down_date      DATE,
+    net_nominal_capacity NUMERIC(20, 2),
+    latitude             DOUBLE PRECISION,
+    longitude            DOUBLE PRECISION
+);
+
+-- step: energy_units after: load_solar, load_wind, load_biomass, load_hydro, load_storage
 CREATE EXTENSION IF NOT EXISTS postgis;
 DROP TABLE IF EXISTS energy_units;
 
 
+-- partitioned by state, queries for a region only read its partition
 CREATE TABLE energy_units
 (
+    id                           SERIAL,
     unit_nr                      VARCHAR(50),
     grid_operator_status         VARCHAR(3),
     municipality_key             VARCHAR(8),
@@ -27,109 +54,42 @@ CREATE TABLE energy_units
     biomass_net_nominal_capacity NUMERIC(20, 2),
     hydro_net_nominal_capacity   NUMERIC(20, 2),
     storage_net_nominal_capacity NUMERIC(20, 2),
-    geolocation                  GEOMETRY
-);
-
-INSERT INTO energy_units (unit_nr, grid_operator_status, municipality_key, municipality, county,
-                          state, zip_code, start_up_date,
-                          close_down_date, date, hydro_net_nominal_capacity, geolocation)
-SELECT einheitmastrnummer,
-       netzbetreiberpruefungstatus,
-       gemeindeschluessel,
-       gemeinde,
-       landkreis,
-       bundesland,
-       SUBSTR(postleitzahl, 1, 6) AS postleitzahl,
-       inbetriebnahmedatum,
-       datumendgueltigestilllegung,
-       inbetriebnahmedatum,
-       nettonennleistung,
-       ST_SetSRID(ST_MakePoint(breitengrad, laengengrad), 4326)
-FROM hydro_extended;
-
-INSERT INTO energy_units (unit_nr, grid_operator_status, municipality_key, municipality, county,
-                          state, zip_code, start_up_date,
-                          close_down_date, date, wind_net_nominal_capacity, geolocation)
-SELECT einheitmastrnummer,
-       netzbetreiberpruefungstatus,
-       gemeindeschluessel,
-       gemeinde,
-       landkreis,
-       bundesland,
-       SUBSTR(postleitzahl, 1, 6) AS postleitzahl,
-       inbetriebnahmedatum,
-       datumendgueltigestilllegung,
-       inbetriebnahmedatum,
-       nettonennleistung,
-       ST_SetSRID(ST_MakePoint(breitengrad, laengengrad), 4326)
-FROM wind_extended;
-
-INSERT INTO energy_units (unit_nr, grid_operator_status, municipality_key, municipality, county,
-                          state, zip_code, start_up_date,
-                          close_down_date, date, biomass_net_nominal_capacity, geolocation)
-SELECT einheitmastrnummer,
-       netzbetreiberpruefungstatus,
-       gemeindeschluessel,
-       gemeinde,
-       landkreis,
-       bundesland,
-       SUBSTR(postleitzahl, 1, 6) AS postleitzahl,
-       inbetriebnahmedatum,
-       datumendgueltigestilllegung,
-       inbetriebnahmedatum,
-       nettonennleistung,
-       ST_SetSRID(ST_MakePoint(breitengrad, laengengrad), 4326)
-FROM biomass_extended;
-
-INSERT INTO energy_units (unit_nr, grid_operator_status, municipality_key, municipality, county,
-                          state, zip_code, start_up_date,
-                          close_down_date, date, pv_net_nominal_capacity, geolocation)
-SELECT einheitmastrnummer,
-       netzbetreiberpruefungstatus,
-       gemeindeschluessel,
-       gemeinde,
-       landkreis,
-       bundesland,
-       SUBSTR(postleitzahl, 1, 6) AS postleitzahl,
-       inbetriebnahmedatum,
-       datumendgueltigestilllegung,
-       inbetriebnahmedatum,
-       nettonennleistung,
-       ST_SetSRID(ST_MakePoint(breitengrad, laengengrad), 4326)
-FROM solar_extended;
+    geolocation                  GEOMETRY(Point, 4326)
+) PARTITION BY LIST (state);
+
+CREATE TABLE energy_units_bw PARTITION OF energy_units FOR VALUES IN ('Baden-Württemberg');
+CREATE TABLE energy_units_by PARTITION OF energy_units FOR VALUES IN ('Bayern');
+CREATE TABLE energy_units_be PARTITION OF energy_units FOR VALUES IN ('Berlin');
+CREATE TABLE energy_units_bb PARTITION OF energy_units FOR VALUES IN ('Brandenburg');
+CREATE TABLE energy_units_hb PARTITION OF energy_units FOR VALUES IN ('Bremen');
+CREATE TABLE energy_units_hh PARTITION OF energy_units FOR VALUES IN ('Hamburg');
+CREATE TABLE energy_units_he PARTITION OF energy_units FOR VALUES IN ('Hessen');
+CREATE TABLE energy_units_mv PARTITION OF energy_units FOR VALUES IN ('Mecklenburg-Vorpommern');
+CREATE TABLE energy_units_ni PARTITION OF energy_units FOR VALUES IN ('Niedersachsen');
+CREATE TABLE energy_units_nw PARTITION OF energy_units FOR VALUES IN ('Nordrhein-Westfalen');
+CREATE TABLE energy_units_rp PARTITION OF energy_units FOR VALUES IN ('Rheinland-Pfalz');
+CREATE TABLE energy_units_sl PARTITION OF energy_units FOR VALUES IN ('Saarland');
+CREATE TABLE energy_units_sn PARTITION OF energy_units FOR VALUES IN ('Sachsen');
+CREATE TABLE energy_units_st PARTITION OF energy_units FOR VALUES IN ('Sachsen-Anhalt');
+CREATE TABLE energy_units_sh PARTITION OF energy_units FOR VALUES IN ('Schleswig-Holstein');
+CREATE TABLE energy_units_th PARTITION OF energy_units FOR VALUES IN ('Thüringen');
+-- offshore units (exclusive economic zone) and units without a state
+CREATE TABLE energy_units_other PARTITION OF energy_units DEFAULT;
 
+/*
+Closed down units get a second row with negative capacities dated to their close-down, so that the timelines drop the
+capacity from then on. Dates before 2000-01-01 count as 2000-01-01, the timelines start there; units without a
+start-up date are left out.
+All rows are inserted in order of their dates and never updated, so that the BRIN index on date (see active_units)
+stays selective.
+*/
 INSERT INTO energy_units (unit_nr, grid_operator_status, municipality_key, municipality, county,
-                          state, zip_code, start_up_date,
-                          close_down_date, date, storage_net_nominal_capacity, geolocation)
-SELECT einheitmastrnummer,
-       netzbetreiberpruefungstatus,
-       gemeindeschluessel,
-       gemeinde,
-       landkreis,
-       bundesland,
-       SUBSTR(postleitzahl, 1, 6) AS postleitzahl,
-       inbetriebnahmedatum,
-       datumendgueltigestilllegung,
-       inbetriebnahmedatum,
-       nettonennleistung,
-       ST_SetSRID(ST_MakePoint(breitengrad, laengengrad), 4326)
-FROM storage_extended;
-
--- Drop units that are not approved or disapproved
-DELETE
-FROM energy_units
-WHERE grid_operator_status = '0';
-
-ALTER TABLE energy_units
-    DROP COLUMN grid_operator_status;
-
-
--- Duplicate rows with units not longer being active and make their values negative
-INSERT INTO energy_units (unit_nr, municipality_key, municipality, county,
                           state, zip_code, start_up_date,
                           close_down_date, date, pv_net_nominal_capacity, wind_net_nominal_capacity,
-                          biomass_net_nominal_capacity, hydro_net_nominal_capacity, storage_net_nominal_capacity)
+                          biomass_net_nominal_capacity, hydro_net_nominal_capacity, storage_net_nominal_capacity,
+                          geolocation)
 SELECT unit_nr,
+       grid_operator_status,
        municipality_key,
        municipality,
        county,
@@ -137,28 +97,32 @@ SELECT unit_nr,
        zip_code,
        start_up_date,
        close_down_date,
-       date,
-       -pv_net_nominal_capacity,
-       -wind_net_nominal_capacity,
-       -biomass_net_nominal_capacity,
-       -hydro_net_nominal_capacity,
-       -storage_net_nominal_capacity
-FROM energy_units
-WHERE close_down_date is not null;
+       greatest(CASE WHEN sign = 1 THEN start_up_date ELSE close_down_date END, DATE '2000-01-01') AS date,
+       CASE WHEN technology = 'solar' THEN sign * net_nominal_capacity END,
+       CASE WHEN technology = 'wind' THEN sign * net_nominal_capacity END,
+       CASE WHEN technology = 'biomass' THEN sign * net_nominal_capacity END,
+       CASE WHEN technology = 'hydro' THEN sign * net_nominal_capacity END,
+       CASE WHEN technology = 'storage' THEN sign * net_nominal_capacity END,
+       ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+FROM unit_snapshot
+         CROSS JOIN (VALUES (1), (-1)) AS signs (sign)
+WHERE start_up_date IS NOT NULL
+  AND (sign = 1 OR close_down_date IS NOT NULL)
+ORDER BY date;
 
--- set time to the minimum of 2000-01-01 as this is where we start displaying data
-UPDATE energy_units
-SET date = '2000-01-01'
-WHERE date < '2000-01-01';
+ALTER TABLE energy_units ALTER COLUMN date SET NOT NULL;
 
--- drop units without a date
+-- step: approved_units
+-- Drop units that are not approved or disapproved
 DELETE
 FROM energy_units
-WHERE date is null;
+WHERE grid_operator_status = '0';
 
-ALTER TABLE energy_units ALTER COLUMN date SET NOT NULL;
-ALTER TABLE energy_units ADD COLUMN id SERIAL PRIMARY KEY;
+ALTER TABLE energy_units
+    DROP COLUMN grid_operator_status;
 
+
+-- step: monthly_timeline
 DROP TABLE IF EXISTS monthly_timeline;
 
 CREATE TABLE monthly_timeline
@@ -189,6 +153,7 @@ CREATE INDEX municipality_key_idx ON monthly_timeline (municipality_key);
 ALTER TABLE monthly_timeline
     ADD COLUMN id SERIAL PRIMARY KEY;
 
+-- step: current_totals
 DROP TABLE IF EXISTS current_totals;
 CREATE TABLE current_totals
 (
@@ -239,6 +204,7 @@ SET total_net_nominal_capacity = coalesce(pv_net_nominal_capacity, 0) + coalesce
 
 
 
+-- step: energy_unit_counts
 -- Count energy units per municipality key
 WITH subquery AS (
     SELECT municipality_key, COUNT(municipality_key) AS NB_UNITS
@@ -254,13 +220,23 @@ WHERE current_totals.municipality_key = subquery.municipality_key;
 
 
 
+-- step: zip_codes
 -- remove duplicate zip_code
 UPDATE current_totals
 set zip_code = array_to_string(array(SELECT DISTINCT unnest(string_to_array(zip_code, ','))), ',');
 
 
 
+-- step: active_units after: energy_unit_counts
 -- prepare energy_units to only contain units that have a location and are still active
 DELETE FROM energy_units WHERE geolocation IS NULL;
 DELETE FROM energy_units WHERE close_down_date is not null;
 ALTER TABLE energy_units DROP COLUMN close_down_date;
+
+-- a primary key of a partitioned table would have to contain state, id is unique by its sequence anyway
+CREATE INDEX energy_units_id_idx ON energy_units (id);
+CREATE INDEX energy_units_unit_nr_idx ON energy_units (unit_nr);
+CREATE INDEX energy_units_municipality_key_idx ON energy_units (municipality_key);
+CREATE INDEX energy_units_date_idx ON energy_units USING brin (date);
+CREATE INDEX energy_units_geolocation_idx ON energy_units USING gist (geolocation);
+ANALYZE energy_units;
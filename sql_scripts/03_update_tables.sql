@@ -0,0 +1,227 @@
+/*
+Incremental alternative to 03_unite_tables.sql for daily refreshes, run by python manage.py import_mastr --incremental
+on copies of the live monthly_timeline and current_totals.
+Only units whose row changed since the last import are processed, all other rows of energy_units, monthly_timeline
+and current_totals (including population, area and geom) stay untouched.
+Needs the unit_snapshot of a previous full (03_unite_tables.sql) or incremental import, it is only read, from the live
+schema (live_unit_snapshot, a view import_mastr creates), and not copied.
+1. Create incoming_units with the same columns as unit_snapshot, import_mastr loads the units of the five technologies
+   from the open-MaStR SQLite file into it (ee_status/mastr_data/loader.py, steps load_solar, load_wind, ...).
+2. Diff incoming_units against unit_snapshot: units that are new, changed (e.g. closed down) or gone.
+3. Recompute the (month, municipality) cells of monthly_timeline these units contributed to before or contribute to now.
+4. Recompute the current_totals rows of the affected municipalities from monthly_timeline.
+5. Stage the rows of the changed units for energy_units (energy_units_changes, energy_units_incoming). energy_units is
+   not copied: when the new generation is published it takes the live table over and replaces the rows of the changed
+   units in it (etl.hand_over_energy_units, rows move between its state partitions by themselves).
+6. incoming_units becomes the new unit_snapshot.
+7. The affected municipalities are kept in changed_municipalities, 05_update_cumulative_timeline.sql only accumulates
+   their realms again.
+*/
+-- step: incoming_units
+DROP TABLE IF EXISTS incoming_units;
+CREATE TABLE incoming_units (LIKE live_unit_snapshot);
+
+-- step: update_tables after: load_solar, load_wind, load_biomass, load_hydro, load_storage
+-- EXCEPT compares whole rows and treats NULLs as equal
+CREATE TEMPORARY TABLE changed_units AS
+SELECT unit_nr
+FROM (SELECT * FROM incoming_units EXCEPT SELECT * FROM live_unit_snapshot) AS new_or_changed
+UNION
+SELECT unit_nr
+FROM (SELECT * FROM live_unit_snapshot EXCEPT SELECT * FROM incoming_units) AS changed_or_gone;
+
+/*
+What a unit adds to its monthly_timeline cells, the same rules as in 03_unite_tables.sql:
+units not approved by the grid operator or without start-up date are left out, dates before 2000 count as 2000-01-01
+and closed down units add their capacity in the month of their start-up and take it away in the month of their
+close-down.
+*/
+CREATE TEMPORARY VIEW unit_contributions AS
+SELECT generation,
+       unit_nr,
+       technology,
+       date_trunc('month', greatest(CASE WHEN sign = 1 THEN start_up_date ELSE close_down_date END,
+                                    DATE '2000-01-01')) AS date,
+       municipality_key,
+       municipality,
+       county,
+       state,
+       zip_code,
+       sign * net_nominal_capacity                       AS net_nominal_capacity
+FROM (SELECT 'old' AS generation, * FROM live_unit_snapshot
+      UNION ALL
+      SELECT 'new', * FROM incoming_units) AS units
+         CROSS JOIN (VALUES (1), (-1)) AS signs (sign)
+WHERE grid_operator_status IS DISTINCT FROM '0'
+  AND start_up_date IS NOT NULL
+  AND (sign = 1 OR close_down_date IS NOT NULL);
+
+-- cells changed units contributed to before or contribute to now
+CREATE TEMPORARY TABLE affected_cells AS
+SELECT DISTINCT date, municipality_key, municipality, county, state
+FROM unit_contributions
+WHERE unit_nr IN (SELECT unit_nr FROM changed_units);
+
+-- the new sums of a cell also need the unchanged units of that cell
+DELETE
+FROM monthly_timeline m
+    USING affected_cells c
+WHERE m.date = c.date
+  AND m.municipality_key IS NOT DISTINCT FROM c.municipality_key
+  AND m.municipality IS NOT DISTINCT FROM c.municipality
+  AND m.county IS NOT DISTINCT FROM c.county
+  AND m.state IS NOT DISTINCT FROM c.state;
+
+INSERT INTO monthly_timeline (date, municipality_key, municipality, county, state, zip_code, pv_net_nominal_capacity,
+                              wind_net_nominal_capacity, biomass_net_nominal_capacity, hydro_net_nominal_capacity,
+                              storage_net_nominal_capacity)
+SELECT u.date,
+       u.municipality_key,
+       u.municipality,
+       u.county,
+       u.state,
+       string_agg(DISTINCT u.zip_code, ','),
+       sum(CASE WHEN u.technology = 'solar' THEN u.net_nominal_capacity END),
+       sum(CASE WHEN u.technology = 'wind' THEN u.net_nominal_capacity END),
+       sum(CASE WHEN u.technology = 'biomass' THEN u.net_nominal_capacity END),
+       sum(CASE WHEN u.technology = 'hydro' THEN u.net_nominal_capacity END),
+       sum(CASE WHEN u.technology = 'storage' THEN u.net_nominal_capacity END)
+FROM unit_contributions u
+         JOIN affected_cells c
+              ON c.date = u.date
+                  AND c.municipality_key IS NOT DISTINCT FROM u.municipality_key
+                  AND c.municipality IS NOT DISTINCT FROM u.municipality
+                  AND c.county IS NOT DISTINCT FROM u.county
+                  AND c.state IS NOT DISTINCT FROM u.state
+WHERE u.generation = 'new'
+GROUP BY u.date, u.municipality_key, u.municipality, u.county, u.state;
+
+CREATE TEMPORARY TABLE affected_totals AS
+SELECT DISTINCT municipality_key, municipality, county, state
+FROM affected_cells;
+
+CREATE TEMPORARY TABLE updated_totals AS
+SELECT m.municipality_key,
+       m.municipality,
+       m.county,
+       m.state,
+       string_agg(DISTINCT m.zip_code, ',')  AS zip_code,
+       sum(m.pv_net_nominal_capacity)        AS pv_net_nominal_capacity,
+       sum(m.wind_net_nominal_capacity)      AS wind_net_nominal_capacity,
+       sum(m.biomass_net_nominal_capacity)   AS biomass_net_nominal_capacity,
+       sum(m.hydro_net_nominal_capacity)     AS hydro_net_nominal_capacity,
+       sum(m.storage_net_nominal_capacity)   AS storage_net_nominal_capacity
+FROM monthly_timeline m
+         JOIN affected_totals a
+              ON m.municipality_key IS NOT DISTINCT FROM a.municipality_key
+                  AND m.municipality IS NOT DISTINCT FROM a.municipality
+                  AND m.county IS NOT DISTINCT FROM a.county
+                  AND m.state IS NOT DISTINCT FROM a.state
+GROUP BY m.municipality_key, m.municipality, m.county, m.state;
+
+-- municipalities without any units left
+DELETE
+FROM current_totals t
+    USING affected_totals a
+WHERE t.municipality_key IS NOT DISTINCT FROM a.municipality_key
+  AND t.municipality IS NOT DISTINCT FROM a.municipality
+  AND t.county IS NOT DISTINCT FROM a.county
+  AND t.state IS NOT DISTINCT FROM a.state
+  AND NOT EXISTS(SELECT
+                 FROM updated_totals u
+                 WHERE u.municipality_key IS NOT DISTINCT FROM t.municipality_key
+                   AND u.municipality IS NOT DISTINCT FROM t.municipality
+                   AND u.county IS NOT DISTINCT FROM t.county
+                   AND u.state IS NOT DISTINCT FROM t.state);
+
+UPDATE current_totals t
+SET pv_net_nominal_capacity      = u.pv_net_nominal_capacity,
+    wind_net_nominal_capacity    = u.wind_net_nominal_capacity,
+    biomass_net_nominal_capacity = u.biomass_net_nominal_capacity,
+    hydro_net_nominal_capacity   = u.hydro_net_nominal_capacity,
+    storage_net_nominal_capacity = u.storage_net_nominal_capacity
+FROM updated_totals u
+WHERE t.municipality_key IS NOT DISTINCT FROM u.municipality_key
+  AND t.municipality IS NOT DISTINCT FROM u.municipality
+  AND t.county IS NOT DISTINCT FROM u.county
+  AND t.state IS NOT DISTINCT FROM u.state;
+
+-- municipalities with their first units
+INSERT INTO current_totals (municipality_key, municipality, county, state, zip_code, pv_net_nominal_capacity,
+                            wind_net_nominal_capacity, biomass_net_nominal_capacity, hydro_net_nominal_capacity,
+                            storage_net_nominal_capacity)
+SELECT u.*
+FROM updated_totals u
+WHERE NOT EXISTS(SELECT
+                 FROM current_totals t
+                 WHERE t.municipality_key IS NOT DISTINCT FROM u.municipality_key
+                   AND t.municipality IS NOT DISTINCT FROM u.municipality
+                   AND t.county IS NOT DISTINCT FROM u.county
+                   AND t.state IS NOT DISTINCT FROM u.state);
+
+UPDATE current_totals t
+SET total_net_nominal_capacity = coalesce(u.pv_net_nominal_capacity, 0) + coalesce(u.wind_net_nominal_capacity, 0) +
+                                 coalesce(u.biomass_net_nominal_capacity, 0) + coalesce(u.hydro_net_nominal_capacity, 0),
+    -- remove duplicate zip_code
+    zip_code                   = array_to_string(array(SELECT DISTINCT unnest(string_to_array(u.zip_code, ','))), ',')
+FROM updated_totals u
+WHERE t.municipality_key IS NOT DISTINCT FROM u.municipality_key
+  AND t.municipality IS NOT DISTINCT FROM u.municipality
+  AND t.county IS NOT DISTINCT FROM u.county
+  AND t.state IS NOT DISTINCT FROM u.state;
+
+-- Count energy units per affected municipality key
+WITH subquery AS (
+    SELECT a.municipality_key, COUNT(u.unit_nr) AS NB_UNITS
+    FROM (SELECT DISTINCT municipality_key FROM affected_totals) AS a
+             LEFT JOIN incoming_units u
+                       ON u.municipality_key = a.municipality_key
+                           AND u.grid_operator_status IS DISTINCT FROM '0'
+                           AND u.start_up_date IS NOT NULL
+                           AND u.close_down_date IS NULL
+    GROUP BY a.municipality_key
+)
+UPDATE current_totals
+SET energy_units = NULLIF(subquery.NB_UNITS, 0)
+FROM subquery
+WHERE current_totals.municipality_key = subquery.municipality_key;
+
+-- the rows of these units in energy_units are replaced by energy_units_incoming
+CREATE TABLE energy_units_changes AS
+SELECT unit_nr
+FROM changed_units;
+
+-- energy_units only contains approved units that have a location and are still active
+CREATE TABLE energy_units_incoming AS
+SELECT u.unit_nr,
+       u.municipality_key,
+       u.municipality,
+       u.county,
+       u.state,
+       u.zip_code,
+       u.start_up_date,
+       greatest(u.start_up_date, DATE '2000-01-01')                       AS date,
+       CASE WHEN u.technology = 'solar' THEN u.net_nominal_capacity END   AS pv_net_nominal_capacity,
+       CASE WHEN u.technology = 'wind' THEN u.net_nominal_capacity END    AS wind_net_nominal_capacity,
+       CASE WHEN u.technology = 'biomass' THEN u.net_nominal_capacity END AS biomass_net_nominal_capacity,
+       CASE WHEN u.technology = 'hydro' THEN u.net_nominal_capacity END   AS hydro_net_nominal_capacity,
+       CASE WHEN u.technology = 'storage' THEN u.net_nominal_capacity END AS storage_net_nominal_capacity,
+       ST_SetSRID(ST_MakePoint(u.longitude, u.latitude), 4326)            AS geolocation
+FROM incoming_units u
+         JOIN changed_units USING (unit_nr)
+WHERE u.grid_operator_status IS DISTINCT FROM '0'
+  AND u.start_up_date IS NOT NULL
+  AND u.close_down_date IS NULL
+  AND u.latitude IS NOT NULL
+  AND u.longitude IS NOT NULL;
+
+CREATE TABLE changed_municipalities AS
+SELECT *
+FROM affected_totals;
+
+DROP VIEW unit_contributions;
+DROP TABLE changed_units, affected_cells, affected_totals, updated_totals;
+
+DROP VIEW live_unit_snapshot;
+ALTER TABLE incoming_units
+    RENAME TO unit_snapshot;
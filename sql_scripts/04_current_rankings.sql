@@ -0,0 +1,138 @@
+/*
+Precompute the ratios and ranks shown on the totals page, so that CurrentTotal.ratio_and_rank becomes a single lookup.
+It runs against the Django database once current_totals is complete (population, area): python manage.py import_mastr
+1. Unpivot current_totals into one row per municipality and numerator/denominator pair.
+2. Sum every pair per municipality, county, state and for the whole country (GROUPING SETS).
+   "average" is the plain ratio of a realm, "score" only counts rows with a positive denominator (used for ranking).
+3. Rank every realm within each scope it belongs to (window functions) and join the average of that scope.
+*/
+CREATE TEMPORARY TABLE ranking_metrics (numerator, denominator) AS
+VALUES ('total_net_nominal_capacity', 'population'),
+       ('total_net_nominal_capacity', 'area'),
+       ('storage_net_nominal_capacity', 'population'),
+       ('storage_net_nominal_capacity', 'area');
+
+CREATE TEMPORARY TABLE ranking_scopes (realm_type, scope, scope_order) AS
+VALUES ('municipality', 'municipality', 0),
+       ('municipality', 'county', 1),
+       ('municipality', 'state', 2),
+       ('municipality', 'country', 3),
+       ('county', 'county', 1),
+       ('county', 'state', 2),
+       ('county', 'country', 3),
+       ('state', 'state', 2),
+       ('state', 'country', 3);
+
+CREATE TEMPORARY TABLE realm_scores AS
+SELECT numerator,
+       denominator,
+       CASE
+           WHEN GROUPING(municipality) = 0 THEN 'municipality'
+           WHEN GROUPING(county) = 0 THEN 'county'
+           WHEN GROUPING(state) = 0 THEN 'state'
+           ELSE 'country'
+           END                                                          AS realm_type,
+       municipality,
+       county,
+       state,
+       sum(numerator_value) / NULLIF(sum(denominator_value), 0)         AS average,
+       sum(numerator_value) FILTER (WHERE denominator_value > 0) /
+       sum(denominator_value) FILTER (WHERE denominator_value > 0)      AS score,
+       coalesce(bool_or(denominator_value > 0), FALSE)                  AS has_denominator
+FROM (SELECT m.numerator,
+             m.denominator,
+             t.municipality,
+             t.county,
+             t.state,
+             CASE m.numerator
+                 WHEN 'total_net_nominal_capacity' THEN t.total_net_nominal_capacity
+                 WHEN 'storage_net_nominal_capacity' THEN t.storage_net_nominal_capacity
+                 END AS numerator_value,
+             CASE m.denominator
+                 WHEN 'population' THEN t.population
+                 WHEN 'area' THEN t.area
+                 END AS denominator_value
+      FROM current_totals t
+               CROSS JOIN ranking_metrics m) AS ranking_inputs
+GROUP BY numerator, denominator, GROUPING SETS ((state, county, municipality), (state, county), (state), ());
+
+DROP TABLE IF EXISTS current_rankings;
+CREATE TABLE current_rankings
+(
+    id           SERIAL PRIMARY KEY,
+    realm_type   VARCHAR(20),
+    municipality VARCHAR(200),
+    county       VARCHAR(200),
+    state        VARCHAR(200),
+    numerator    VARCHAR(50),
+    denominator  VARCHAR(50),
+    scope        VARCHAR(20),
+    scope_order  SMALLINT,
+    -- DOUBLE PRECISION like in 08_realm_totals.sql, the API returns floats whether or not the rankings are in memory
+    score        DOUBLE PRECISION,
+    rank         INTEGER,
+    total_ranks  INTEGER,
+    max_score    DOUBLE PRECISION
+);
+
+-- rank municipalities, counties and states within their own realm and every realm above them
+INSERT INTO current_rankings (realm_type, municipality, county, state, numerator, denominator, scope, scope_order,
+                              score, rank, total_ranks, max_score)
+SELECT ranked.realm_type,
+       ranked.municipality,
+       ranked.county,
+       ranked.state,
+       ranked.numerator,
+       ranked.denominator,
+       ranked.scope,
+       ranked.scope_order,
+       round(coalesce(scope_scores.average, 0), 2),
+       CASE WHEN ranked.scope <> ranked.realm_type AND ranked.has_denominator THEN ranked.rank END,
+       ranked.total_ranks,
+       round(ranked.max_score, 1)
+FROM (SELECT r.*,
+             RANK() OVER w                                               AS rank,
+             COUNT(*) FILTER (WHERE r.has_denominator) OVER w_scope      AS total_ranks,
+             MAX(r.score) FILTER (WHERE r.has_denominator) OVER w_scope  AS max_score
+      FROM (SELECT *,
+                   CASE WHEN scope <> 'country' THEN state END                      AS scope_state,
+                   CASE WHEN scope IN ('municipality', 'county') THEN county END    AS scope_county,
+                   CASE WHEN scope = 'municipality' THEN municipality END           AS scope_municipality
+            FROM realm_scores
+                     JOIN ranking_scopes USING (realm_type)) AS r
+      WINDOW w_scope AS (PARTITION BY r.numerator, r.denominator, r.realm_type, r.scope,
+                                      r.scope_state, r.scope_county, r.scope_municipality),
+             w AS (PARTITION BY r.numerator, r.denominator, r.realm_type, r.scope,
+                                r.scope_state, r.scope_county, r.scope_municipality, r.has_denominator
+                   ORDER BY r.score DESC NULLS LAST)) AS ranked
+         LEFT JOIN realm_scores scope_scores
+                   ON scope_scores.numerator = ranked.numerator
+                       AND scope_scores.denominator = ranked.denominator
+                       AND scope_scores.realm_type = ranked.scope
+                       AND scope_scores.state IS NOT DISTINCT FROM ranked.scope_state
+                       AND scope_scores.county IS NOT DISTINCT FROM ranked.scope_county
+                       AND scope_scores.municipality IS NOT DISTINCT FROM ranked.scope_municipality;
+
+-- Germany itself is not ranked, but the totals page shows how many states there are and the best state score
+INSERT INTO current_rankings (realm_type, numerator, denominator, scope, scope_order, score, rank, total_ranks,
+                              max_score)
+SELECT 'country',
+       country.numerator,
+       country.denominator,
+       'country',
+       3,
+       round(coalesce(country.average, 0), 2),
+       NULL,
+       states.total_ranks,
+       states.max_score
+FROM realm_scores country
+         LEFT JOIN (SELECT DISTINCT numerator, denominator, total_ranks, max_score
+                    FROM current_rankings
+                    WHERE realm_type = 'state'
+                      AND scope = 'country') AS states
+                   ON states.numerator = country.numerator AND states.denominator = country.denominator
+WHERE country.realm_type = 'country';
+
+CREATE INDEX rankings_lookup_idx ON current_rankings (realm_type, numerator, denominator, municipality, county, state);
+
+DROP TABLE ranking_metrics, ranking_scopes, realm_scores;
@@ -0,0 +1,45 @@
+/*
+Pre-accumulate monthly_timeline for every admin level, so the chart of the totals page is a plain indexed SELECT.
+One row per level (municipality, county, state, country), realm and month in which a capacity changed,
+holding the running total of every technology up to that month.
+*/
+DROP TABLE IF EXISTS cumulative_timeline;
+CREATE TABLE cumulative_timeline AS
+SELECT level,
+       municipality_key,
+       municipality,
+       county,
+       state,
+       date,
+       sum(pv_net_nominal_capacity) OVER realm_until_date      AS pv_net_nominal_capacity,
+       sum(wind_net_nominal_capacity) OVER realm_until_date    AS wind_net_nominal_capacity,
+       sum(biomass_net_nominal_capacity) OVER realm_until_date AS biomass_net_nominal_capacity,
+       sum(hydro_net_nominal_capacity) OVER realm_until_date   AS hydro_net_nominal_capacity,
+       sum(storage_net_nominal_capacity) OVER realm_until_date AS storage_net_nominal_capacity
+FROM (SELECT CASE
+                 WHEN GROUPING(municipality_key) = 0 THEN 'municipality'
+                 WHEN GROUPING(county) = 0 THEN 'county'
+                 WHEN GROUPING(state) = 0 THEN 'state'
+                 ELSE 'country'
+                 END                                         AS level,
+             municipality_key,
+             municipality,
+             county,
+             state,
+             date,
+             coalesce(sum(pv_net_nominal_capacity), 0)      AS pv_net_nominal_capacity,
+             coalesce(sum(wind_net_nominal_capacity), 0)    AS wind_net_nominal_capacity,
+             coalesce(sum(biomass_net_nominal_capacity), 0) AS biomass_net_nominal_capacity,
+             coalesce(sum(hydro_net_nominal_capacity), 0)   AS hydro_net_nominal_capacity,
+             coalesce(sum(storage_net_nominal_capacity), 0) AS storage_net_nominal_capacity
+      FROM monthly_timeline
+      GROUP BY date, GROUPING SETS ((state, county, municipality, municipality_key), (state, county), (state), ())
+     ) AS monthly
+WINDOW realm_until_date AS (PARTITION BY level, state, county, municipality, municipality_key ORDER BY date);
+
+-- one range scan per chart: all columns identifying a realm, then the date
+CREATE INDEX cumulative_timeline_realm_idx ON cumulative_timeline (level, state, county, municipality, date);
+
+-- add ID column (needed by Django)
+ALTER TABLE cumulative_timeline
+    ADD COLUMN id SERIAL PRIMARY KEY;
@@ -0,0 +1,74 @@
+/*
+Incremental alternative to 05_cumulative_timeline.sql, run by python manage.py import_mastr --incremental on a copy of
+the live cumulative_timeline.
+Only the realms of the municipalities 03_update_tables.sql changed (changed_municipalities) are accumulated again:
+those municipalities, their counties and states and the country. The rows of all other realms stay untouched.
+monthly_timeline is still read in full for the sums of the country, but only the changed realms are sorted for the
+running totals and written.
+*/
+CREATE TEMPORARY TABLE changed_realms AS
+SELECT 'municipality' AS level, municipality_key, municipality, county, state
+FROM changed_municipalities
+UNION
+SELECT 'county', NULL, NULL, county, state
+FROM changed_municipalities
+UNION
+SELECT 'state', NULL, NULL, NULL, state
+FROM changed_municipalities
+UNION
+SELECT 'country', NULL, NULL, NULL, NULL
+WHERE EXISTS(SELECT FROM changed_municipalities);
+
+DELETE
+FROM cumulative_timeline c
+    USING changed_realms r
+WHERE c.level = r.level
+  AND c.municipality_key IS NOT DISTINCT FROM r.municipality_key
+  AND c.municipality IS NOT DISTINCT FROM r.municipality
+  AND c.county IS NOT DISTINCT FROM r.county
+  AND c.state IS NOT DISTINCT FROM r.state;
+
+-- the same rows as in 05_cumulative_timeline.sql, of the changed realms only
+INSERT INTO cumulative_timeline (level, municipality_key, municipality, county, state, date, pv_net_nominal_capacity,
+                                 wind_net_nominal_capacity, biomass_net_nominal_capacity, hydro_net_nominal_capacity,
+                                 storage_net_nominal_capacity)
+SELECT monthly.level,
+       monthly.municipality_key,
+       monthly.municipality,
+       monthly.county,
+       monthly.state,
+       monthly.date,
+       sum(monthly.pv_net_nominal_capacity) OVER realm_until_date      AS pv_net_nominal_capacity,
+       sum(monthly.wind_net_nominal_capacity) OVER realm_until_date    AS wind_net_nominal_capacity,
+       sum(monthly.biomass_net_nominal_capacity) OVER realm_until_date AS biomass_net_nominal_capacity,
+       sum(monthly.hydro_net_nominal_capacity) OVER realm_until_date   AS hydro_net_nominal_capacity,
+       sum(monthly.storage_net_nominal_capacity) OVER realm_until_date AS storage_net_nominal_capacity
+FROM (SELECT CASE
+                 WHEN GROUPING(municipality_key) = 0 THEN 'municipality'
+                 WHEN GROUPING(county) = 0 THEN 'county'
+                 WHEN GROUPING(state) = 0 THEN 'state'
+                 ELSE 'country'
+                 END                                         AS level,
+             municipality_key,
+             municipality,
+             county,
+             state,
+             date,
+             coalesce(sum(pv_net_nominal_capacity), 0)      AS pv_net_nominal_capacity,
+             coalesce(sum(wind_net_nominal_capacity), 0)    AS wind_net_nominal_capacity,
+             coalesce(sum(biomass_net_nominal_capacity), 0) AS biomass_net_nominal_capacity,
+             coalesce(sum(hydro_net_nominal_capacity), 0)   AS hydro_net_nominal_capacity,
+             coalesce(sum(storage_net_nominal_capacity), 0) AS storage_net_nominal_capacity
+      FROM monthly_timeline
+      GROUP BY date, GROUPING SETS ((state, county, municipality, municipality_key), (state, county), (state), ())
+     ) AS monthly
+         JOIN changed_realms r
+              ON r.level = monthly.level
+                  AND r.municipality_key IS NOT DISTINCT FROM monthly.municipality_key
+                  AND r.municipality IS NOT DISTINCT FROM monthly.municipality
+                  AND r.county IS NOT DISTINCT FROM monthly.county
+                  AND r.state IS NOT DISTINCT FROM monthly.state
+WINDOW realm_until_date AS (PARTITION BY monthly.level, monthly.state, monthly.county, monthly.municipality,
+        monthly.municipality_key ORDER BY monthly.date);
+
+DROP TABLE changed_realms, changed_municipalities;
@@ -0,0 +1,18 @@
+/*
+Trigram indexes for the search on the start page (search_municipality).
+B-tree indexes cannot serve ILIKE '%query%', GIN indexes with gin_trgm_ops can.
+*/
+-- the tables are built in a staging schema, the extension belongs into public
+CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public;
+
+DROP INDEX IF EXISTS totals_municipality_trgm_idx;
+DROP INDEX IF EXISTS totals_municipality_key_trgm_idx;
+DROP INDEX IF EXISTS totals_zip_code_trgm_idx;
+DROP INDEX IF EXISTS totals_county_trgm_idx;
+DROP INDEX IF EXISTS totals_state_trgm_idx;
+
+CREATE INDEX totals_municipality_trgm_idx ON current_totals USING gin (municipality gin_trgm_ops);
+CREATE INDEX totals_municipality_key_trgm_idx ON current_totals USING gin (municipality_key gin_trgm_ops);
+CREATE INDEX totals_zip_code_trgm_idx ON current_totals USING gin (zip_code gin_trgm_ops);
+CREATE INDEX totals_county_trgm_idx ON current_totals USING gin (county gin_trgm_ops);
+CREATE INDEX totals_state_trgm_idx ON current_totals USING gin (state gin_trgm_ops);
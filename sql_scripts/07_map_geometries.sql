@@ -0,0 +1,29 @@
+/*
+Geometry pyramid for the maps (ee_status/mastr_data/tiles.py, rankings_map_json).
+Every municipality polygon of current_totals is simplified once per level with a tolerance (meters, EPSG:25832)
+of about a pixel at the zoom levels the level is used for, and stored in EPSG:4326, so the map endpoints neither
+simplify nor reproject full-resolution polygons per request.
+Keep the levels in line with GEOMETRY_LEVEL_MAX_ZOOM in tiles.py and with 07_update_map_geometries.sql.
+*/
+DROP TABLE IF EXISTS simplified_geometries;
+CREATE TABLE simplified_geometries
+(
+    id               SERIAL PRIMARY KEY,
+    current_total_id INTEGER  NOT NULL,
+    level            SMALLINT NOT NULL,
+    tolerance        REAL     NOT NULL,
+    geom             GEOMETRY(MultiPolygon, 4326)
+);
+
+INSERT INTO simplified_geometries (current_total_id, level, tolerance, geom)
+SELECT t.id,
+       levels.level,
+       levels.tolerance,
+       ST_Multi(ST_Transform(ST_SimplifyPreserveTopology(t.geom, levels.tolerance), 4326))
+FROM current_totals t
+         CROSS JOIN (VALUES (0, 2000), (1, 500), (2, 100), (3, 25), (4, 5)) AS levels (level, tolerance)
+WHERE t.geom IS NOT NULL;
+
+CREATE INDEX simplified_geometries_lookup_idx ON simplified_geometries (level, current_total_id);
+-- tiles are cut in web mercator (EPSG:3857)
+CREATE INDEX simplified_geometries_3857_idx ON simplified_geometries USING gist (ST_Transform(geom, 3857));
@@ -0,0 +1,21 @@
+/*
+Incremental alternative to 07_map_geometries.sql, run by python manage.py import_mastr --incremental on a copy of the
+live simplified_geometries.
+An incremental import keeps the ids and polygons of the municipalities in current_totals, so their simplified
+geometries stay as they are: only those of municipalities without units left are removed and municipalities with a
+polygon but without simplified geometries get theirs.
+*/
+DELETE
+FROM simplified_geometries g
+WHERE NOT EXISTS(SELECT FROM current_totals t WHERE t.id = g.current_total_id);
+
+-- the same levels as in 07_map_geometries.sql
+INSERT INTO simplified_geometries (current_total_id, level, tolerance, geom)
+SELECT t.id,
+       levels.level,
+       levels.tolerance,
+       ST_Multi(ST_Transform(ST_SimplifyPreserveTopology(t.geom, levels.tolerance), 4326))
+FROM current_totals t
+         CROSS JOIN (VALUES (0, 2000), (1, 500), (2, 100), (3, 25), (4, 5)) AS levels (level, tolerance)
+WHERE t.geom IS NOT NULL
+  AND NOT EXISTS(SELECT FROM simplified_geometries g WHERE g.current_total_id = t.id);
@@ -0,0 +1,30 @@
+/*
+Pre-sum current_totals per county, state and for the whole country, so that the totals page reads the basics of a
+realm from a single row instead of aggregating all its municipalities.
+It runs against the Django database once current_totals is complete (population, area): python manage.py import_mastr
+*/
+DROP TABLE IF EXISTS realm_totals;
+CREATE TABLE realm_totals AS
+SELECT CASE
+           WHEN GROUPING(county) = 0 THEN 'county'
+           WHEN GROUPING(state) = 0 THEN 'state'
+           ELSE 'country'
+           END                                                   AS realm_type,
+       county,
+       state,
+       sum(pv_net_nominal_capacity)::DOUBLE PRECISION            AS pv_net_nominal_capacity,
+       sum(wind_net_nominal_capacity)::DOUBLE PRECISION          AS wind_net_nominal_capacity,
+       sum(biomass_net_nominal_capacity)::DOUBLE PRECISION       AS biomass_net_nominal_capacity,
+       sum(hydro_net_nominal_capacity)::DOUBLE PRECISION         AS hydro_net_nominal_capacity,
+       sum(storage_net_nominal_capacity)::DOUBLE PRECISION       AS storage_net_nominal_capacity,
+       sum(total_net_nominal_capacity)::DOUBLE PRECISION         AS total_net_nominal_capacity,
+       sum(population)                                           AS population,
+       sum(area)::DOUBLE PRECISION                               AS area,
+       sum(energy_units)                                         AS energy_units,
+       count(*)                                                  AS municipalities
+FROM current_totals
+GROUP BY GROUPING SETS ((state, county), (state), ());
+
+ALTER TABLE realm_totals
+    ADD COLUMN id SERIAL PRIMARY KEY;
+CREATE INDEX realm_totals_lookup_idx ON realm_totals (realm_type, state, county);
@@ -0,0 +1,11 @@
+/*
+Stamp the new data version. import_mastr runs it when it publishes a new generation of the tables.
+The application reloads its in-memory data (e.g. the ranking engine) whenever the latest version changes.
+*/
+CREATE TABLE IF NOT EXISTS data_version
+(
+    id          SERIAL PRIMARY KEY,
+    imported_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+INSERT INTO data_version DEFAULT VALUES;
@@ -3,4 +3,7 @@
 python manage.py collectstatic --noinput
 python manage.py compilemessages
 python manage.py migrate
-gunicorn config.wsgi --bind=0.0.0.0:80
+# metrics of all gunicorn workers, see ee_status/mastr_data/metrics.py
+export PROMETHEUS_MULTIPROC_DIR=/tmp/prometheus
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+gunicorn config.wsgi --config config/gunicorn.py --bind=0.0.0.0:80